@@ -0,0 +1,288 @@
+import os
+import re
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from loguru import logger
+
+# Shared store location, MARIADB4P_STORE enables the store for download_maria4j_jars
+DEFAULT_STORE_DIR = Path(Path.home(), '.cache', 'MariaDB4p', 'store')
+STORE_ENV = 'MARIADB4P_STORE'
+
+
+class FileLock:
+    """
+    Exclusive inter-process lock on a file, usable as a context manager.
+    """
+
+    def __init__(self, path, timeout=None, poll_interval=0.05):
+        """
+        :param path: Lock file path, created if missing.
+        :param timeout: Seconds to wait for the lock, None waits forever.
+        :param poll_interval: Seconds between attempts while waiting.
+        """
+        self.path = Path(path)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._file = None
+
+    def _try_lock(self):
+        if sys.platform == 'win32':
+            import msvcrt
+            try:
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                return False
+        import fcntl
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a+')
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not self._try_lock():
+            if deadline is not None and time.monotonic() > deadline:
+                self._file.close()
+                self._file = None
+                raise TimeoutError(f"Timed out waiting for lock {self.path}")
+            time.sleep(self.poll_interval)
+        return self
+
+    def release(self):
+        if self._file is None:
+            return
+        if sys.platform == 'win32':
+            import msvcrt
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def link_or_copy(source, dest):
+    """
+    Materialize source at dest as a hardlink, falling back to a symlink and then to a copy.
+
+    :return: 'hardlink', 'symlink' or 'copy'.
+    """
+    tmp_dest = Path(dest).with_name(f"{Path(dest).name}.{os.getpid()}.{threading.get_ident()}.link")
+    for method in ('hardlink', 'symlink', 'copy'):
+        try:
+            if method == 'hardlink':
+                os.link(source, tmp_dest)
+            elif method == 'symlink':
+                os.symlink(source, tmp_dest)
+            else:
+                shutil.copy2(source, tmp_dest)
+            os.replace(tmp_dest, dest)
+            return method
+        except OSError:
+            if tmp_dest.is_symlink() or tmp_dest.exists():
+                tmp_dest.unlink()
+            if method == 'copy':
+                raise
+
+
+class ArtifactStore:
+    """
+    User-level, content-addressed store of Maven artifacts shared by every install.
+
+    Files are stored once under blobs/sha256/ and indexed by their Maven coordinates. Downloads are
+    verified against the repository's .sha1 files and serialized per artifact with a file lock, so
+    concurrent processes fetch each artifact only once.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = Path(root)
+        self.blobs_dir = self.root / 'blobs' / 'sha256'
+        self.index_dir = self.root / 'index'
+        self.locks_dir = self.root / 'locks'
+        self.tmp_dir = self.root / 'tmp'
+
+    def blob_path(self, sha256):
+        return self.blobs_dir / sha256[:2] / sha256
+
+    def index_path(self, group_id, artifact_id, version, file_type):
+        return Path(self.index_dir, *group_id.split('.'), artifact_id, version, f"{artifact_id}-{version}.{file_type}.sha256")
+
+    def lookup(self, group_id, artifact_id, version, file_type):
+        """
+        Path of the stored blob for an artifact file, or None if it is not in the store.
+        """
+        try:
+            sha256 = self.index_path(group_id, artifact_id, version, file_type).read_text().strip()
+        except OSError:
+            return None
+        blob = self.blob_path(sha256)
+        return blob if blob.exists() else None
+
+    def _use(self, blob, dest):
+        # the blob mtime records its last use for prune
+        os.utime(blob)
+        return link_or_copy(blob, dest)
+
+    def fetch(self, group_id, artifact_id, version, file_type, dest, repository, retries=3):
+        """
+        Materialize an artifact file at dest from the store, downloading it into the store first if needed.
+
+        :return: Number of bytes downloaded, 0 if it was served from the store, or None on failure.
+        """
+        from MariaDB4p.download_jars import construct_maven_url, fetch_url
+        dest = Path(dest)
+        if dest.exists():
+            return 0
+        blob = self.lookup(group_id, artifact_id, version, file_type)
+        if blob is not None:
+            self._use(blob, dest)
+            return 0
+
+        coordinates = f"{group_id}:{artifact_id}:{version}:{file_type}"
+        lock_name = hashlib.sha1(coordinates.encode()).hexdigest() + '.lock'
+        with FileLock(self.locks_dir / lock_name):
+            # another process may have stored it while we waited for the lock
+            blob = self.lookup(group_id, artifact_id, version, file_type)
+            if blob is not None:
+                self._use(blob, dest)
+                return 0
+            self.tmp_dir.mkdir(parents=True, exist_ok=True)
+            url = construct_maven_url(group_id, artifact_id, version, file_type, repository)
+            tmp_file = self.tmp_dir / f"{lock_name}.{os.getpid()}.{threading.get_ident()}"
+            tmp_sha1 = tmp_file.with_name(tmp_file.name + '.sha1')
+            try:
+                size = fetch_url(url, tmp_file, retries=retries)
+                if size is None:
+                    return None
+                sha1, sha256 = file_hashes(tmp_file)
+                if fetch_url(url + '.sha1', tmp_sha1, retries=retries) is not None:
+                    # .sha1 files hold the digest, sometimes followed by the file name
+                    expected = (tmp_sha1.read_text().split() or [''])[0].lower()
+                    if expected != sha1:
+                        logger.error(f"SHA-1 mismatch for {url}: expected {expected}, got {sha1}")
+                        return None
+                else:
+                    logger.warning(f"No .sha1 published for {url}, storing it unverified.")
+                blob = self.blob_path(sha256)
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                if blob.exists():
+                    tmp_file.unlink()
+                else:
+                    os.chmod(tmp_file, 0o444)
+                    os.replace(tmp_file, blob)
+                index_path = self.index_path(group_id, artifact_id, version, file_type)
+                index_path.parent.mkdir(parents=True, exist_ok=True)
+                index_path.write_text(sha256)
+            finally:
+                for path in (tmp_file, tmp_sha1):
+                    if path.exists():
+                        path.unlink()
+            self._use(blob, dest)
+            logger.debug(f"Stored {coordinates} as {sha256}")
+            return size
+
+    def size(self):
+        """
+        Total size of the stored blobs in bytes.
+        """
+        return sum(blob.stat().st_size for blob in self.blobs_dir.glob('*/*'))
+
+    def prune(self, max_bytes):
+        """
+        Delete least recently used blobs until the store is at most max_bytes.
+
+        Per-install JARs that are hardlinks or copies keep working, symlinked ones need a new download.
+
+        :return: Number of bytes freed.
+        """
+        freed = 0
+        with FileLock(self.root / 'prune.lock'):
+            blobs = sorted(((blob.stat().st_mtime, blob.stat().st_size, blob) for blob in self.blobs_dir.glob('*/*')),
+                           key=lambda item: item[0])
+            total = sum(size for _, size, _ in blobs)
+            for _, size, blob in blobs:
+                if total <= max_bytes:
+                    break
+                os.chmod(blob, 0o644)
+                blob.unlink()
+                total -= size
+                freed += size
+            # drop index entries whose blob is gone
+            if freed:
+                for index_path in self.index_dir.rglob('*.sha256'):
+                    if not self.blob_path(index_path.read_text().strip()).exists():
+                        index_path.unlink()
+        logger.info(f"Pruned {freed} bytes from {self.root}, {total} bytes left.")
+        return freed
+
+
+def file_hashes(path):
+    """
+    SHA-1 and SHA-256 hex digests of a file, computed in one read.
+    """
+    sha1 = hashlib.sha1()
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(chunk)
+            sha256.update(chunk)
+    return sha1.hexdigest(), sha256.hexdigest()
+
+
+def default_store():
+    """
+    Store configured through the MARIADB4P_STORE environment variable, or None if it is not set.
+
+    The variable holds the store directory, or 1 for the default ~/.cache/MariaDB4p/store.
+    """
+    value = os.environ.get(STORE_ENV, '').strip()
+    if value in ('', '0'):
+        return None
+    return ArtifactStore(DEFAULT_STORE_DIR if value == '1' else value)
+
+
+def parse_size(text):
+    """
+    Parse a size such as 500M or 2G into bytes.
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kKmMgGtT]?)[bB]?\s*', text)
+    if match is None:
+        raise ValueError(f"Invalid size: {text}")
+    return int(float(match.group(1)) * 1024 ** ' KMGT'.index(match.group(2).upper() or ' '))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m MariaDB4p.artifact_store', description='Manage the shared MariaDB4p artifact store.')
+    parser.add_argument('--store', default=None, help=f'Store directory (default: {DEFAULT_STORE_DIR})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    prune_parser = commands.add_parser('prune', help='Delete least recently used artifacts above a total size.')
+    prune_parser.add_argument('--max-size', required=True, help='Size to keep, e.g. 500M or 2G.')
+    commands.add_parser('size', help='Print the total size of the store.')
+    args = parser.parse_args(argv)
+
+    store = ArtifactStore(args.store or DEFAULT_STORE_DIR)
+    if args.command == 'prune':
+        store.prune(parse_size(args.max_size))
+    else:
+        print(store.size())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
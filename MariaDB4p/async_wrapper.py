@@ -0,0 +1,145 @@
+import asyncio
+from functools import partial
+from loguru import logger
+
+from MariaDB4p.mariadb_wrapper import MariaDBWrapper, DEFAULT_START_TIMEOUT
+from MariaDB4p.exceptions import ServerNotRunningError
+
+
+def _aiomysql():
+    try:
+        import aiomysql
+    except ImportError:
+        return None
+    return aiomysql
+
+
+class AsyncMariaDBWrapper:
+    """
+    asyncio front end of MariaDBWrapper.
+
+    The blocking work, probing the JDK, starting the JVM and the server, runs in an executor so several
+    servers can be brought up concurrently without blocking the event loop. Queries go through an aiomysql
+    pool when aiomysql is installed (pip install MariaDB4p[async]) and through the wrapper's pymysql pool
+    in the executor otherwise.
+    """
+
+    def __init__(self, executor=None, pool_min_size=1, pool_max_size=10, **wrapper_options):
+        """
+        :param executor: concurrent.futures executor for the blocking calls, defaults to the loop's executor.
+        :param pool_min_size: Connections kept open per (user, database) pool.
+        :param pool_max_size: Maximum connections per (user, database) pool.
+        :param wrapper_options: Keyword arguments for MariaDBWrapper.
+        """
+        self.executor = executor
+        self.pool_min_size = pool_min_size
+        self.pool_max_size = pool_max_size
+        self.wrapper_options = dict(wrapper_options, pool_min_size=0, pool_max_size=pool_max_size)
+        self.wrapper = None
+        self._pools = {}
+        self._pools_lock = None
+
+    async def _run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(function, *args, **kwargs))
+
+    def _start(self, wait, timeout):
+        if self.wrapper is None:
+            self.wrapper = MariaDBWrapper(**self.wrapper_options)
+        self.wrapper.start_server(wait=wait, timeout=timeout)
+
+    async def start(self, wait=True, timeout=DEFAULT_START_TIMEOUT):
+        """
+        Create the wrapper and start the server, see MariaDBWrapper.start_server.
+
+        :return: self
+        """
+        await self._run(self._start, wait, timeout)
+        return self
+
+    async def stop(self):
+        """
+        Close the async pools and stop the server.
+        """
+        pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+            await pool.wait_closed()
+        if self.wrapper is not None:
+            await self._run(self.wrapper.stop_server)
+
+    async def is_running(self):
+        return self.wrapper is not None and await self._run(self.wrapper.is_running)
+
+    async def ping(self, timeout=1):
+        return self.wrapper is not None and await self._run(self.wrapper.ping, timeout)
+
+    def _require_wrapper(self):
+        if self.wrapper is None or self.wrapper.db is None:
+            raise ServerNotRunningError("MariaDB server is not running.")
+        return self.wrapper
+
+    async def get_pool(self, db_name='testdb', user='root', password=''):
+        """
+        aiomysql pool for a user and database, created on first use. None if aiomysql is not installed.
+        """
+        aiomysql = _aiomysql()
+        if aiomysql is None:
+            return None
+        wrapper = self._require_wrapper()
+        if self._pools_lock is None:
+            self._pools_lock = asyncio.Lock()
+        key = (user, db_name)
+        async with self._pools_lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                params = wrapper.connection_params()
+                pool = await aiomysql.create_pool(minsize=self.pool_min_size, maxsize=self.pool_max_size, user=user,
+                                                  password=password, db=db_name, autocommit=False, **params)
+                self._pools[key] = pool
+                logger.debug(f"Created aiomysql pool for {user}@{db_name} over {params}")
+        return pool
+
+    def _execute_sync(self, query, params, db_name, user, password):
+        with self.wrapper.get_pool(db_name, user, password).connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, params)
+                result = cursor.fetchall() if cursor.description else cursor.rowcount
+            connection.commit()
+        return result
+
+    async def execute(self, query, params=None, db_name='testdb', user='root', password=''):
+        """
+        Execute a query and commit it. Unlike MariaDBWrapper.execute_query, errors are raised.
+
+        :param query: SQL query, with %s placeholders for params.
+        :param params: Optional query parameters.
+        :return: The fetched rows for statements returning a result set, the affected row count otherwise.
+        """
+        self._require_wrapper()
+        pool = await self.get_pool(db_name, user, password)
+        if pool is None:
+            return await self._run(self._execute_sync, query, params, db_name, user, password)
+        async with pool.acquire() as connection:
+            async with connection.cursor() as cursor:
+                try:
+                    await cursor.execute(query, params)
+                    result = await cursor.fetchall() if cursor.description else cursor.rowcount
+                    await connection.commit()
+                except BaseException:
+                    await connection.rollback()
+                    raise
+        return result
+
+    async def fetchone(self, query, params=None, db_name='testdb', user='root', password=''):
+        """
+        First row of a query, or None.
+        """
+        rows = await self.execute(query, params, db_name, user, password)
+        return rows[0] if rows else None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
@@ -0,0 +1,413 @@
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+import pymysql
+from loguru import logger
+
+from MariaDB4p.artifact_store import FileLock
+from MariaDB4p.exceptions import ServerStartError, ServerNotRunningError
+
+# Registry of the shared servers, one JSON file and one lock file per server name
+REGISTRY_DIR = Path(os.environ.get('MARIADB4P_BROKER_DIR', Path(Path.home(), '.cache', 'MariaDB4p', 'broker')))
+# Seconds between lease heartbeats
+HEARTBEAT_INTERVAL = 5
+# A lease without a heartbeat for this long is dropped, even if its pid still exists (pid reuse, hung process)
+LEASE_TIMEOUT = 30
+DEFAULT_START_TIMEOUT = 60
+DEFAULT_STOP_TIMEOUT = 30
+
+
+def pid_alive(pid):
+    """
+    Whether a process with this pid exists and is not a zombie.
+    """
+    if not pid or pid <= 0:
+        return False
+    if sys.platform == 'win32':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        # PROCESS_QUERY_LIMITED_INFORMATION
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            # STILL_ACTIVE
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == 259
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except (OSError, IndexError):
+        return True
+
+
+def process_cmdline(pid):
+    """
+    Command line of a process, or None where /proc is not available.
+    """
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return f.read().replace(b'\0', b' ').decode(errors='replace')
+    except OSError:
+        return None
+
+
+def server_alive(record):
+    """
+    Whether the server of a registry record still runs. Where the command line can be read, the pid must
+    belong to a server on the record's data directory, so a reused pid is not taken for the server.
+    """
+    pid = record.get('server_pid')
+    if not pid_alive(pid):
+        return False
+    cmdline = process_cmdline(pid)
+    return cmdline is None or f"--datadir={record['base_dir']}" in cmdline
+
+
+def lease_alive(lease, now, lease_timeout=LEASE_TIMEOUT):
+    return pid_alive(lease['pid']) and now - lease['heartbeat'] < lease_timeout
+
+
+def reap_leases(record, now=None, lease_timeout=LEASE_TIMEOUT):
+    """
+    Drop the leases of dead processes and leases whose heartbeat is older than lease_timeout.
+
+    :return: Ids of the dropped leases.
+    """
+    now = time.time() if now is None else now
+    stale = [lease_id for lease_id, lease in record['leases'].items() if not lease_alive(lease, now, lease_timeout)]
+    for lease_id in stale:
+        lease = record['leases'].pop(lease_id)
+        logger.warning(f"Dropped stale lease {lease_id} of pid {lease['pid']} on shared server {record['name']}")
+    return stale
+
+
+def stop_process(pid, timeout=DEFAULT_STOP_TIMEOUT):
+    """
+    Shut a server down with SIGTERM, killing it after the timeout. The process need not be a child.
+    """
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except OSError:
+        return
+    deadline = time.monotonic() + timeout
+    while pid_alive(pid):
+        if time.monotonic() >= deadline:
+            logger.warning(f"Shared server (pid {pid}) did not stop within {timeout}s, killing it")
+            try:
+                os.kill(pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+            except OSError:
+                pass
+            return
+        time.sleep(0.05)
+
+
+class Registry:
+    """
+    The registry file of one shared server, read and written under its lock.
+    """
+
+    def __init__(self, name, registry_dir=None):
+        self.name = name
+        self.registry_dir = Path(registry_dir or REGISTRY_DIR)
+        self.path = self.registry_dir / f'{name}.json'
+        self.lock = FileLock(self.registry_dir / f'{name}.lock')
+
+    def read(self):
+        """
+        :return: The record, or None if there is none or it is unreadable.
+        """
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def write(self, record):
+        tmp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        tmp_path.write_text(json.dumps(record, indent=2))
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def release_if_unused(registry, record, stop_timeout=DEFAULT_STOP_TIMEOUT):
+    """
+    Stop the server of a record and clear the registry once no lease is left. Called under the lock.
+
+    :return: True if the server was stopped.
+    """
+    if record['leases']:
+        registry.write(record)
+        return False
+    logger.info(f"Stopping shared server {record['name']} (pid {record['server_pid']}), no clients are left")
+    stop_process(record['server_pid'], stop_timeout)
+    registry.clear()
+    return True
+
+
+def watch(name, registry_dir=None, interval=HEARTBEAT_INTERVAL, lease_timeout=LEASE_TIMEOUT):
+    """
+    Watchdog of a shared server: stops it once every client has detached or died, and exits when the
+    server is gone. Started in its own process next to the server, so crashed clients are noticed too.
+    """
+    registry = Registry(name, registry_dir)
+    server_pid = None
+    while True:
+        with registry.lock:
+            record = registry.read()
+            if record is None or (server_pid is not None and record['server_pid'] != server_pid):
+                return
+            server_pid = record['server_pid']
+            if not server_alive(record):
+                logger.warning(f"Shared server {name} (pid {server_pid}) is gone, clearing its registry entry")
+                registry.clear()
+                return
+            reap_leases(record, lease_timeout=lease_timeout)
+            if release_if_unused(registry, record):
+                return
+        time.sleep(interval)
+
+
+class SharedServer:
+    """
+    A MariaDB server shared by the processes of one machine.
+
+    The first process to attach starts the server with the native backend in its own session and records its
+    port, socket, pid and data directory in a lock-protected registry file. Later processes find the record
+    and attach instantly. Every attached process holds a lease kept fresh by a heartbeat thread; the server
+    is stopped when the last lease is released, or by a watchdog process once the remaining clients died.
+    """
+
+    def __init__(self, name='default', registry_dir=None, heartbeat_interval=HEARTBEAT_INTERVAL,
+                 lease_timeout=LEASE_TIMEOUT, **wrapper_options):
+        """
+        :param name: Name of the shared server, processes using the same name share one server.
+        :param registry_dir: Registry directory, defaults to REGISTRY_DIR.
+        :param heartbeat_interval: Seconds between lease heartbeats.
+        :param lease_timeout: Seconds without heartbeat after which a lease is dropped.
+        :param wrapper_options: NativeMariaDBWrapper arguments used by the process that starts the server, e.g.
+            profile or server_args. port defaults to a free port, base_dir to a directory in the registry.
+            Processes attaching to a running server ignore them.
+        """
+        if lease_timeout <= heartbeat_interval:
+            raise ValueError("lease_timeout must be longer than heartbeat_interval.")
+        if 'base_dir' in wrapper_options and wrapper_options['base_dir'] is None:
+            # a wrapper without base_dir clones a temporary data directory that it deletes when collected
+            raise ValueError("A shared server needs a persistent base_dir, leave it out to use the registry's.")
+        self.registry = Registry(name, registry_dir)
+        self.name = name
+        self.heartbeat_interval = heartbeat_interval
+        self.lease_timeout = lease_timeout
+        self.wrapper_options = wrapper_options
+        self.lease_id = None
+        self.record = None
+        # Whether this process started the server
+        self.started = False
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat = None
+
+    @property
+    def port(self):
+        return self.record['port'] if self.record else None
+
+    @property
+    def socket_path(self):
+        return self.record['socket_path'] if self.record else None
+
+    @property
+    def base_dir(self):
+        return self.record['base_dir'] if self.record else None
+
+    @property
+    def server_pid(self):
+        return self.record['server_pid'] if self.record else None
+
+    def _start(self, timeout):
+        from MariaDB4p.mariadb_wrapper import find_free_port
+        from MariaDB4p.native import NativeMariaDBWrapper
+        options = dict(self.wrapper_options)
+        if options.get('port') is None:
+            options['port'] = find_free_port()
+        base_dir = Path(options.get('base_dir') or self.registry.registry_dir / self.name / 'data').absolute()
+        base_dir.mkdir(parents=True, exist_ok=True)
+        options['base_dir'] = str(base_dir)
+        wrapper = NativeMariaDBWrapper(detached=True, **options)
+        wrapper.start_server(timeout=timeout)
+        server_pid = wrapper.db.pid
+        # server_alive looks for exactly the --datadir argument of the server's command line
+        data_dir = str(wrapper.db.data_dir)
+        # the server now belongs to the registry, the wrapper must not stop it when collected
+        wrapper.db = None
+        wrapper.stop_server()
+        return {'name': self.name, 'port': wrapper.port, 'socket_path': wrapper.socket_path,
+                'base_dir': data_dir, 'server_pid': server_pid,
+                'owner_pid': os.getpid(), 'started': time.time(), 'watchdog_pid': None, 'leases': {}}
+
+    def _spawn_watchdog(self):
+        command = [sys.executable, '-m', 'MariaDB4p.broker', '--registry', str(self.registry.registry_dir),
+                   'watch', self.name, '--interval', str(self.heartbeat_interval),
+                   '--lease-timeout', str(self.lease_timeout)]
+        # the package may be used from a source checkout that is not installed
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(Path(__file__).parent.parent), env.get('PYTHONPATH')]))
+        process = subprocess.Popen(command, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL, start_new_session=True)
+        return process.pid
+
+    def attach(self, timeout=DEFAULT_START_TIMEOUT):
+        """
+        Attach to the shared server, starting it if no live one is registered.
+
+        :param timeout: Seconds to wait for a server started by this process to become ready.
+        :return: self
+        """
+        if self.lease_id is not None:
+            return self
+        with self.registry.lock:
+            record = self.registry.read()
+            if record is not None and not server_alive(record):
+                logger.warning(f"Shared server {self.name} (pid {record['server_pid']}) is gone, starting a new one")
+                record = None
+            self.started = record is None
+            if record is None:
+                try:
+                    record = self._start(timeout)
+                except Exception as e:
+                    raise ServerStartError(f"Failed to start shared server {self.name}: {e}") from e
+            else:
+                reap_leases(record, lease_timeout=self.lease_timeout)
+            self.lease_id = uuid.uuid4().hex
+            record['leases'][self.lease_id] = {'pid': os.getpid(), 'heartbeat': time.time()}
+            if self.started or not pid_alive(record.get('watchdog_pid')):
+                record['watchdog_pid'] = self._spawn_watchdog()
+            self.registry.write(record)
+            self.record = record
+        self._stop_heartbeat.clear()
+        self._heartbeat = threading.Thread(target=self._beat, name=f'mariadb4p-lease-{self.name}', daemon=True)
+        self._heartbeat.start()
+        logger.info(f"{'Started' if self.started else 'Attached to'} shared server {self.name} on port "
+                    f"{self.port} (pid {self.server_pid}), lease {self.lease_id}")
+        return self
+
+    def _beat(self):
+        while not self._stop_heartbeat.wait(self.heartbeat_interval):
+            try:
+                with self.registry.lock:
+                    record = self.registry.read()
+                    if record is None or record['server_pid'] != self.server_pid:
+                        logger.error(f"Shared server {self.name} (pid {self.server_pid}) is no longer registered")
+                        return
+                    # a lease dropped while this process was suspended is renewed
+                    record['leases'][self.lease_id] = {'pid': os.getpid(), 'heartbeat': time.time()}
+                    self.registry.write(record)
+            except Exception as e:
+                logger.warning(f"Lease heartbeat for shared server {self.name} failed: {e}")
+
+    def detach(self, stop_timeout=DEFAULT_STOP_TIMEOUT):
+        """
+        Release this process's lease, stopping the server if it was the last one.
+
+        :return: True if the server was stopped.
+        """
+        if self.lease_id is None:
+            return False
+        self._stop_heartbeat.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        lease_id, self.lease_id = self.lease_id, None
+        with self.registry.lock:
+            record = self.registry.read()
+            if record is None or record['server_pid'] != self.server_pid:
+                return False
+            record['leases'].pop(lease_id, None)
+            reap_leases(record, lease_timeout=self.lease_timeout)
+            return release_if_unused(self.registry, record, stop_timeout)
+
+    def connection_params(self):
+        if self.record is None:
+            raise ServerNotRunningError(f"Not attached to shared server {self.name}.")
+        if self.socket_path and os.path.exists(self.socket_path):
+            return {'unix_socket': self.socket_path}
+        return {'host': 'localhost', 'port': self.port}
+
+    def connect(self, user='root', password='', database=None, **kwargs):
+        """
+        Open a pymysql connection to the shared server.
+        """
+        return pymysql.connect(user=user, password=password, database=database, **self.connection_params(), **kwargs)
+
+    def __enter__(self):
+        return self.attach()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.detach()
+
+
+def status(name, registry_dir=None):
+    """
+    Registry record of a shared server with 'alive' flags for the server and each lease, or None.
+    """
+    registry = Registry(name, registry_dir)
+    with registry.lock:
+        record = registry.read()
+    if record is None:
+        return None
+    now = time.time()
+    record['alive'] = server_alive(record)
+    for lease in record['leases'].values():
+        lease['alive'] = lease_alive(lease, now)
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m MariaDB4p.broker', description='Manage shared MariaDB servers.')
+    parser.add_argument('--registry', default=None, help=f'Registry directory (default: {REGISTRY_DIR})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    status_parser = commands.add_parser('status', help='Print the registry record of a shared server.')
+    status_parser.add_argument('name', nargs='?', default='default')
+    stop_parser = commands.add_parser('stop', help='Stop a shared server regardless of its leases.')
+    stop_parser.add_argument('name', nargs='?', default='default')
+    watch_parser = commands.add_parser('watch', help='Stop a shared server once no live client is left.')
+    watch_parser.add_argument('name', nargs='?', default='default')
+    watch_parser.add_argument('--interval', type=float, default=HEARTBEAT_INTERVAL)
+    watch_parser.add_argument('--lease-timeout', type=float, default=LEASE_TIMEOUT)
+    args = parser.parse_args(argv)
+
+    if args.command == 'status':
+        record = status(args.name, args.registry)
+        print(json.dumps(record, indent=2) if record else f"No shared server {args.name}")
+    elif args.command == 'stop':
+        registry = Registry(args.name, args.registry)
+        with registry.lock:
+            record = registry.read()
+            if record is not None:
+                if server_alive(record):
+                    stop_process(record['server_pid'])
+                registry.clear()
+    else:
+        watch(args.name, args.registry, args.interval, args.lease_timeout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,271 @@
+import os
+import sys
+import csv
+import time
+import tempfile
+import threading
+from pathlib import Path
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+# Rows per executemany batch, pymysql turns each batch into multi-row INSERT statements
+DEFAULT_BATCH_SIZE = 5000
+_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def quote_identifier(name):
+    """
+    Quote a table or column name with backticks, 'db.table' is quoted as two identifiers.
+    """
+    return '.'.join('`' + part.replace('`', '``') + '`' for part in str(name).split('.'))
+
+
+def format_value(value):
+    """
+    Encode a value for the tab-separated format used with LOAD DATA, None becomes \\N.
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    elif not isinstance(value, str):
+        try:
+            # NaN from DataFrames is NULL
+            if value != value:
+                return '\\N'
+        except (TypeError, ValueError):
+            pass
+        value = str(value)
+    return value.translate(_ESCAPES)
+
+
+def write_rows(rows, file):
+    """
+    Write rows as LOAD DATA tab-separated lines to a text file object.
+
+    :return: Number of rows written.
+    """
+    count = 0
+    for row in rows:
+        file.write('\t'.join(map(format_value, row)))
+        file.write('\n')
+        count += 1
+    return count
+
+
+def _is_dataframe(source):
+    return hasattr(source, 'itertuples') and hasattr(source, 'columns')
+
+
+def _batches(rows, batch_size):
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _load_data_sql(connection, table, path, columns, fields='TAB', skip_lines=0, line_terminator='\n'):
+    if fields == 'TAB':
+        format_clause = "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n'"
+    else:
+        delimiter, quotechar = fields
+        format_clause = (f"FIELDS TERMINATED BY {connection.escape(delimiter)} OPTIONALLY ENCLOSED BY "
+                         f"{connection.escape(quotechar)} ESCAPED BY '' "
+                         f"LINES TERMINATED BY {connection.escape(line_terminator)}")
+    sql = f"LOAD DATA LOCAL INFILE {connection.escape(str(path))} INTO TABLE {quote_identifier(table)} " \
+          f"CHARACTER SET utf8mb4 {format_clause}"
+    if skip_lines:
+        sql += f" IGNORE {skip_lines} LINES"
+    if columns:
+        sql += ' (' + ', '.join(quote_identifier(column) for column in columns) + ')'
+    return sql
+
+
+def _line_terminator(path):
+    # CSV files written on Windows end their lines with CRLF, LOAD DATA would keep the CR in the last field
+    with open(path, 'rb') as f:
+        head = f.read(64 * 1024)
+    return '\r\n' if b'\r\n' in head else '\n'
+
+
+def _set_checks(cursor, table, enabled, disable_keys):
+    value = 1 if enabled else 0
+    cursor.execute(f"SET SESSION unique_checks={value}, foreign_key_checks={value}")
+    if disable_keys:
+        cursor.execute(f"ALTER TABLE {quote_identifier(table)} {'ENABLE' if enabled else 'DISABLE'} KEYS")
+
+
+def _load_infile(connection, table, source, columns, header, delimiter, quotechar, disable_keys):
+    with connection.cursor() as cursor:
+        if disable_keys:
+            _set_checks(cursor, table, False, True)
+        try:
+            if isinstance(source, (str, Path)):
+                cursor.execute(_load_data_sql(connection, table, Path(source).resolve(), columns,
+                                              (delimiter, quotechar), skip_lines=1 if header else 0,
+                                              line_terminator=_line_terminator(source)))
+                rows = cursor.rowcount
+            else:
+                rows = _load_stream(connection, cursor, table, source, columns)
+            connection.commit()
+        finally:
+            if disable_keys:
+                _set_checks(cursor, table, True, True)
+    return rows
+
+
+def _load_stream(connection, cursor, table, rows, columns):
+    # rows are written by a thread into a FIFO that the client streams to the server, so memory stays
+    # bounded and nothing touches the disk. Without FIFOs a temporary file is used.
+    tmp_dir = tempfile.mkdtemp(prefix='mariadb4p_load_')
+    path = Path(tmp_dir, 'rows.tsv')
+    try:
+        if sys.platform == 'win32' or not hasattr(os, 'mkfifo'):
+            with open(path, 'w', encoding='utf-8', newline='\n') as f:
+                write_rows(rows, f)
+            cursor.execute(_load_data_sql(connection, table, path, columns))
+            return cursor.rowcount
+
+        os.mkfifo(path)
+        errors = []
+
+        def produce():
+            try:
+                with open(path, 'w', encoding='utf-8', newline='\n') as f:
+                    write_rows(rows, f)
+            except Exception as e:
+                errors.append(e)
+
+        writer = threading.Thread(target=produce, name='mariadb4p-bulk-load', daemon=True)
+        writer.start()
+        try:
+            cursor.execute(_load_data_sql(connection, table, path, columns))
+        finally:
+            # a writer still waiting in open() for a reader the server never provided is woken by opening the
+            # read end, without blocking if the writer is already done, and then fails on the closed pipe
+            while writer.is_alive():
+                os.close(os.open(path, os.O_RDONLY | os.O_NONBLOCK))
+                writer.join(0.1)
+        if errors:
+            raise errors[0]
+        return cursor.rowcount
+    finally:
+        if path.exists():
+            path.unlink()
+        os.rmdir(tmp_dir)
+
+
+def _load_batches(connection, table, rows, columns, batch_size, disable_keys):
+    loaded = 0
+    with connection.cursor() as cursor:
+        if disable_keys:
+            _set_checks(cursor, table, False, True)
+        try:
+            for batch in _batches(rows, batch_size):
+                if columns is None:
+                    placeholders = ', '.join(['%s'] * len(batch[0]))
+                    sql = f"INSERT INTO {quote_identifier(table)} VALUES ({placeholders})"
+                else:
+                    placeholders = ', '.join(['%s'] * len(columns))
+                    sql = f"INSERT INTO {quote_identifier(table)} ({', '.join(map(quote_identifier, columns))}) VALUES ({placeholders})"
+                cursor.executemany(sql, batch)
+                connection.commit()
+                loaded += len(batch)
+        finally:
+            if disable_keys:
+                _set_checks(cursor, table, True, True)
+    return loaded
+
+
+def _csv_rows(path, header, delimiter, quotechar):
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter=delimiter, quotechar=quotechar)
+        if header:
+            next(reader, None)
+        # empty fields stay empty strings, as LOAD DATA reads them
+        yield from reader
+
+
+def _csv_header(path, delimiter, quotechar):
+    with open(path, newline='', encoding='utf-8') as f:
+        return next(csv.reader(f, delimiter=delimiter, quotechar=quotechar), None)
+
+
+def _local_infile_enabled(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT @@GLOBAL.local_infile")
+        row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def bulk_load(wrapper, table, rows_or_path, db_name='testdb', user='root', password='', columns=None, method='auto',
+              batch_size=DEFAULT_BATCH_SIZE, header=True, delimiter=',', quotechar='"', disable_keys=False):
+    """
+    Load many rows into a table.
+
+    :param wrapper: MariaDBWrapper of the running server.
+    :param table: Table name.
+    :param rows_or_path: Iterable of row tuples, path of a CSV file, or a pandas DataFrame.
+    :param db_name: Database name.
+    :param user: Username for authentication.
+    :param password: Password for authentication.
+    :param columns: Column names the values map to. Defaults to the CSV header or DataFrame columns.
+    :param method: 'infile' for LOAD DATA LOCAL INFILE, 'batch' for multi-row INSERT batches, or 'auto' to use
+        LOAD DATA whenever the server allows it. Both read empty CSV fields as empty strings and accept LF or
+        CRLF line endings.
+    :param batch_size: Rows per INSERT batch.
+    :param header: Whether the CSV file starts with a header line.
+    :param delimiter: CSV field delimiter.
+    :param quotechar: CSV quote character.
+    :param disable_keys: Turn off unique and foreign key checks and non-unique index maintenance during the load.
+    :return: dict with 'table', 'method', 'rows', 'seconds' and 'rows_per_second'.
+    """
+    start = time.perf_counter()
+    source = rows_or_path
+    if _is_dataframe(source):
+        if columns is None:
+            columns = [str(column) for column in source.columns]
+        source = source.itertuples(index=False, name=None)
+    elif isinstance(source, (str, Path)) and header and columns is None:
+        columns = _csv_header(source, delimiter, quotechar)
+
+    connection = wrapper._connect(user=user, password=password, database=db_name, local_infile=True)
+    try:
+        if method == 'auto':
+            method = 'infile' if _local_infile_enabled(connection) else 'batch'
+        if method == 'infile':
+            rows = _load_infile(connection, table, source, columns, header, delimiter, quotechar, disable_keys)
+        elif method == 'batch':
+            if isinstance(source, (str, Path)):
+                source = _csv_rows(source, header, delimiter, quotechar)
+            rows = _load_batches(connection, table, source, columns, batch_size, disable_keys)
+        else:
+            raise ValueError(f"Unknown bulk load method: {method}")
+    finally:
+        connection.close()
+
+    seconds = time.perf_counter() - start
+    report = {'table': table, 'method': method, 'rows': rows, 'seconds': seconds,
+              'rows_per_second': rows / seconds if seconds > 0 else float('inf')}
+    logger.info(f"Loaded {rows} rows into {table} with {method} in {seconds:.2f}s ({report['rows_per_second']:.0f} rows/s)")
+    return report
+
+
+def bulk_load_many(wrapper, sources, parallel=4, **options):
+    """
+    Load several tables concurrently, one connection per table.
+
+    :param wrapper: MariaDBWrapper of the running server.
+    :param sources: dict of table name to rows_or_path, see bulk_load.
+    :param parallel: Maximum number of tables loaded at the same time.
+    :param options: Keyword arguments passed to bulk_load.
+    :return: List of bulk_load reports, in the order of sources.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, parallel), thread_name_prefix='mariadb4p-load') as executor:
+        futures = [executor.submit(bulk_load, wrapper, table, source, **options) for table, source in sources.items()]
+        return [future.result() for future in futures]
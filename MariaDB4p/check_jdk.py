@@ -1,52 +1,155 @@
 import jdk
-import sys
+import re
+import json
+import shutil
+import threading
 import subprocess
 import os
 from pathlib import Path
 from loguru import logger
 import traceback
+
+from MariaDB4p.exceptions import JDKInstallError
+
+# Cache of JDK probes, keyed on the java executable's real path, mtime and size
+JDK_PROBE_CACHE = Path(__file__).parent / 'jdk_probe.json'
+_probes = {}
+_probes_lock = threading.Lock()
+
+
+def parse_java_version(version):
+    """
+    Major version of a Java version string, e.g. 17 for '17.0.8' and 8 for '1.8.0_392'.
+    """
+    parts = re.split(r'[._+-]', version.strip().strip('"'))
+    if parts[0] == '1' and len(parts) > 1:
+        return int(parts[1])
+    return int(parts[0])
+
+
 def get_jdk_version(executable='java'):
     """
     Returns the installed JDK version or None if JDK is not installed.
     """
     try:
-        result = subprocess.run([executable, '-version'], capture_output=True, text=True)
+        result = subprocess.run([str(executable), '-version'], capture_output=True, text=True)
         if result.returncode == 0:
             version_line = result.stderr.split('\n')[0]  # Typically, version info is in stderr
-            version = int(version_line.split()[2].strip('"').split('.')[0])
+            version = parse_java_version(version_line.split()[2])
             logger.info(f"Installed JDK version: {version}")
             return version
         else:
             logger.info("Failed to determine JDK version.")
             return 0
-    except FileNotFoundError:
+    except (FileNotFoundError, PermissionError):
         logger.info("JDK is not installed.")
         return 0
+    except (IndexError, ValueError):
+        logger.info("Failed to parse JDK version.")
+        return 0
+
+
+def read_release_version(java_home):
+    """
+    Read the major version from the JDK's release file, without starting java.
+
+    :return: The major version, or None if there is no readable release file.
+    """
+    try:
+        for line in Path(java_home, 'release').read_text().splitlines():
+            if line.startswith('JAVA_VERSION='):
+                return parse_java_version(line.split('=', 1)[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _find_executable(executable):
+    found = shutil.which(str(executable))
+    if found is None and Path(executable).exists():
+        found = str(executable)
+    if found is None:
+        return None
+    return os.path.realpath(found)
+
+
+def _load_probe_cache():
+    try:
+        return json.loads(JDK_PROBE_CACHE.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_probe(key, probe):
+    cache = _load_probe_cache()
+    cache[key] = probe
+    try:
+        JDK_PROBE_CACHE.write_text(json.dumps(cache, indent=2))
+    except OSError as e:
+        logger.debug(f"Cannot write JDK probe cache {JDK_PROBE_CACHE}: {e}")
+
+
+def probe_jdk(executable='java'):
+    """
+    Find the version and JAVA_HOME of a java executable.
+
+    Results are cached in memory and in JDK_PROBE_CACHE, keyed on the executable's real path, mtime and
+    size. On a miss the JDK's release file is read, and java -version only runs if that is missing.
+
+    :param executable: Name or path of the java executable.
+    :return: dict with 'java', 'java_home' and 'version', or None if java is not found.
+    """
+    real_path = _find_executable(executable)
+    if real_path is None:
+        return None
+    stat = os.stat(real_path)
+    key = f"{real_path}|{stat.st_mtime_ns}|{stat.st_size}"
+    with _probes_lock:
+        if key in _probes:
+            return _probes[key]
+    probe = _load_probe_cache().get(key)
+    if probe is None:
+        java_home = str(Path(real_path).parent.parent)
+        version = read_release_version(java_home)
+        if version is None:
+            version = get_jdk_version(real_path)
+        if not version:
+            return None
+        probe = {'java': real_path, 'java_home': java_home, 'version': version}
+        _save_probe(key, probe)
+    with _probes_lock:
+        _probes[key] = probe
+    return probe
+
 
 def is_jdk_installed(target_version=17):
     """
-    Check if JDK is installed by attempting to run 'java -version'.
+    Check if JDK is installed, looking at path.config, java on the PATH and JAVA_HOME in that order.
+
+    :return: The java executable of the matching JDK, or None.
     """
     current_dir=Path(__file__).parent    
     logger.debug(f'current_dir:{current_dir}')
+    target_version = int(target_version)
     if Path(current_dir, 'path.config').exists():
-        logger.debug(f'Found path.config: {str( )}')
         java_exe=Path(Path(current_dir,'path.config').read_text().strip())
-        path_config=java_exe.parent.parent
-        logger.debug(f'jvm has been installed at: {path_config}')
-        if path_config.exists() and get_jdk_version(java_exe)==target_version:
-            logger.info(f'jdk has been installed to: {str(path_config)}')
-            os.environ['JAVA_HOME']=str(path_config)
+        logger.debug(f'Found path.config: {java_exe}')
+        probe = probe_jdk(java_exe)
+        if probe is not None and probe['version']==target_version:
+            logger.info(f"jdk has been installed to: {probe['java_home']}")
+            os.environ['JAVA_HOME']=probe['java_home']
             return java_exe
-    elif get_jdk_version()==target_version:
+    probe = probe_jdk('java')
+    if probe is not None and probe['version']==target_version:
         return 'java'
-    elif 'JAVA_HOME'  in os.environ and len(os.environ['JAVA_HOME'])>0:
+    if 'JAVA_HOME'  in os.environ and len(os.environ['JAVA_HOME'])>0:
         logger.info(f"jdk has been installed to:{os.environ['JAVA_HOME']}")
-        if not Path(current_dir, 'path.config').exists():
-            java_exe=str(Path(os.environ['JAVA_HOME'],'bin','java'))
-            if get_jdk_version(java_exe)==target_version:
+        java_exe=str(Path(os.environ['JAVA_HOME'],'bin','java'))
+        probe = probe_jdk(java_exe)
+        if probe is not None and probe['version']==target_version:
+            if not Path(current_dir, 'path.config').exists():
                 Path(current_dir, 'path.config').write_text(java_exe)
-                return str(Path(os.environ['JAVA_HOME'], 'bin','java'))     
+            return java_exe
 
     logger.info(f"JDK{target_version} is not installed.")
     return None
@@ -64,16 +167,16 @@ def install_jdk_if_missing(target_version=17, install_dir=''):
     if is_jdk_installed(target_version) is None:
         logger.info(f"Installing JDK {target_version}...")
         try:
-            # Install JDK 17 from Adoptium
-            install_dir=jdk.install('17', vendor='adoptium', path=install_dir)
+            # Install the target JDK from Adoptium
+            install_dir=jdk.install(str(target_version), vendor='adoptium', path=install_dir)
             logger.info(f"JDK installed successfully to {install_dir}.")
             os.environ['JAVA_HOME']=install_dir
             logger.info('No permanent environmental variables have been configured. To uninstall, you can simply remove the directory.')
             Path(current_dir, 'path.config').write_text(str(Path(install_dir,'bin','java')))
         except Exception as e:
             tb_str = traceback.format_exc()
-            logger.error(f"Failed to install JDK: {install_dir}\n {str(e)}\nTraceback:\n{tb_str}")            
-            sys.exit(1)
+            logger.error(f"Failed to install JDK: {install_dir}\n {str(e)}\nTraceback:\n{tb_str}")
+            raise JDKInstallError(f"Failed to install JDK {target_version} to {install_dir}: {e}") from e
     else:
         logger.info("Skipping JDK installation.")
     return install_dir
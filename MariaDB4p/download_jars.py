@@ -1,11 +1,21 @@
 import os
+import json
+import hashlib
+import shutil
+import threading
+import time
+import http.client
+import urllib.error
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import xml.etree.ElementTree as ET
-from urllib.parse import quote
+from urllib.parse import quote, urlsplit
 import re
 from loguru import logger
 
+from MariaDB4p.pom_model import PomCache
+from MariaDB4p.artifact_store import ArtifactStore, default_store
+
 # Directory to store downloaded JARs
 mariadb4y_root=Path(__file__).parent.parent
 DEPENDENCIES_DIR = Path(mariadb4y_root, "mariadb4j_jars")
@@ -13,12 +23,141 @@ DEPENDENCIES_DIR = Path(mariadb4y_root, "mariadb4j_jars")
 
 # Maven Central Base URL
 MAVEN_CENTRAL = "https://repo1.maven.org/maven2/"
+# Repository used for downloads, can point to a mirror (http(s):// or file://)
+MAVEN_REPOSITORY = os.environ.get('MARIADB4P_MAVEN_REPOSITORY', MAVEN_CENTRAL)
+
+# Lockfile listing the resolved classpath
+LOCKFILE_NAME = 'classpath.lock.json'
+DEFAULT_POM_FILE = Path(__file__).parent / 'pom.xml'
+DEFAULT_DEPENDENCIES = [
+    ("ch.vorburger.mariaDB4j", "mariaDB4j", "3.1.0")
+]
+
+# Number of concurrent downloads used by the resolver
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_RETRIES = 3
+
+# Per-thread keep-alive connections, keyed by (scheme, host)
+_connections = threading.local()
 
 # Function to construct the Maven Central URL for a given artifact
-def construct_maven_url(group_id, artifact_id, version, file_type="jar"):
+def construct_maven_url(group_id, artifact_id, version, file_type="jar", repository=MAVEN_REPOSITORY):
     group_path = group_id.replace('.', '/')
     artifact_path = f"{group_path}/{artifact_id}/{version}/{artifact_id}-{version}.{file_type}"
-    return MAVEN_CENTRAL + artifact_path
+    if not repository.endswith('/'):
+        repository += '/'
+    return repository + artifact_path
+
+
+class DownloadError(Exception):
+    """
+    Raised when a download fails with a status that should not be retried.
+    """
+
+
+def _get_connection(scheme, netloc, timeout):
+    """
+    Return a keep-alive connection to the given host, reusing the one owned by the current thread.
+    """
+    pool = getattr(_connections, 'pool', None)
+    if pool is None:
+        pool = _connections.pool = {}
+    key = (scheme, netloc)
+    connection = pool.get(key)
+    if connection is None:
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        connection = connection_class(netloc, timeout=timeout)
+        pool[key] = connection
+    return connection
+
+
+def _drop_connection(scheme, netloc):
+    pool = getattr(_connections, 'pool', {})
+    connection = pool.pop((scheme, netloc), None)
+    if connection is not None:
+        connection.close()
+
+
+def _http_get(url, tmp_dest, timeout):
+    parts = urlsplit(url)
+    path = parts.path + ('?' + parts.query if parts.query else '')
+    connection = _get_connection(parts.scheme, parts.netloc, timeout)
+    try:
+        connection.request('GET', path, headers={'Connection': 'keep-alive'})
+        response = connection.getresponse()
+    except (http.client.HTTPException, OSError):
+        _drop_connection(parts.scheme, parts.netloc)
+        raise
+    if response.status != 200:
+        response.read()
+        if response.will_close:
+            _drop_connection(parts.scheme, parts.netloc)
+        if response.status in (301, 302, 303, 307, 308) and response.getheader('Location'):
+            return _urllib_get(response.getheader('Location'), tmp_dest, timeout)
+        if 400 <= response.status < 500:
+            raise DownloadError(f"HTTP {response.status} for {url}")
+        raise OSError(f"HTTP {response.status} for {url}")
+    with open(tmp_dest, 'wb') as f:
+        shutil.copyfileobj(response, f, 1024 * 1024)
+    if response.will_close:
+        _drop_connection(parts.scheme, parts.netloc)
+    return tmp_dest.stat().st_size
+
+
+def _urllib_get(url, tmp_dest, timeout):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response, open(tmp_dest, 'wb') as f:
+            shutil.copyfileobj(response, f, 1024 * 1024)
+    except urllib.error.HTTPError as e:
+        if 400 <= e.code < 500:
+            raise DownloadError(f"HTTP {e.code} for {url}")
+        raise
+    except urllib.error.URLError as e:
+        if isinstance(e.reason, FileNotFoundError):
+            raise DownloadError(f"Not found: {url}")
+        raise
+    return tmp_dest.stat().st_size
+
+
+def fetch_url(url, dest, retries=DEFAULT_RETRIES, timeout=60, backoff=0.5):
+    """
+    Download a URL to dest, reusing per-host connections and retrying transient failures.
+
+    :param url: http(s):// or file:// URL.
+    :param dest: Destination path. The file is written to a temporary name first and moved into place.
+    :param retries: Number of additional attempts after a transient failure.
+    :param timeout: Socket timeout in seconds.
+    :param backoff: Base delay in seconds between attempts, doubled after each failure.
+    :return: Number of bytes written, 0 if dest already exists, or None if the download failed.
+    """
+    dest = Path(dest)
+    if dest.exists():
+        logger.debug(f"Already downloaded: {dest}")
+        return 0
+    tmp_dest = dest.with_name(f"{dest.name}.{os.getpid()}.{threading.get_ident()}.part")
+    scheme = urlsplit(url).scheme
+    for attempt in range(retries + 1):
+        try:
+            if scheme in ('http', 'https'):
+                size = _http_get(url, tmp_dest, timeout)
+            else:
+                size = _urllib_get(url, tmp_dest, timeout)
+            os.replace(tmp_dest, dest)
+            logger.debug(f"Downloaded: {dest} ({size} bytes)")
+            return size
+        except DownloadError as e:
+            logger.debug(str(e))
+            break
+        except Exception as e:
+            if attempt < retries:
+                logger.debug(f"Retrying {url} after error: {e}")
+                time.sleep(backoff * (2 ** attempt))
+            else:
+                logger.warning(f"Failed to download {url}: {e}")
+        finally:
+            if tmp_dest.exists():
+                tmp_dest.unlink()
+    return None
 
 # Function to download a file from a URL
 def download_file(url, dest):
@@ -26,13 +165,17 @@ def download_file(url, dest):
         logger.info(f"Already downloaded: {dest}")
         return True
     logger.info(f"Downloading {url} to {dest}...")
-    try:
-        urllib.request.urlretrieve(url, dest)
-        logger.info(f"Downloaded: {dest}")
-        return True
-    except Exception as e:
+    if fetch_url(url, dest) is None:
         logger.warning(f"Failed to download {url}")
-    return False
+        return False
+    logger.info(f"Downloaded: {dest}")
+    return True
+
+# Function to fetch one artifact file, through the shared store if one is used
+def fetch_artifact_file(group_id, artifact_id, version, file_type, dest, repository=MAVEN_REPOSITORY, retries=DEFAULT_RETRIES, store=None):
+    if store is not None:
+        return store.fetch(group_id, artifact_id, version, file_type, dest, repository, retries=retries)
+    return fetch_url(construct_maven_url(group_id, artifact_id, version, file_type, repository), dest, retries=retries)
 
 # Function to resolve properties in text
 def resolve_properties(text, properties):
@@ -52,133 +195,69 @@ def resolve_properties(text, properties):
         text = text.replace(match.group(0), prop_value)
     return text
 
+# Function to build a POM cache that fetches parent and BOM POMs into dependencies_dir
+def make_pom_cache(dependencies_dir=DEPENDENCIES_DIR, repository=MAVEN_REPOSITORY, retries=DEFAULT_RETRIES, store=None):
+    def fetch_pom(group_id, artifact_id, version):
+        pom_dest = Path(dependencies_dir, f"{artifact_id}-{version}.pom")
+        if fetch_artifact_file(group_id, artifact_id, version, "pom", pom_dest, repository, retries, store) is None:
+            return None
+        return pom_dest
+    return PomCache(fetch_pom)
+
+
 # Function to parse pom.xml and extract dependencies and properties
-def parse_pom(pom_path, properties):
-    logger.debug(f"Parsing POM: {pom_path}")
-    try:
-        tree = ET.parse(pom_path)
-        root = tree.getroot()
-        ns = {'m': 'http://maven.apache.org/POM/4.0.0'}
-
-        # Update properties with those defined in this POM
-        properties_element = root.find('m:properties', ns)
-        if properties_element is not None:
-            for prop in properties_element:
-                prop_name = prop.tag.replace('{http://maven.apache.org/POM/4.0.0}', '')
-                prop_value = prop.text
-                properties[prop_name] = resolve_properties(prop_value, properties)
-
-        # Set default properties
-        group_id_element = root.find('m:groupId', ns)
-        if group_id_element is not None:
-            properties['project.groupId'] = group_id_element.text
-        else:
-            # Try to get from parent
-            parent = root.find('m:parent', ns)
-            if parent is not None:
-                parent_group_id = parent.find('m:groupId', ns).text
-                properties['project.groupId'] = resolve_properties(parent_group_id, properties)
-
-        version_element = root.find('m:version', ns)
-        if version_element is not None:
-            properties['project.version'] = version_element.text
-        else:
-            # Try to get from parent
-            parent = root.find('m:parent', ns)
-            if parent is not None:
-                parent_version = parent.find('m:version', ns).text
-                properties['project.version'] = resolve_properties(parent_version, properties)
-
-
-        # Parse dependencies
-        dependencies = []
-        for dep in root.findall('.//m:dependencies/m:dependency', ns):
-            group_id_element = dep.find('m:groupId', ns)
-            artifact_id_element = dep.find('m:artifactId', ns)
-            version_element = dep.find('m:version', ns)
-            scope_element = dep.find('m:scope', ns)
-            optional_element = dep.find('m:optional', ns)
-
-            # Ensure elements are not None
-            if group_id_element is None or artifact_id_element is None:
-                logger.warning("Dependency missing groupId or artifactId. Skipping.")
-                continue
-
-            if 'junit' in group_id_element or 'junit' in artifact_id_element or 'maven' in artifact_id_element:
-                continue
-
-            group_id = resolve_properties(group_id_element.text, properties)
-            artifact_id = resolve_properties(artifact_id_element.text, properties)
-
-            if version_element is not None and version_element.text is not None:
-                version = resolve_properties(version_element.text, properties)
-            else:
-                # Try to get version from dependency management
-                version = get_version_from_dependency_management(root, group_id, artifact_id, properties, ns)
-                if version is None:
-                    # Attempt to get the latest version from Maven Central
-                    version = get_latest_version_from_maven_central(group_id, artifact_id)
-                    if version is None:
-                        logger.warning(f"No version specified for dependency {group_id}:{artifact_id} and failed to resolve from Maven Central. Skipping.")
-                        continue
-                    else:
-                        logger.info(f"Resolved latest version for {group_id}:{artifact_id} as {version}")
-
-            # Process scope and optional as before
-            scope = scope_element.text if scope_element is not None else 'compile'
-            if scope in ['test', 'provided']:
-                continue  # Skip test and provided scopes
-
-            if optional_element is not None and optional_element.text == 'true':
-                continue  # Skip optional dependencies
-
-            dependencies.append((group_id, artifact_id, version))
-
-        # Handle modules
-        modules = []
-        # for module in root.findall('.//m:module', ns):
-        #     if module.text:
-        #         module_name = module.text.strip()
-        #         modules.append(module_name)
-        #         logger.info(f"Found module: {module_name}")
-
-        # # Parse dependencies in dependencyManagement
-        # dependency_management = root.find('m:dependencyManagement', ns)
-        # if dependency_management is not None:
-        #     managed_dependencies = dependency_management.findall('./m:dependencies/m:dependency', ns)
-        #     for dep in managed_dependencies:
-        #         group_id_elem = dep.find('m:groupId', ns)
-        #         artifact_id_elem = dep.find('m:artifactId', ns)
-        #         version_elem = dep.find('m:version', ns)
-
-        #         if group_id_elem is not None and artifact_id_elem is not None and version_elem is not None:
-        #             group_id = resolve_properties(group_id_elem.text, properties)
-        #             artifact_id = resolve_properties(artifact_id_elem.text, properties)
-        #             version = resolve_properties(version_elem.text, properties)
-        #             # Store managed version
-        #             properties[f'{group_id}:{artifact_id}:version'] = version
-        #             logger.debug(f"Managed dependency: {group_id}:{artifact_id}:{version}")
-
-        return dependencies, modules
-    except ET.ParseError as e:
-        logger.error(f"Failed to parse {pom_path}: {e}")
-        return []
-
-# Function to get version from dependencyManagement
-def get_version_from_dependency_management(root, group_id, artifact_id, properties, ns):
-    dependency_management = root.find('m:dependencyManagement', ns)
-    if dependency_management is not None:
-        dependencies = dependency_management.findall('.//m:dependency', ns)
-        for dep in dependencies:
-            dm_group_id = dep.find('m:groupId', ns)
-            dm_artifact_id = dep.find('m:artifactId', ns)
-            dm_version = dep.find('m:version', ns)
-            if dm_group_id is not None and dm_artifact_id is not None and dm_version is not None:
-                dm_group_id_text = resolve_properties(dm_group_id.text, properties)
-                dm_artifact_id_text = resolve_properties(dm_artifact_id.text, properties)
-                if dm_group_id_text == group_id and dm_artifact_id_text == artifact_id:
-                    return resolve_properties(dm_version.text, properties)
-    return None
+def parse_pom(pom_path, properties, pom_cache=None, lookup_latest=False):
+    """
+    Extract the runtime dependencies of a POM.
+
+    Versions come from the POM itself, its parent chain or imported BOMs. Querying search.maven.org for
+    dependencies that are still unversioned is opt-in through lookup_latest.
+
+    :param pom_path: Path of the POM file.
+    :param properties: dict updated with the resolved properties of the POM.
+    :param pom_cache: PomCache used to load the POM and its parents. A new one fetching into the POM's
+        directory is created if not given.
+    :param lookup_latest: Resolve dependencies without a version to the latest release on Maven Central.
+    :return: Tuple of ([(group_id, artifact_id, version), ...], modules).
+    """
+    if pom_cache is None:
+        pom_cache = make_pom_cache(Path(pom_path).parent)
+    model = pom_cache.load(pom_path)
+    if model is None:
+        return [], []
+    properties.update(model.properties)
+
+    dependencies = []
+    for dep in model.dependencies:
+        group_id = dep['group_id']
+        artifact_id = dep['artifact_id']
+        # Ensure elements are not None
+        if group_id is None or artifact_id is None:
+            logger.warning("Dependency missing groupId or artifactId. Skipping.")
+            continue
+        if 'junit' in group_id or 'junit' in artifact_id or 'maven' in artifact_id:
+            continue
+        scope = dep['scope'] or 'compile'
+        if scope in ['test', 'provided', 'system', 'import']:
+            continue  # Skip scopes that are not needed at runtime
+        if dep['optional']:
+            continue  # Skip optional dependencies
+        if dep['type'] not in (None, 'jar', 'bundle') or dep['classifier'] is not None:
+            continue
+
+        version = dep['version']
+        if version is None and lookup_latest:
+            version = get_latest_version_from_maven_central(group_id, artifact_id)
+            if version is not None:
+                logger.info(f"Resolved latest version for {group_id}:{artifact_id} as {version}")
+        if version is None or '${' in version:
+            logger.warning(f"No version resolved for dependency {group_id}:{artifact_id}. Skipping.")
+            continue
+        dependencies.append((group_id, artifact_id, version))
+
+    # Modules are not followed, only published artifacts are resolved
+    modules = []
+    return dependencies, modules
 
 def get_latest_version_from_maven_central(group_id, artifact_id):
     import requests
@@ -209,75 +288,266 @@ def get_latest_version_from_maven_central(group_id, artifact_id):
         return None
 
 
-# Recursive function to download artifact and its dependencies
-
-def download_artifact(group_id, artifact_id, version, dependencies_dir=DEPENDENCIES_DIR, processed=set()):
-    key = (group_id, artifact_id)
-    if key in processed:
-        return
-    processed.add(key)
+# Download the POM and JAR of one artifact and return its direct dependencies
+def fetch_artifact(group_id, artifact_id, version, dependencies_dir=DEPENDENCIES_DIR, repository=MAVEN_REPOSITORY, retries=DEFAULT_RETRIES, pom_cache=None, store=None):
+    """
+    Fetch the POM and, unless it is a pom-packaged artifact, the JAR of a single artifact.
 
-    # Download the JAR
-    jar_url = construct_maven_url(group_id, artifact_id, version, "jar")
-    jar_dest = dependencies_dir / f"{artifact_id}-{version}.jar"
-    logger.debug(f'Try download {jar_url} to {jar_dest}')
-    if not download_file(jar_url, jar_dest):
-        logger.warning(f"Failed to download JAR for {group_id}:{artifact_id}:{version}")        
-        return
+    :return: Tuple of (dependencies, bytes fetched, has_jar). dependencies is None if the artifact could not be fetched.
+    """
+    dependencies_dir = Path(dependencies_dir)
+    if pom_cache is None:
+        pom_cache = make_pom_cache(dependencies_dir, repository, retries, store)
 
-    # Download the POM
-    pom_url = construct_maven_url(group_id, artifact_id, version, "pom")
     pom_dest = dependencies_dir / f"{artifact_id}-{version}.pom"
-    if not download_file(pom_url, pom_dest):
+    pom_size = fetch_artifact_file(group_id, artifact_id, version, "pom", pom_dest, repository, retries, store)
+    if pom_size is None:
         logger.warning(f"Failed to download POM for {group_id}:{artifact_id}:{version}")
-        return
+        return None, 0, False
 
-    # Parse the POM to find dependencies
     properties = {}  # Initialize properties for this POM
-    dependencies, modules = parse_pom(pom_dest, properties)
-
-    logger.debug(f"Processing modules for {modules}")
-    # Recursively download dependencies
-    for dep_group_id, dep_artifact_id, dep_version in dependencies:
-        download_artifact(dep_group_id, dep_artifact_id, dep_version, dependencies_dir, processed)
-
-    # Process modules
-    
-    for module_artifact_id in modules:
-        # Assume groupId and version are same as parent
-        module_group_id = properties.get('project.groupId')
-        module_version = properties.get('project.version')
-        if not module_group_id or not module_version:
-            logger.warning(f"Cannot resolve groupId or version for module {module_artifact_id}. Skipping.")
-            continue
-        download_artifact(module_group_id, module_artifact_id, module_version)
+    dependencies, modules = parse_pom(pom_dest, properties, pom_cache)
+    model = pom_cache.load(pom_dest)
+    if model is not None and model.packaging == 'pom':
+        return dependencies, pom_size, False
+
+    jar_dest = dependencies_dir / f"{artifact_id}-{version}.jar"
+    logger.debug(f'Try download {group_id}:{artifact_id}:{version} to {jar_dest}')
+    jar_size = fetch_artifact_file(group_id, artifact_id, version, "jar", jar_dest, repository, retries, store)
+    if jar_size is None:
+        logger.warning(f"Failed to download JAR for {group_id}:{artifact_id}:{version}")
+        return None, pom_size, False
+    return dependencies, jar_size + pom_size, True
+
+
+def resolve_dependencies(initial_dependencies, dependencies_dir=DEPENDENCIES_DIR, repository=MAVEN_REPOSITORY, max_workers=DEFAULT_MAX_WORKERS, retries=DEFAULT_RETRIES, store=None):
+    """
+    Download artifacts and their transitive dependencies breadth-first.
+
+    Every artifact of a level is fetched concurrently through a bounded thread pool before the next
+    level is expanded, so the first version seen for a groupId:artifactId (the nearest one) wins.
+    POMs, including parents and imported BOMs, are parsed once per resolution.
+
+    :param initial_dependencies: Iterable of (group_id, artifact_id, version).
+    :param dependencies_dir: Directory to store the downloaded JARs and POMs.
+    :param repository: Maven repository base URL, http(s):// or file://.
+    :param max_workers: Maximum number of concurrent downloads.
+    :param retries: Number of retries for transient download failures.
+    :param store: ArtifactStore to fetch through. Files in dependencies_dir are then links into the store.
+    :return: List of per-level stats dicts with keys 'level', 'artifacts', 'failed', 'bytes', 'seconds' and
+        'resolved', the (group_id, artifact_id, version) tuples whose JAR was fetched.
+    """
+    dependencies_dir = Path(dependencies_dir)
+    pom_cache = make_pom_cache(dependencies_dir, repository, retries, store)
+    processed = set()
+    current_level = []
+    for group_id, artifact_id, version in initial_dependencies:
+        if (group_id, artifact_id) not in processed:
+            processed.add((group_id, artifact_id))
+            current_level.append((group_id, artifact_id, version))
+
+    def fetch(coordinates):
+        return fetch_artifact(*coordinates, dependencies_dir=dependencies_dir, repository=repository, retries=retries, pom_cache=pom_cache, store=store)
+
+    levels = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='mariadb4p-download') as executor:
+        while current_level:
+            start = time.monotonic()
+            results = list(executor.map(fetch, current_level))
+            next_level = []
+            resolved = []
+            failed = 0
+            fetched = 0
+            for coordinates, (dependencies, size, has_jar) in zip(current_level, results):
+                fetched += size
+                if dependencies is None:
+                    failed += 1
+                    continue
+                if has_jar:
+                    resolved.append(coordinates)
+                for group_id, artifact_id, version in dependencies:
+                    if (group_id, artifact_id) in processed:
+                        continue
+                    processed.add((group_id, artifact_id))
+                    next_level.append((group_id, artifact_id, version))
+            stats = {'level': len(levels), 'artifacts': len(current_level), 'failed': failed, 'bytes': fetched,
+                     'seconds': time.monotonic() - start, 'resolved': resolved}
+            logger.info(f"Resolved level {stats['level']}: {stats['artifacts']} artifacts, "
+                        f"{stats['bytes']} bytes in {stats['seconds']:.2f}s")
+            levels.append(stats)
+            current_level = next_level
+    return levels
+
+
+# Recursive function to download artifact and its dependencies
+
+def download_artifact(group_id, artifact_id, version, dependencies_dir=DEPENDENCIES_DIR, processed=None):
+    """
+    Download an artifact and its transitive dependencies.
+
+    Kept for backward compatibility, see resolve_dependencies.
+    """
+    if processed is not None:
+        if (group_id, artifact_id) in processed:
+            return
+        processed.add((group_id, artifact_id))
+    resolve_dependencies([(group_id, artifact_id, version)], dependencies_dir=dependencies_dir)
+
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
 
 
-def download_maria4j_jars(pom_file=Path(mariadb4y_root,'MariaDB4j','pom.xml'), dependencies_dir=DEPENDENCIES_DIR, force_redownload=False):
+def pom_fingerprint(pom_file):
+    """
+    Hash identifying the dependency configuration: the pom file content, or the built-in defaults.
+    """
+    if pom_file is not None and Path(pom_file).exists():
+        return file_sha256(pom_file)
+    return hashlib.sha256(repr(DEFAULT_DEPENDENCIES).encode()).hexdigest()
+
+
+def read_lockfile(dependencies_dir=DEPENDENCIES_DIR):
+    """
+    Read the classpath lockfile.
+
+    :return: The lockfile content as a dict, or None if it is missing or unreadable.
+    """
+    try:
+        return json.loads(Path(dependencies_dir, LOCKFILE_NAME).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def write_lockfile(resolved, pom_sha256, dependencies_dir=DEPENDENCIES_DIR, previous=None, complete=True):
+    """
+    Write the classpath lockfile for the resolved artifacts.
+
+    Hashes of files that are unchanged since the previous lockfile (same name and size) are reused.
+
+    :param resolved: (group_id, artifact_id, version) tuples in resolution order.
+    :param pom_sha256: Fingerprint of the dependency configuration, see pom_fingerprint.
+    :param dependencies_dir: Directory holding the JARs and the lockfile.
+    :param previous: Content of the previous lockfile, if any.
+    :param complete: False if some dependencies failed, so the next call resolves again.
+    """
+    known = {entry['file']: entry for entry in (previous or {}).get('artifacts', [])}
+    artifacts = []
+    for group_id, artifact_id, version in resolved:
+        file_name = f"{artifact_id}-{version}.jar"
+        size = Path(dependencies_dir, file_name).stat().st_size
+        old = known.get(file_name)
+        sha256 = old['sha256'] if old is not None and old['size'] == size else file_sha256(Path(dependencies_dir, file_name))
+        artifacts.append({'group_id': group_id, 'artifact_id': artifact_id, 'version': version,
+                          'file': file_name, 'size': size, 'sha256': sha256})
+    lock = {'lock_version': 1, 'pom_sha256': pom_sha256, 'complete': complete, 'artifacts': artifacts}
+    tmp_path = Path(dependencies_dir, LOCKFILE_NAME + '.tmp')
+    tmp_path.write_text(json.dumps(lock, indent=2))
+    os.replace(tmp_path, Path(dependencies_dir, LOCKFILE_NAME))
+    return lock
+
+
+def is_lockfile_current(lock, pom_sha256, dependencies_dir=DEPENDENCIES_DIR, verify_hashes=False):
+    """
+    Check that the lockfile matches the dependency configuration and every locked JAR is present.
+    """
+    if lock is None or lock.get('pom_sha256') != pom_sha256 or not lock.get('complete', True):
+        return False
+    for entry in lock.get('artifacts', []):
+        path = Path(dependencies_dir, entry['file'])
+        try:
+            if path.stat().st_size != entry['size']:
+                return False
+        except OSError:
+            return False
+        if verify_hashes and file_sha256(path) != entry['sha256']:
+            return False
+    return True
+
+
+def load_classpath(dependencies_dir=DEPENDENCIES_DIR):
+    """
+    Build an explicit classpath from the lockfile, one JAR per groupId:artifactId.
+
+    :return: List of JAR paths, or None if there is no lockfile or it records an incomplete resolution.
+    """
+    lock = read_lockfile(dependencies_dir)
+    if lock is None or not lock.get('complete', True) or not lock.get('artifacts'):
+        return None
+    classpath = []
+    seen = set()
+    for entry in lock.get('artifacts', []):
+        key = (entry['group_id'], entry['artifact_id'])
+        if key in seen:
+            continue
+        seen.add(key)
+        classpath.append(str(Path(dependencies_dir, entry['file'])))
+    return classpath
+
+
+def download_maria4j_jars(pom_file=DEFAULT_POM_FILE, dependencies_dir=DEPENDENCIES_DIR, force_redownload=False,
+                          repository=MAVEN_REPOSITORY, max_workers=DEFAULT_MAX_WORKERS, verify_hashes=False, store=None):
+    """
+    Resolve and download the MariaDB4j JARs and write the classpath lockfile.
+
+    Nothing is resolved if the lockfile matches the hash of pom_file and all locked JARs are present.
+    Otherwise the dependencies are re-resolved, reusing every JAR and POM that is already downloaded.
+
+    :param pom_file: POM listing the root dependencies. The built-in defaults are used if it does not exist.
+    :param dependencies_dir: Directory to store the JARs, POMs and lockfile.
+    :param force_redownload: Re-resolve even if the lockfile is current.
+    :param repository: Maven repository base URL.
+    :param max_workers: Maximum number of concurrent downloads.
+    :param verify_hashes: Also check the SHA-256 of every locked JAR when validating the lockfile.
+    :param store: ArtifactStore or store directory shared across installs. Defaults to the store configured
+        through the MARIADB4P_STORE environment variable, if any.
+    :return: True on success, False otherwise, including when some dependencies could not be downloaded.
+    """
     import traceback
     properties = {} 
-    if Path(dependencies_dir, 'download_complete.log').exists() and not force_redownload:
+    pom_sha256 = pom_fingerprint(pom_file)
+    previous = read_lockfile(dependencies_dir)
+    if not force_redownload and is_lockfile_current(previous, pom_sha256, dependencies_dir, verify_hashes):
         logger.info(f"Dependencies already downloaded. Skipping download.")
         return True
     if not Path(dependencies_dir).exists():
         Path(dependencies_dir).mkdir(parents=True)
-    if pom_file is not None and pom_file.exists():    
+    if store is None:
+        store = default_store()
+    elif not isinstance(store, ArtifactStore):
+        store = ArtifactStore(store)
+    if previous is not None:
+        logger.info(f"Lockfile in {dependencies_dir} is stale, re-resolving dependencies.")
+        # drop locked files that no longer match, everything else is reused
+        for entry in previous.get('artifacts', []):
+            path = Path(dependencies_dir, entry['file'])
+            if path.exists() and path.stat().st_size != entry['size']:
+                path.unlink()
+    if pom_file is not None and Path(pom_file).exists():
         logger.info(f'load dependency configurations from {pom_file}')    
-        initial_dependencies=parse_pom(pom_file, properties)
+        initial_dependencies, _ = parse_pom(pom_file, properties, make_pom_cache(dependencies_dir, repository, store=store))
     else:
         # List of initial dependencies to download
-        initial_dependencies = [
-            ("ch.vorburger.mariaDB4j", "mariaDB4j", "3.1.0")
-        ]
+        initial_dependencies = DEFAULT_DEPENDENCIES
     # Start downloading
-    processed=set()
     try:
-        for group_id, artifact_id, version in initial_dependencies:
-            logger.info(f'Try download: {group_id}, {artifact_id}, {version}')
-            download_artifact(group_id, artifact_id, version, dependencies_dir=dependencies_dir, processed=processed)
+        start = time.monotonic()
+        levels = resolve_dependencies(initial_dependencies, dependencies_dir=dependencies_dir, repository=repository, max_workers=max_workers, store=store)
+        logger.info(f"Fetched {sum(level['bytes'] for level in levels)} bytes in {len(levels)} levels, "
+                    f"{time.monotonic() - start:.2f}s")
+        resolved = [coordinates for level in levels for coordinates in level['resolved']]
+        complete = not any(level['failed'] for level in levels)
+        write_lockfile(resolved, pom_sha256, dependencies_dir, previous, complete)
     except Exception as e:
         logger.error(f"Error downloading dependencies: {traceback.format_exc()}")
         return False
+    if not complete:
+        logger.error(f"Could not download {sum(level['failed'] for level in levels)} dependencies, "
+                     f"the classpath is incomplete.")
+        return False
     logger.info("All dependencies downloaded.")
-    Path(dependencies_dir, 'download_complete.log').write_text('completed')
     return True
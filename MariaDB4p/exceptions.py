@@ -0,0 +1,34 @@
+class MariaDB4pError(Exception):
+    """
+    Base class of the errors raised by MariaDB4p.
+    """
+
+
+class JDKInstallError(MariaDB4pError):
+    """
+    The required JDK is missing and could not be installed.
+    """
+
+
+class JVMStartError(MariaDB4pError):
+    """
+    The JVM could not be started with the MariaDB4j classpath.
+    """
+
+
+class ServerStartError(MariaDB4pError, RuntimeError):
+    """
+    The embedded server could not be created or started.
+    """
+
+
+class ServerNotReadyError(ServerStartError, TimeoutError):
+    """
+    The server was started but did not answer a ping within the timeout.
+    """
+
+
+class ServerNotRunningError(MariaDB4pError):
+    """
+    An operation needs a running server.
+    """
@@ -0,0 +1,137 @@
+import queue
+import shutil
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+from MariaDB4p.mariadb_wrapper import MariaDBWrapper, find_free_port
+from MariaDB4p.exceptions import ServerStartError
+
+
+class MariaDBFarm:
+    """
+    Several isolated embedded MariaDB servers inside one JVM, e.g. one per pytest-xdist worker or tenant.
+
+    Every instance is a MariaDBWrapper with its own free port, data directory (cloned from the template)
+    and Unix socket. Instances are started and stopped concurrently and handed out with lease/release.
+    """
+
+    def __init__(self, size, max_parallel=None, **wrapper_options):
+        """
+        :param size: Number of server instances.
+        :param max_parallel: Maximum number of instances started or stopped at the same time, defaults to size.
+        :param wrapper_options: Keyword arguments for every MariaDBWrapper, e.g. fixtures or skip_networking.
+            port and base_dir are allocated per instance.
+        """
+        if size < 1:
+            raise ValueError("A farm needs at least one instance.")
+        for option in ('port', 'base_dir'):
+            if option in wrapper_options:
+                raise ValueError(f"{option} is allocated per instance and cannot be passed to MariaDBFarm.")
+        self.size = size
+        self.max_parallel = max_parallel or size
+        self.wrapper_options = wrapper_options
+        self.instances = []
+        self._available = queue.Queue()
+        self._leased = set()
+        self._lock = threading.Lock()
+
+    def _allocate_ports(self):
+        ports = set()
+        while len(ports) < self.size:
+            ports.add(find_free_port())
+        return sorted(ports)
+
+    def start(self):
+        """
+        Create and start all instances concurrently.
+
+        :return: self
+        """
+        if self.instances:
+            return self
+        # constructing wrappers only probes the cached JDK and lockfile, the expensive part is start_server
+        self.instances = [MariaDBWrapper(port=port, base_dir=None, **self.wrapper_options) for port in self._allocate_ports()]
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix='mariadb4p-farm') as executor:
+            results = list(executor.map(self._start_instance, self.instances))
+        failed = [instance for instance, ok in zip(self.instances, results) if not ok]
+        if failed:
+            self.stop()
+            raise ServerStartError(f"{len(failed)} of {self.size} farm instances failed to start.")
+        for instance in self.instances:
+            self._available.put(instance)
+        logger.info(f"Started a farm of {self.size} MariaDB instances on ports {[i.port for i in self.instances]}.")
+        return self
+
+    @staticmethod
+    def _start_instance(instance):
+        try:
+            return instance.start_server()
+        except BaseException as e:
+            logger.error(f"Farm instance on port {instance.port} failed to start: {e}")
+            return False
+
+    def lease(self, timeout=None):
+        """
+        Take an instance for exclusive use, waiting for one to be returned if all are leased.
+
+        :param timeout: Seconds to wait, None waits forever.
+        :return: MariaDBWrapper
+        """
+        try:
+            instance = self._available.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No farm instance available within {timeout}s.")
+        with self._lock:
+            self._leased.add(instance)
+        return instance
+
+    def release(self, instance):
+        """
+        Give a leased instance back to the farm.
+        """
+        with self._lock:
+            if instance not in self._leased:
+                raise ValueError("Instance is not leased from this farm.")
+            self._leased.remove(instance)
+        self._available.put(instance)
+
+    @contextmanager
+    def leased(self, timeout=None):
+        """
+        Context manager leasing an instance for the duration of the block.
+        """
+        instance = self.lease(timeout)
+        try:
+            yield instance
+        finally:
+            self.release(instance)
+
+    def stop(self):
+        """
+        Stop all instances concurrently and delete their data directories. The JVM stays up for other users.
+        """
+        instances, self.instances = self.instances, []
+
+        def stop_instance(instance):
+            instance.stop_server()
+            shutil.rmtree(instance.base_dir, ignore_errors=True)
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix='mariadb4p-farm') as executor:
+            list(executor.map(stop_instance, instances))
+        self._available = queue.Queue()
+        with self._lock:
+            self._leased.clear()
+
+    def __len__(self):
+        return len(self.instances)
+
+    def __iter__(self):
+        return iter(list(self.instances))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,51 @@
+import threading
+import jpype
+from loguru import logger
+
+# Number of live users of the JVM, it is shut down when the last one releases it
+_refcount = 0
+_lock = threading.Lock()
+
+
+def acquire_jvm(classpath, profile=None):
+    """
+    Start the JVM if needed and register one more user of it.
+
+    :param classpath: Classpath entries used if the JVM has to be started.
+    :param profile: Optional StartupProfile recording the jvm_start phase.
+    :return: True if this call started the JVM.
+    """
+    global _refcount
+    with _lock:
+        started = False
+        if not jpype.isJVMStarted():
+            logger.info(f"Starting JVM with classpath: {classpath}")
+            if profile is not None:
+                with profile.phase('jvm_start', jars=len(classpath)):
+                    jpype.startJVM(classpath=classpath)
+            else:
+                jpype.startJVM(classpath=classpath)
+            logger.info("JVM started successfully.")
+            started = True
+        _refcount += 1
+        return started
+
+
+def release_jvm():
+    """
+    Unregister one user of the JVM and shut it down if it was the last one.
+
+    JPype cannot start a JVM again in the same process once it is shut down.
+    """
+    global _refcount
+    with _lock:
+        if _refcount == 0:
+            return
+        _refcount -= 1
+        if _refcount == 0 and jpype.isJVMStarted():
+            jpype.shutdownJVM()
+            logger.info("JVM shutdown.")
+
+
+def jvm_refcount():
+    return _refcount
@@ -4,40 +4,181 @@ from jpype.types import *
 import os
 import sys
 import time
+import shutil
+import socket
+import hashlib
+import weakref
+import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 import pymysql
+from pymysql.constants import CLIENT, ER
 from loguru import logger
 
-from MariaDB4p.download_jars import download_maria4j_jars
+from MariaDB4p.download_jars import download_maria4j_jars, load_classpath
 from MariaDB4p.check_jdk import install_jdk_if_missing, is_jdk_installed
+from MariaDB4p.profiling import StartupProfile
+from MariaDB4p.pool import ConnectionPool
+from MariaDB4p import bulk_load
+from MariaDB4p import streaming
+from MariaDB4p import templates
+from MariaDB4p import server_profiles
+from MariaDB4p import snapshots
+from MariaDB4p import provisioning
+from MariaDB4p import sql_dump
+from MariaDB4p import prepared
+from MariaDB4p import metrics
+from MariaDB4p.tuning import ServerTuning, TUNED_VARIABLES
+from MariaDB4p.jvm import acquire_jvm, release_jvm
+from MariaDB4p.exceptions import JVMStartError, ServerStartError, ServerNotReadyError, ServerNotRunningError
+
+# DB.newEmbeddedDB unpacks the binaries into a directory shared by all instances, creating them is
+# serialized while starting them runs concurrently
+_new_embedded_db_lock = threading.Lock()
+# Seconds start_server waits for the server to answer a ping
+DEFAULT_START_TIMEOUT = 60
+
+def default_socket_path(base_dir, port):
+    """
+    Unix socket path for a server, unique per data directory and port and short enough for the
+    sun_path limit. None on Windows, which has no Unix sockets.
+    """
+    if sys.platform == 'win32':
+        return None
+    key = hashlib.sha1(f'{Path(base_dir).resolve()}:{port}'.encode()).hexdigest()[:12]
+    return str(Path(tempfile.gettempdir(), f'mariadb4p-{key}.sock'))
+
+
+def find_free_port():
+    """
+    Ask the OS for a TCP port that is currently free on localhost.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
 
 class MariaDBWrapper:
-    def __init__(self, port=3306, base_dir=None, jars_dir=Path(__file__).parent.parent / 'mariadb4j_jars', jdk_version=17, jdk_install_dir=''):
+    def __init__(self, port=3306, base_dir=None, jars_dir=Path(__file__).parent.parent / 'mariadb4j_jars', jdk_version=17, jdk_install_dir='',
+                 startup_hook=None, pool_min_size=0, pool_max_size=10, pool_idle_timeout=300, socket_path=None, use_socket=True,
+                 skip_networking=False, use_template=True, fixtures=None, template_config=None, profile='default',
+                 server_args=None, tuning=None, statement_cache_size=prepared.DEFAULT_CACHE_SIZE, query_log_sample_rate=0.0,
+                 status_sample_interval=None, metrics_port=None):
         """
         Initialize the MariaDBWrapper.
 
         :param port: Port number for MariaDB to listen on.
-        :param base_dir: Base directory for MariaDB data. If not provided, a temporary directory is used.
+        :param base_dir: Base directory for MariaDB data. If not provided, a unique directory is cloned from a
+            cached, pre-initialized template (see use_template), and removed when the wrapper is collected.
+        :param startup_hook: Optional callable receiving the startup phase events, see StartupProfile.
+        :param pool_min_size: Connections kept open per (user, database) pool.
+        :param pool_max_size: Maximum connections per (user, database) pool.
+        :param pool_idle_timeout: Seconds after which idle pooled connections above pool_min_size are closed.
+        :param socket_path: Unix socket for the server. Defaults to a path in the temp directory derived from
+            base_dir and port.
+        :param use_socket: Connect over the Unix socket when it exists, falling back to TCP.
+        :param skip_networking: Run the server socket-only, without listening on a TCP port.
+        :param use_template: With base_dir=None, clone the data directory from a template. If False, the shared
+            ~/mariadb4j_data directory is used as before.
+        :param fixtures: SQL strings, .sql file paths or callables taking a pymysql connection, applied once when
+            the template is built, so every clone starts with them.
+        :param template_config: JSON serializable value that is part of the template cache key, change it to
+            rebuild templates whose fixtures are callables.
+        :param profile: 'default', or 'ephemeral' for test and CI servers: with base_dir=None the data and tmpdir
+            live on a tmpfs such as /dev/shm and are removed at exit, and fsync heavy durability settings are
+            turned off. Data is lost if the process crashes.
+        :param server_args: Extra mariadbd arguments, e.g. ['--max-connections=500'], passed after the
+            profile's and the tuning's arguments.
+        :param tuning: ServerTuning, dict of its settings, or 'auto' to size the buffer pool, redo log, thread
+            pool and connection limits from the host's RAM and CPUs. See MariaDB4p.tuning.ServerTuning.
+        :param statement_cache_size: Prepared statements kept per pooled connection by execute.
+        :param query_log_sample_rate: Share of successful queries logged by execute_query and execute, from 0 to 1.
+            Failed queries are always logged.
+        :param status_sample_interval: If set, SHOW GLOBAL STATUS and the InnoDB metrics are sampled every that many
+            seconds while the server runs, see status_samples.
+        :param metrics_port: If set, /metrics is served in the Prometheus text format on this localhost port
+            while the server runs, 0 picks a free port.
         """
         self.port = port
+        self.db = None
+        self._jvm_acquired = False
+        # Timings of the startup phases, see StartupProfile
+        self.startup_profile = StartupProfile(hooks=[startup_hook] if startup_hook is not None else None)
+        self._first_connection_timed = False
+        # Connection pools keyed by (user, db_name)
+        self.pool_options = dict(min_size=pool_min_size, max_size=pool_max_size, idle_timeout=pool_idle_timeout)
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+        # Prepared statements of execute, cached per pooled connection
+        self.statement_cache_size = statement_cache_size
+        self.statement_stats = prepared.StatementCacheStats()
+        # Client-side latency and errors per query fingerprint, see query_metrics
+        self.metrics = metrics.QueryMetrics()
+        self.query_log = metrics.QueryLogSampler(query_log_sample_rate)
+        self.status_sample_interval = status_sample_interval
+        self.status_sampler = None
+        self.metrics_port = metrics_port
+        self.metrics_server = None
+        # Persistent root connection for provisioning, see admin_connection
+        self._admin = None
+        self._admin_lock = threading.RLock()
+        # Snapshots keyed by (db_name, tag), see snapshot
+        self._snapshots = {}
         # print('getDefaultJVMPath', jpype.getDefaultJVMPath())
-        self.jvm_dir=install_jdk_if_missing(target_version=jdk_version, install_dir=jdk_install_dir)
+        self._prepare_runtime(jdk_version, jdk_install_dir)
         # print('JAVA_HOME', os.environ['JAVA_HOME'])
         # print('getDefaultJVMPath', jpype.getDefaultJVMPath())
         self.jdk_version=jdk_version
-        download_maria4j_jars()
-        if base_dir is None:
+        with self.startup_profile.phase('resolve_jars'):
+            download_maria4j_jars(dependencies_dir=jars_dir)
+        self.fixtures = list(fixtures or [])
+        self.template_config = template_config
+        self._template_pending = False
+        self.profile = profile
+        self.tmpdir = None
+        if base_dir is None and profile == 'ephemeral':
+            instance_dir = Path(templates.new_instance_dir(dir=server_profiles.tmpfs_dir()))
+            self.base_dir = str(instance_dir / 'data')
+            self.tmpdir = str(instance_dir / 'tmp')
+            Path(self.tmpdir).mkdir()
+            self._template_pending = use_template
+            # finalizers also run at interpreter exit, so the RAM is given back even without stop_server
+            weakref.finalize(self, shutil.rmtree, str(instance_dir), True)
+        elif base_dir is None and use_template:
+            self.base_dir = templates.new_instance_dir()
+            self._template_pending = True
+            # the instance directory is owned by this wrapper
+            weakref.finalize(self, shutil.rmtree, self.base_dir, True)
+        elif base_dir is None:
             tmp_base=Path(Path.home(), 'mariadb4j_data')
             tmp_base.mkdir(exist_ok=True,parents=True)
             self.base_dir = str(tmp_base.resolve().absolute())
         else:
             self.base_dir = base_dir
-        self.db = None
         self.jars_dir=jars_dir
+        self.extra_server_args = list(server_args or [])
+        self.tuning = ServerTuning.coerce(tuning)
+        # later arguments win, so the tuning overrides the profile and server_args override both
+        self.server_args = server_profiles.profile_args(profile, self.base_dir, self.tmpdir)
+        if self.tuning is not None:
+            self.server_args += self.tuning.to_args()
+        self.server_args += self.extra_server_args
+        self.socket_path = socket_path if socket_path is not None else default_socket_path(self.base_dir, port)
+        self.use_socket = use_socket and self.socket_path is not None
+        self.skip_networking = skip_networking
+        if skip_networking and not self.use_socket:
+            raise ValueError("skip_networking requires a Unix socket, which is not available on this platform.")
+
+        # Initialize JPype, the JVM is shared by all wrappers of the process
+        self.start_jvm(self.jars_dir)
 
-        # Initialize JPype
-        if not jpype.isJVMStarted():
-            self.start_jvm(self.jars_dir)
+    def _prepare_runtime(self, jdk_version, jdk_install_dir):
+        """
+        Make sure a JDK is available for the JVM, installing it if needed.
+        """
+        with self.startup_profile.phase('jdk_probe', jdk_version=jdk_version):
+            self.jvm_dir=install_jdk_if_missing(target_version=jdk_version, install_dir=jdk_install_dir)
 
     def restart_jvm(self):
         self.stop_jvm()
@@ -47,49 +188,184 @@ class MariaDBWrapper:
     def start_jvm(self, jars_dir=Path(__file__).parent.parent / 'mariadb4j_jars'):
         """
         Start the JVM with the required classpath.
+
+        The classpath is read from the lockfile written by download_maria4j_jars, falling back to all
+        JAR files in jars_dir if there is none.
         """
-        # Path to all JAR files in the mariadb4j_jars directory
-        
-        
-        jars_dir=str(jars_dir)
-        logger.info(f"Starting JVM with classpath: {jars_dir}/*")
+        if self._jvm_acquired:
+            return
+        classpath = load_classpath(jars_dir)
+        if classpath is None:
+            classpath = [f'{jars_dir}/*']
         try:
-            jpype.startJVM(classpath=[f'{jars_dir}/*'])
-            logger.info("JVM started successfully.")
+            acquire_jvm(classpath, self.startup_profile)
+            self._jvm_acquired = True
         except Exception as e:
             logger.error(f"Failed to start JVM: {e}")
-            sys.exit(1)
+            raise JVMStartError(f"Failed to start the JVM with classpath {classpath}: {e}") from e
 
-    def start_server(self):
+    def _server_arguments(self):
         """
-        Start the embedded MariaDB server.
+        mariadbd arguments besides port, data directory and socket.
+        """
+        args = ['--skip-networking'] if self.skip_networking else []
+        return args + self.server_args
+
+    def _new_embedded_db(self, data_dir, port, socket_path):
+        """
+        Configure and create (unpack and install) an embedded DB without starting it.
         """
         from ch.vorburger.mariadb4j import DBConfigurationBuilder
         from ch.vorburger.mariadb4j import DB
 
         # Configure the MariaDB server
         config_builder = DBConfigurationBuilder.newBuilder()
-        if self.port:
-            config_builder.setPort(self.port)
-        if self.base_dir:
-            config_builder.setDataDir(self.base_dir)
+        if port:
+            config_builder.setPort(port)
+        if data_dir:
+            config_builder.setDataDir(str(data_dir))
+        if socket_path:
+            config_builder.setSocket(socket_path)
+        for arg in self._server_arguments():
+            config_builder.addArg(arg)
+        with _new_embedded_db_lock:
+            return DB.newEmbeddedDB(config_builder.build())
 
-        
+    def _build_template(self, data_dir):
+        """
+        Initialize a pristine data directory in data_dir and apply the fixtures to it.
+        """
+        port = find_free_port()
+        socket_path = default_socket_path(data_dir, port)
+        db = self._new_embedded_db(data_dir, port, socket_path)
+        db.start()
+        try:
+            if self.fixtures:
+                params = {'unix_socket': socket_path} if self.use_socket else {'host': 'localhost', 'port': port}
+                connection = pymysql.connect(user='root', password='', client_flag=CLIENT.MULTI_STATEMENTS, **params)
+                try:
+                    for fixture in self.fixtures:
+                        if callable(fixture):
+                            fixture(connection)
+                            continue
+                        sql = Path(fixture).read_text() if isinstance(fixture, Path) or str(fixture).endswith('.sql') else fixture
+                        with connection.cursor() as cursor:
+                            cursor.execute(sql)
+                            while cursor.nextset():
+                                pass
+                    connection.commit()
+                finally:
+                    connection.close()
+        finally:
+            db.stop()
 
+    def _template_key_config(self):
+        """
+        Server configuration the template is built with, as part of its cache key.
+        """
+        # the template is initialized with the profile, tuning and server arguments of the first wrapper that
+        # builds it, settings such as the page size or the redo log size change the data files
+        server = {}
+        if self.profile != 'default':
+            # profile arguments hold per-instance paths, the name identifies them
+            server['profile'] = self.profile
+        if self.tuning is not None:
+            server['tuning'] = self.tuning.to_args()
+        if self.extra_server_args:
+            server['server_args'] = self.extra_server_args
+        if not server:
+            return self.template_config
+        return dict(server, template_config=self.template_config)
+
+    def _clone_template(self):
+        key = templates.template_key(templates.mariadb_version(self.jars_dir), self._template_key_config(),
+                                     self.fixtures)
+        template = templates.ensure_template(key, self._build_template)
+        counts = templates.clone_tree(template, self.base_dir)
+        logger.info(f"Cloned data directory template {key} into {self.base_dir}: {counts}")
+        self._template_pending = False
+
+    def start_server(self, wait=True, timeout=DEFAULT_START_TIMEOUT):
+        """
+        Start the embedded MariaDB server.
+
+        :param wait: Return only once the server answers a ping over its socket or port, see wait_until_ready.
+        :param timeout: Seconds to wait for the server to become ready.
+        :return: True
+        :raises ServerStartError: If the server could not be created or started.
+        :raises ServerNotReadyError: If the server did not become ready within the timeout.
+        """
         # Create and start the database
         try:
-            self.db  = DB.newEmbeddedDB(config_builder.build())
-            self.db.start()
-            logger.info(f"MariaDB server started on port {self.port}.")
+            if self._template_pending:
+                with self.startup_profile.phase('template_clone', base_dir=str(self.base_dir)):
+                    self._clone_template()
+            with self.startup_profile.phase('db_new_embedded', base_dir=str(self.base_dir)):
+                self.db = self._new_embedded_db(self.base_dir, self.port, self.socket_path)
+            with self.startup_profile.phase('db_start', port=self.port):
+                self.db.start()
         except Exception as e:
             logger.error(f"Failed to start MariaDB server: {e}")
-            sys.exit(1)
+            raise ServerStartError(f"Failed to start MariaDB server on port {self.port}: {e}") from e
+        if wait:
+            self.wait_until_ready(timeout)
+        logger.info(f"MariaDB server started on port {self.port}, socket {self.socket_path}.")
+        if self.status_sample_interval:
+            self.status_sampler = metrics.StatusSampler(lambda: self._connect(user='root', password=''),
+                                                        interval=self.status_sample_interval).start()
+        if self.metrics_port is not None:
+            self.start_metrics_server(self.metrics_port)
         return True
 
+    def ping(self, timeout=1):
+        """
+        Check whether the server accepts connections and answers a COM_PING.
+
+        :param timeout: Connect and read timeout in seconds.
+        :return: True if the server answered, also when it refused the root login, e.g. after a password was set.
+        """
+        try:
+            connection = self._open_connection(user='root', password='', connect_timeout=timeout, read_timeout=timeout)
+        except pymysql.err.MySQLError as e:
+            # an access denied error comes from a server that finished starting and authenticates logins
+            return bool(e.args) and e.args[0] == ER.ACCESS_DENIED_ERROR
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except pymysql.err.MySQLError:
+            return False
+        finally:
+            connection.close()
+
+    def wait_until_ready(self, timeout=DEFAULT_START_TIMEOUT):
+        """
+        Poll the server with pings until it accepts queries, backing off from 10ms to 200ms between attempts.
+
+        :param timeout: Seconds to wait.
+        :return: Seconds waited.
+        :raises ServerNotReadyError: If the server did not answer within the timeout or stopped running.
+        """
+        start = time.monotonic()
+        deadline = start + timeout
+        interval = 0.01
+        with self.startup_profile.phase('readiness'):
+            while True:
+                if self.ping(timeout=min(1.0, max(0.1, deadline - time.monotonic()))):
+                    return time.monotonic() - start
+                if self.db is not None and not self.db.isRunning():
+                    raise ServerNotReadyError(f"MariaDB server on port {self.port} stopped before it became ready.")
+                if time.monotonic() >= deadline:
+                    raise ServerNotReadyError(f"MariaDB server on port {self.port} did not answer within {timeout}s.")
+                time.sleep(interval)
+                interval = min(0.2, interval * 2)
+
     def stop_server(self):
         """
         Stop the embedded MariaDB server.
         """
+        self.stop_metrics()
+        self.close_pools()
+        self.close_admin_connection()
         if self.db:
             try:
                 self.db.stop()
@@ -108,6 +384,46 @@ class MariaDBWrapper:
             return self.db.isRunning()
         return False
 
+    @contextmanager
+    def admin_connection(self):
+        """
+        Context manager yielding the wrapper's persistent root connection, opened on first use with
+        multi-statement support and autocommit. Callers are serialized.
+        """
+        if not self.db:
+            raise ServerNotRunningError("MariaDB server is not running.")
+        with self._admin_lock:
+            if self._admin is None:
+                self._admin = self._connect(user='root', password='', autocommit=True,
+                                            client_flag=CLIENT.MULTI_STATEMENTS)
+            else:
+                self._admin.ping(reconnect=True)
+            yield self._admin
+
+    def close_admin_connection(self):
+        with self._admin_lock:
+            admin, self._admin = self._admin, None
+        if admin is not None:
+            try:
+                admin.close()
+            except Exception as e:
+                logger.debug(f"Error closing admin connection: {e}")
+
+    def provision(self, databases=(), users=(), grants=(), replace_users=False):
+        """
+        Create databases, users and grants in one multi-statement batch over the admin connection.
+
+        :param databases: Database names, or dicts with 'name', 'charset' and 'collation'.
+        :param users: (user, password[, host]) tuples, or dicts with 'user', 'password' and 'host' (default '%').
+        :param grants: (privileges, on, user[, host]) tuples, or dicts with 'privileges', 'on', 'user', 'host' and
+            'grant_option', e.g. ('ALL', 'tenant_1', 'tenant_1').
+        :param replace_users: Recreate existing users, dropping their grants. Otherwise existing users keep their
+            grants and get the password given.
+        :return: dict with counts, round trips and duration, see MariaDB4p.provisioning.provision.
+        """
+        with self.admin_connection() as connection:
+            return provisioning.provision(connection, databases, users, grants, replace_users)
+
     def create_database(self, db_name):
         """
         Create a new database.
@@ -115,9 +431,9 @@ class MariaDBWrapper:
         :param db_name: Name of the database to create.
         """
         if not self.db:
-            raise Exception("MariaDB server is not running.")
+            raise ServerNotRunningError("MariaDB server is not running.")
         try:
-            self.db.createDB(db_name)
+            self.provision(databases=[db_name])
             logger.info(f"Database '{db_name}' created.")
         except Exception as e:
             logger.error(f"Failed to create database '{db_name}': {e}")
@@ -131,52 +447,369 @@ class MariaDBWrapper:
         :param host: Host for the user (default: 'localhost').
         """
         if not self.db:
-            raise Exception("MariaDB server is not running.")
+            raise ServerNotRunningError("MariaDB server is not running.")
         try:
-            self.db.run("mysql", "mysql", None, [
-                "-e",
-                f"CREATE USER '{user}'@'{host}' IDENTIFIED BY '{password}';"
-            ])
-            self.db.run("mysql", "mysql", None, [
-                "-e",
-                f"GRANT ALL PRIVILEGES ON *.* TO '{user}'@'{host}' WITH GRANT OPTION;"
-            ])
-            self.db.run("mysql", "mysql", None, ["-e", "FLUSH PRIVILEGES;"])
+            self.provision(users=[(user, password, host)],
+                           grants=[{'privileges': 'ALL', 'on': '*.*', 'user': user, 'host': host, 'grant_option': True}])
             logger.info(f"User '{user}'@'{host}' created with all privileges.")
         except Exception as e:
             logger.error(f"Failed to create user '{user}'@'{host}': {e}")
 
+    def effective_settings(self, names=None):
+        """
+        Values of server variables as reported by the running server.
+
+        :param names: Variable names, defaults to the ones covered by ServerTuning plus any extra tuning settings.
+        :return: dict of variable name to value string, variables unknown to the server are missing.
+        """
+        if names is None:
+            names = list(TUNED_VARIABLES)
+            if self.tuning is not None:
+                names += [name for name in self.tuning.variable_names() if name not in names]
+        with self.get_pool('mysql').connection() as connection:
+            with connection.cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(names))
+                cursor.execute(f"SHOW GLOBAL VARIABLES WHERE Variable_name IN ({placeholders})", list(names))
+                return dict(cursor.fetchall())
+
+    def connection_params(self):
+        """
+        pymysql.connect arguments to reach the server, the Unix socket if it is up and TCP otherwise.
+        """
+        if self.use_socket and (self.skip_networking or os.path.exists(self.socket_path)):
+            return {'unix_socket': self.socket_path}
+        return {'host': 'localhost', 'port': self.port}
+
+    def _open_connection(self, **kwargs):
+        params = self.connection_params()
+        if 'unix_socket' in params and not self.skip_networking:
+            try:
+                return pymysql.connect(**params, **kwargs)
+            except pymysql.err.OperationalError as e:
+                logger.debug(f"Socket connection to {self.socket_path} failed, falling back to TCP: {e}")
+                params = {'host': 'localhost', 'port': self.port}
+        return pymysql.connect(**params, **kwargs)
+
+    def _connect(self, **kwargs):
+        """
+        Open a new connection to the server, timing the first one as a startup phase.
+        """
+        if self._first_connection_timed:
+            return self._open_connection(**kwargs)
+        with self.startup_profile.phase('first_connection'):
+            connection = self._open_connection(**kwargs)
+        self._first_connection_timed = True
+        return connection
+
+    def get_pool(self, db_name='testdb', user='root', password=''):
+        """
+        Connection pool for a user and database, created on first use.
+
+        :param db_name: Database name.
+        :param user: Username for authentication.
+        :param password: Password for authentication, used when the pool is created.
+        :return: ConnectionPool
+        """
+        key = (user, db_name)
+        with self._pools_lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(lambda: self._connect(user=user, password=password, database=db_name),
+                                      **self.pool_options)
+                self._pools[key] = pool
+        if pool.min_size:
+            pool.prefill()
+        return pool
+
+    def pool_stats(self):
+        """
+        Counters of every connection pool, keyed by 'user@db_name'.
+        """
+        with self._pools_lock:
+            pools = dict(self._pools)
+        return {f'{user}@{db_name}': dict(pool.stats.to_dict(), size=pool.size, idle=pool.idle)
+                for (user, db_name), pool in pools.items()}
+
+    def statement_cache_stats(self):
+        """
+        Hits, misses, evictions, re-prepares and invalidations of the prepared statement caches.
+        """
+        return self.statement_stats.to_dict()
+
+    def close_pools(self):
+        """
+        Close every pooled connection.
+        """
+        with self._pools_lock:
+            pools = list(self._pools.values())
+            self._pools = {}
+        for pool in pools:
+            pool.close()
+
+    @contextmanager
+    def transaction(self, db_name='testdb', user='root', password=''):
+        """
+        Context manager yielding a pooled connection in a transaction, committed when the block succeeds.
+
+        :param db_name: Database name.
+        :param user: Username for authentication.
+        :param password: Password for authentication.
+        """
+        with self.get_pool(db_name, user, password).transaction() as connection:
+            yield connection
+
+    @contextmanager
+    def rollback_on_exit(self, db_name='testdb', user='root', password=''):
+        """
+        Context manager yielding a pooled connection in a transaction that is always rolled back, the cheapest
+        way to isolate a test that only writes through this connection and runs no DDL, which commits implicitly.
+
+        :param db_name: Database name.
+        :param user: Username for authentication.
+        :param password: Password for authentication.
+        """
+        with self.get_pool(db_name, user, password).connection() as connection:
+            connection.begin()
+            try:
+                yield connection
+            finally:
+                connection.rollback()
+
+    def snapshot(self, db_name, tag='default', strategy='auto'):
+        """
+        Save the state of a database, e.g. after loading fixtures, to reset it later with restore.
+
+        :param db_name: Database name.
+        :param tag: Name of the snapshot, taking it again replaces it.
+        :param strategy: 'clone' (hidden schema in the server), 'tablespace' (copies of the InnoDB .ibd files) or
+            'auto', see MariaDB4p.snapshots.take_snapshot.
+        :return: Snapshot
+        """
+        self.drop_snapshot(db_name, tag)
+        with self.get_pool('mysql').connection() as connection:
+            snapshot = snapshots.take_snapshot(connection, db_name, tag, strategy)
+        self._snapshots[(db_name, tag)] = snapshot
+        return snapshot
+
+    def restore(self, db_name, tag='default'):
+        """
+        Reset a database to a snapshot. Only tables changed since the snapshot or the previous restore are
+        copied back, found through the server's table statistics (userstat).
+
+        :param db_name: Database name.
+        :param tag: Name of the snapshot.
+        :return: dict with the restored and dropped tables and the duration.
+        """
+        snapshot = self._snapshots.get((db_name, tag))
+        if snapshot is None:
+            raise KeyError(f"No snapshot {tag!r} of database {db_name!r}.")
+        with self.get_pool('mysql').connection() as connection:
+            return snapshots.restore_snapshot(connection, snapshot)
+
+    def drop_snapshot(self, db_name, tag='default'):
+        """
+        Delete a snapshot, if it exists.
+        """
+        snapshot = self._snapshots.pop((db_name, tag), None)
+        if snapshot is not None:
+            with self.get_pool('mysql').connection() as connection:
+                snapshots.drop_snapshot(connection, snapshot)
+
+    @contextmanager
+    def _timed(self, query):
+        """
+        Record the latency of the enclosed query in the metrics and log it at the sample rate.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.metrics.observe(query, time.perf_counter() - start, error=True)
+            raise
+        seconds = time.perf_counter() - start
+        self.metrics.observe(query, seconds)
+        if self.query_log.should_log():
+            logger.info(f"Executed query in {seconds * 1000:.2f}ms: {query}")
+
+    def query_metrics(self):
+        """
+        Count, latency percentiles and errors of execute_query and execute by query fingerprint.
+        """
+        return self.metrics.snapshot()
+
+    def status_samples(self):
+        """
+        (timestamp, values) samples of SHOW GLOBAL STATUS and INNODB_METRICS, oldest first. Empty unless
+        status_sample_interval was given.
+        """
+        return self.status_sampler.samples() if self.status_sampler is not None else []
+
+    def render_metrics(self, openmetrics=False):
+        """
+        Query latencies, pool and statement cache counters and the latest status sample in the Prometheus
+        text format, or OpenMetrics.
+        """
+        status = self.status_sampler.latest() if self.status_sampler is not None else None
+        return metrics.render_prometheus(self.metrics, status, self.pool_stats(), self.statement_cache_stats(),
+                                         openmetrics=openmetrics)
+
+    def start_metrics_server(self, port=0, host='127.0.0.1'):
+        """
+        Serve render_metrics at /metrics from a background thread.
+
+        :return: URL of the endpoint.
+        """
+        if self.metrics_server is None:
+            self.metrics_server = metrics.MetricsServer(self.render_metrics, host=host, port=port)
+            logger.info(f"Serving metrics at {self.metrics_server.url}")
+        return self.metrics_server.url
+
+    def stop_metrics(self):
+        """
+        Stop the status sampler and the metrics endpoint.
+        """
+        sampler, self.status_sampler = self.status_sampler, None
+        if sampler is not None:
+            sampler.stop()
+        server, self.metrics_server = self.metrics_server, None
+        if server is not None:
+            server.stop()
+
+    def execute(self, query, params=None, db_name='testdb', user='root', password=''):
+        """
+        Execute a parameterized query through a server-side prepared statement, prepared once per pooled
+        connection and kept in an LRU cache. Unlike execute_query, errors are raised.
+
+        :param query: SQL query with %s placeholders.
+        :param params: Sequence of parameter values.
+        :param db_name: Database name.
+        :param user: Username for authentication.
+        :param password: Password for authentication.
+        :return: The fetched rows for statements returning a result set, the affected row count otherwise.
+        """
+        with self._timed(query):
+            with self.get_pool(db_name, user, password).connection() as connection:
+                cache = prepared.statement_cache(connection, self.statement_cache_size, self.statement_stats)
+                with connection.cursor() as cursor:
+                    cache.execute(cursor, query, params)
+                    result = cursor.fetchall() if cursor.description else cursor.rowcount
+                connection.commit()
+                return result
+
     def execute_query(self, query, db_name='testdb', user='root', password=''):
         """
-        Execute an SQL query on the specified database.
+        Execute an SQL query on the specified database, using a pooled connection.
 
         :param query: SQL query to execute.
         :param db_name: Database name.
         :param user: Username for authentication.
         :param password: Password for authentication.
+        :return: The fetched rows for statements returning a result set, the affected row count otherwise,
+            or None if the query failed.
         """
-        connection = pymysql.connect(
-            host='localhost',
-            port=self.port,
-            user=user,
-            password=password,
-            database=db_name
-        )
         try:
-            with connection.cursor() as cursor:
-                cursor.execute(query)
-                connection.commit()
-                logger.info(f"Executed query: {query}")
+            with self._timed(query):
+                with self.get_pool(db_name, user, password).connection() as connection:
+                    with connection.cursor() as cursor:
+                        cursor.execute(query)
+                        result = cursor.fetchall() if cursor.description else cursor.rowcount
+                        connection.commit()
+                        return result
         except Exception as e:
             logger.error(f"Failed to execute query '{query}': {e}")
-        finally:
-            connection.close()
+
+    def stream_query(self, query, params=None, db_name='testdb', user='root', password='', fetch_size=streaming.DEFAULT_FETCH_SIZE, columnar=None):
+        """
+        Stream the results of a query through an unbuffered server-side cursor (SSCursor).
+
+        :param query: SQL query.
+        :param params: Optional query parameters.
+        :param db_name: Database name.
+        :param user: Username for authentication.
+        :param password: Password for authentication.
+        :param fetch_size: Rows fetched from the server per round trip.
+        :param columnar: None yields row tuples. 'numpy' yields dicts of NumPy arrays per column and 'arrow'
+            yields pyarrow.RecordBatch objects, each holding up to fetch_size rows.
+        :return: Generator over rows or column batches.
+        """
+        return streaming.stream_query(self.get_pool(db_name, user, password), query, params=params,
+                                      fetch_size=fetch_size, columnar=columnar)
+
+    def bulk_load(self, table, rows_or_path, db_name='testdb', user='root', password='', **options):
+        """
+        Load rows into a table with LOAD DATA LOCAL INFILE or batched multi-row INSERTs.
+
+        :param table: Table name.
+        :param rows_or_path: Iterable of row tuples, path of a CSV file, or a pandas DataFrame.
+        :param db_name: Database name.
+        :param user: Username for authentication.
+        :param password: Password for authentication.
+        :param options: columns, method, batch_size, header, delimiter, quotechar and disable_keys, see
+            MariaDB4p.bulk_load.bulk_load.
+        :return: dict with the loaded row count, duration and rows per second.
+        """
+        return bulk_load.bulk_load(self, table, rows_or_path, db_name=db_name, user=user, password=password, **options)
+
+    def bulk_load_many(self, sources, parallel=4, **options):
+        """
+        Load several tables in parallel.
+
+        :param sources: dict of table name to rows_or_path.
+        :param parallel: Maximum number of tables loaded at the same time.
+        :param options: Keyword arguments passed to bulk_load.
+        :return: List of bulk_load reports.
+        """
+        return bulk_load.bulk_load_many(self, sources, parallel=parallel, **options)
+
+    def import_sql(self, source, db_name=None, user='root', password='', parallel=4,
+                   batch_bytes=sql_dump.DEFAULT_BATCH_BYTES, progress=None):
+        """
+        Import an SQL dump, statement by statement in bounded memory, loading independent tables in parallel.
+
+        :param source: Path of a plain, .gz or .zst dump or of a directory written by export, or a file object.
+        :param db_name: Default database, None if the dump selects it with USE. Required for directories, their
+            files do not select a database.
+        :param user: Username for authentication.
+        :param password: Password for authentication.
+        :param parallel: Connections loading rows concurrently.
+        :param batch_bytes: Size of the statement batches sent per round trip.
+        :param progress: Callable receiving progress dicts, see MariaDB4p.sql_dump.import_sql.
+        :return: dict with the imported bytes, statements and tables, the duration and the throughput.
+        """
+        if db_name is None and isinstance(source, (str, Path)) and Path(source).is_dir():
+            raise ValueError(f"db_name is required to import the export directory {source}")
+        connect = lambda: self._connect(user=user, password=password, database=db_name,
+                                        client_flag=CLIENT.MULTI_STATEMENTS)
+        return sql_dump.import_sql(connect, source, parallel=parallel, batch_bytes=batch_bytes,
+                                   progress_callback=progress)
+
+    def export(self, db_name, dest, user='root', password='', parallel=4, compression='gzip', tables=None,
+               consistent=True, progress=None):
+        """
+        Dump the tables of a database concurrently into one compressed file per table.
+
+        :param db_name: Database to export.
+        :param dest: Directory for the files, which import_sql accepts as source.
+        :param user: Username for authentication.
+        :param password: Password for authentication.
+        :param parallel: Tables dumped concurrently.
+        :param compression: None, 'gzip' or 'zstd'.
+        :param tables: Tables to export, defaults to all.
+        :param consistent: Read all tables from one point in time.
+        :param progress: Callable receiving progress dicts.
+        :return: dict with the exported bytes, rows and tables, the duration, the throughput and the 'files'.
+        """
+        connect = lambda: self._connect(user=user, password=password, database=db_name)
+        return sql_dump.export_database(connect, db_name, dest, parallel=parallel, compression=compression,
+                                        tables=tables, consistent=consistent, progress_callback=progress)
 
     def __del__(self):
         """
-        Destructor to ensure the MariaDB server is stopped and JVM is shutdown.
+        Destructor to ensure the MariaDB server is stopped and this wrapper's hold on the JVM is released.
+
+        The JVM is shut down once no wrapper uses it anymore.
         """
         self.stop_server()
-        if jpype.isJVMStarted():
-            jpype.shutdownJVM()
-            logger.info("JVM shutdown.")
\ No newline at end of file
+        if self._jvm_acquired:
+            self._jvm_acquired = False
+            release_jvm()
\ No newline at end of file
@@ -0,0 +1,393 @@
+import re
+import time
+import random
+import bisect
+import threading
+from collections import deque
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loguru import logger
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, float('inf'))
+# Distinct fingerprints tracked, further ones are counted under OTHER_FINGERPRINT
+MAX_FINGERPRINTS = 1000
+OTHER_FINGERPRINT = '<other>'
+DEFAULT_SAMPLE_INTERVAL = 10
+# Samples kept by the status sampler, an hour at the default interval
+DEFAULT_SAMPLE_CAPACITY = 360
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+# Pool statistics that are gauges, the others count events
+POOL_GAUGES = {'size': 'Open connections of the pool.', 'idle': 'Idle connections of the pool.'}
+POOL_HELP = {'hits': 'Checkouts served by an idle connection.', 'misses': 'Checkouts that opened a new connection.',
+             'waits': 'Checkouts that waited for a connection.', 'wait_seconds': 'Seconds checkouts spent waiting.',
+             'timeouts': 'Checkouts that timed out.', 'created': 'Connections opened.', 'closed': 'Connections closed.',
+             'evicted': 'Idle connections closed after the idle timeout.',
+             'failed_health_checks': 'Connections dropped because they failed the health check.'}
+# SHOW GLOBAL STATUS variables that only grow, the others are exposed as gauges
+STATUS_COUNTERS = re.compile(r'(Com_|Bytes_|Handler_|Aborted_|Created_tmp_).*|Questions|Queries|Connections|'
+                             r'Slow_queries')
+
+_COMMENTS = re.compile(r'/\*(?!M?!).*?\*/|(?:--\s|#)[^\n]*', re.S)
+_LITERALS = re.compile(r"""'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|\b0x[0-9a-f]+\b|(?<![\w`$])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b""", re.I)
+_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(query):
+    """
+    Normalize a query so that executions differing only in literal values share a fingerprint: comments are
+    removed, string and number literals and %s placeholders become ?, value lists become (...) and
+    whitespace is collapsed.
+    """
+    text = _COMMENTS.sub(' ', query)
+    text = _LITERALS.sub('?', text).replace('%s', '?')
+    text = _LISTS.sub('(...)', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class LatencyHistogram:
+    """
+    Cumulative-bucket latency histogram in the Prometheus model.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """
+        Estimate a quantile by linear interpolation inside its bucket.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                if upper == float('inf'):
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-2]
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+
+class QueryMetrics:
+    """
+    Client-side latency histograms and error counters per query fingerprint.
+    """
+
+    def __init__(self, max_fingerprints=MAX_FINGERPRINTS):
+        self.max_fingerprints = max_fingerprints
+        # fingerprint -> [histogram, errors]
+        self._queries = {}
+        self._lock = threading.Lock()
+
+    def observe(self, query, seconds, error=False):
+        key = fingerprint(query)
+        with self._lock:
+            entry = self._queries.get(key)
+            if entry is None:
+                if len(self._queries) >= self.max_fingerprints:
+                    key = OTHER_FINGERPRINT
+                entry = self._queries.setdefault(key, [LatencyHistogram(), 0])
+            entry[0].observe(seconds)
+            if error:
+                entry[1] += 1
+
+    def items(self):
+        with self._lock:
+            return [(key, entry[0], entry[1]) for key, entry in self._queries.items()]
+
+    def snapshot(self):
+        """
+        Count, total and mean seconds, p50, p95 and p99 estimates and errors by fingerprint.
+        """
+        result = {}
+        for key, histogram, errors in self.items():
+            result[key] = {'count': histogram.count, 'seconds': histogram.sum,
+                           'mean': histogram.sum / histogram.count if histogram.count else None,
+                           'p50': histogram.quantile(0.5), 'p95': histogram.quantile(0.95),
+                           'p99': histogram.quantile(0.99), 'errors': errors}
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._queries = {}
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class StatusSampler:
+    """
+    Background thread sampling SHOW GLOBAL STATUS and the enabled InnoDB metrics into a ring buffer.
+    """
+
+    def __init__(self, connect, interval=DEFAULT_SAMPLE_INTERVAL, capacity=DEFAULT_SAMPLE_CAPACITY, innodb=True):
+        """
+        :param connect: Callable returning a new pymysql connection, kept open while sampling.
+        :param interval: Seconds between samples.
+        :param capacity: Number of samples kept, older ones are dropped.
+        :param innodb: Also sample information_schema.INNODB_METRICS, prefixed with 'innodb_metric.'.
+        """
+        self._connect = connect
+        self.interval = interval
+        self.innodb = innodb
+        self._samples = deque(maxlen=capacity)
+        self._stop = threading.Event()
+        self._thread = None
+        self._connection = None
+
+    def sample(self):
+        """
+        Take one sample now.
+
+        :return: (timestamp, dict of numeric status values)
+        """
+        if self._connection is None:
+            self._connection = self._connect()
+        values = {}
+        with self._connection.cursor() as cursor:
+            cursor.execute("SHOW GLOBAL STATUS")
+            for name, value in cursor.fetchall():
+                number = _number(value)
+                if number is not None:
+                    values[name] = number
+            if self.innodb:
+                try:
+                    cursor.execute("SELECT NAME, COUNT FROM information_schema.INNODB_METRICS WHERE ENABLED = 1")
+                    for name, count in cursor.fetchall():
+                        values[f'innodb_metric.{name}'] = float(count)
+                except Exception as e:
+                    logger.debug(f"INNODB_METRICS is not available: {e}")
+                    self.innodb = False
+        sample = (time.time(), values)
+        self._samples.append(sample)
+        return sample
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning(f"Status sample failed: {e}")
+                self._close_connection()
+            self._stop.wait(self.interval)
+        self._close_connection()
+
+    def _close_connection(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='mariadb4p-status-sampler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def samples(self):
+        return list(self._samples)
+
+    def latest(self):
+        return self._samples[-1] if self._samples else None
+
+    def rates(self, names):
+        """
+        Per-second change of counters between the two latest samples, e.g. ['Questions', 'Com_commit'].
+        """
+        if len(self._samples) < 2:
+            return {}
+        (t0, before), (t1, after) = self._samples[-2], self._samples[-1]
+        elapsed = t1 - t0
+        return {name: (after[name] - before[name]) / elapsed for name in names
+                if name in before and name in after and elapsed > 0}
+
+
+class QueryLogSampler:
+    """
+    Decides which successful queries are logged, errors are always logged by the caller.
+    """
+
+    def __init__(self, rate=0.0):
+        """
+        :param rate: Share of queries logged, from 0 (none) to 1 (all).
+        """
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError(f"Query log sample rate must be between 0 and 1, got {rate}")
+        self.rate = rate
+
+    def should_log(self):
+        return self.rate >= 1.0 or (self.rate > 0.0 and random.random() < self.rate)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name).lower()
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if value != value:
+        return 'NaN'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _family(lines, name, help_text, kind, samples, openmetrics):
+    # counter samples end in _total, OpenMetrics names the family without the suffix
+    sample_name = f'{name}_total' if kind == 'counter' else name
+    family = name if kind == 'counter' and openmetrics else sample_name
+    lines.append(f'# HELP {family} {help_text}')
+    lines.append(f'# TYPE {family} {kind}')
+    for labels, value in samples:
+        lines.append(f'{sample_name}{labels} {_format_value(value)}')
+
+
+def render_prometheus(query_metrics=None, status=None, pools=None, statement_cache=None, replication=None,
+                      routing=None, openmetrics=False):
+    """
+    Render metrics in the Prometheus text format, or OpenMetrics with openmetrics=True.
+
+    :param query_metrics: QueryMetrics.
+    :param status: Latest StatusSampler sample, (timestamp, values).
+    :param pools: dict of pool name to PoolStats dict, see MariaDBWrapper.pool_stats.
+    :param statement_cache: Prepared statement cache counters.
+    :param replication: dict of replica to 'seconds' and 'transactions' of lag, see ReplicationTopology.replication_lag.
+    :param routing: Read/write routing counters, see RoutingStats.
+    """
+    lines = []
+    if query_metrics is not None:
+        items = query_metrics.items()
+        lines.append('# HELP mariadb4p_query_duration_seconds Client-side query latency by fingerprint.')
+        lines.append('# TYPE mariadb4p_query_duration_seconds histogram')
+        for key, histogram, _ in items:
+            label = f'fingerprint="{_escape_label(key)}"'
+            for bound, count in histogram.cumulative():
+                lines.append(f'mariadb4p_query_duration_seconds_bucket{{{label},le="{_format_value(bound)}"}} {count}')
+            lines.append(f'mariadb4p_query_duration_seconds_sum{{{label}}} {_format_value(histogram.sum)}')
+            lines.append(f'mariadb4p_query_duration_seconds_count{{{label}}} {histogram.count}')
+        name = 'mariadb4p_query_errors' if openmetrics else 'mariadb4p_query_errors_total'
+        lines.append(f'# HELP {name} Failed queries by fingerprint.')
+        lines.append(f'# TYPE {name} counter')
+        for key, _, errors in items:
+            lines.append(f'mariadb4p_query_errors_total{{fingerprint="{_escape_label(key)}"}} {errors}')
+    pool_stats = {}
+    for pool, stats in (pools or {}).items():
+        for stat, value in stats.items():
+            pool_stats.setdefault(stat, []).append((f'{{pool="{_escape_label(pool)}"}}', value))
+    for stat, samples in pool_stats.items():
+        kind = 'gauge' if stat in POOL_GAUGES else 'counter'
+        help_text = POOL_GAUGES.get(stat) or POOL_HELP.get(stat, f'Connection pool {stat}.')
+        _family(lines, f'mariadb4p_pool_{_metric_name(stat)}', help_text, kind, samples, openmetrics)
+    for stat, value in (statement_cache or {}).items():
+        _family(lines, f'mariadb4p_statement_cache_{_metric_name(stat)}', f'Prepared statement cache {stat}.',
+                'counter', [('', value)], openmetrics)
+    if replication:
+        lines.append('# HELP mariadb4p_replica_lag_seconds Seconds_Behind_Master of each replica.')
+        lines.append('# TYPE mariadb4p_replica_lag_seconds gauge')
+        for replica, lag in replication.items():
+            # NaN while the replica is not replicating
+            seconds = float('nan') if lag['seconds'] is None else lag['seconds']
+            lines.append(f'mariadb4p_replica_lag_seconds{{replica="{_escape_label(replica)}"}} {_format_value(seconds)}')
+        lines.append('# HELP mariadb4p_replica_lag_transactions Transactions of the primary not yet applied.')
+        lines.append('# TYPE mariadb4p_replica_lag_transactions gauge')
+        for replica, lag in replication.items():
+            lines.append(f'mariadb4p_replica_lag_transactions{{replica="{_escape_label(replica)}"}} {lag["transactions"]}')
+    for stat, value in (routing or {}).items():
+        _family(lines, f'mariadb4p_routing_{_metric_name(stat)}', f'Read/write routing {stat}.', 'counter',
+                [('', value)], openmetrics)
+    if status is not None:
+        timestamp, values = status
+        for variable, value in sorted(values.items()):
+            kind = 'counter' if STATUS_COUNTERS.fullmatch(variable) else 'gauge'
+            _family(lines, f'mariadb_status_{_metric_name(variable)}', f'Server status variable {variable}.', kind,
+                    [('', value)], openmetrics)
+    if openmetrics:
+        lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """
+    HTTP endpoint serving /metrics from a daemon thread.
+    """
+
+    def __init__(self, render, host='127.0.0.1', port=0):
+        """
+        :param render: Callable taking openmetrics=True/False and returning the exposition text.
+        :param host: Interface to listen on, localhost by default.
+        :param port: Port to listen on, 0 picks a free one.
+        """
+        render_metrics = render
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+                body = render_metrics(openmetrics=openmetrics).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Metrics request: {format % args}")
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mariadb4p-metrics', daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    @property
+    def url(self):
+        host, port = self.address
+        return f'http://{host}:{port}/metrics'
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
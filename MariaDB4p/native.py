@@ -0,0 +1,340 @@
+import os
+import re
+import sys
+import time
+import atexit
+import hashlib
+import zipfile
+import threading
+import subprocess
+from pathlib import Path
+import pymysql
+from loguru import logger
+
+from MariaDB4p import templates
+from MariaDB4p.download_jars import read_lockfile
+from MariaDB4p.exceptions import ServerStartError
+from MariaDB4p.mariadb_wrapper import MariaDBWrapper
+
+# Cache of the binaries extracted from the mariaDB4j-db JARs
+NATIVE_DIR = Path(os.environ.get('MARIADB4P_NATIVE_DIR', Path(Path.home(), '.cache', 'MariaDB4p', 'native')))
+# Directory names the JARs use for the binaries of each platform
+PLATFORM_DIRS = {'linux': ('linux', 'linux64'), 'win32': ('winx64', 'win64', 'win32'), 'darwin': ('osx', 'mac', 'macos')}
+SERVER_NAMES = ('mariadbd', 'mysqld')
+INSTALL_DB_NAMES = ('mariadb-install-db', 'mysql_install_db')
+# Printed by the server once it accepts connections
+READY_MARKER = 'ready for connections'
+LOG_FILE = 'mariadb4p.err'
+DEFAULT_START_TIMEOUT = 60
+DEFAULT_STOP_TIMEOUT = 30
+_SERVER_ENTRY = re.compile(r'^(?P<base>(?:.*/)?)bin/(?:mariadbd|mysqld)(?:\.exe)?$')
+
+# Servers still running at interpreter exit are stopped
+_running = set()
+_running_lock = threading.Lock()
+
+
+def _platform_dirs():
+    for prefix, names in PLATFORM_DIRS.items():
+        if sys.platform.startswith(prefix):
+            return names
+    return ()
+
+
+def find_server_base(names):
+    """
+    Directory inside a JAR holding the bin/ directory of the server for this platform, or None.
+
+    :param names: Entry names of the JAR.
+    """
+    platforms = _platform_dirs()
+    for name in names:
+        match = _SERVER_ENTRY.match(name)
+        if match and any(part in platforms for part in match.group('base').split('/')):
+            return match.group('base')
+    return None
+
+
+def db_jars(jars_dir):
+    """
+    The mariaDB4j-db JARs of a jars directory, the locked one first.
+    """
+    jars = sorted(Path(jars_dir).glob('mariaDB4j-db*.jar'))
+    lock = read_lockfile(jars_dir) or {}
+    locked = [Path(jars_dir, entry['file']).name for entry in lock.get('artifacts', [])
+              if entry['artifact_id'].startswith('mariaDB4j-db') and entry.get('file')]
+    return sorted(jars, key=lambda jar: jar.name not in locked)
+
+
+def _extract(jar, base, dest):
+    with zipfile.ZipFile(jar) as archive:
+        for info in archive.infolist():
+            if not info.filename.startswith(base) or info.is_dir():
+                continue
+            target = Path(dest, info.filename[len(base):])
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with archive.open(info) as src, open(target, 'wb') as dst:
+                while True:
+                    chunk = src.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+            mode = (info.external_attr >> 16) & 0o777
+            # JARs rarely keep the executable bits
+            if target.parent.name in ('bin', 'scripts'):
+                mode |= 0o755
+            if mode:
+                os.chmod(target, mode)
+
+
+class NativeBinaries:
+    """
+    MariaDB binaries extracted from a mariaDB4j-db JAR.
+    """
+
+    def __init__(self, base_dir):
+        self.base_dir = Path(base_dir)
+        self.server = self._find('bin', SERVER_NAMES)
+        if self.server is None:
+            raise FileNotFoundError(f"No mariadbd or mysqld in {self.base_dir}")
+        self.install_db = self._find('bin', INSTALL_DB_NAMES) or self._find('scripts', INSTALL_DB_NAMES)
+
+    def _find(self, directory, names):
+        for name in names:
+            for candidate in (name, f'{name}.exe'):
+                path = self.base_dir / directory / candidate
+                if path.exists():
+                    return path
+        return None
+
+    def environment(self):
+        """
+        Process environment with the bundled shared libraries, if any, on the library path.
+        """
+        env = dict(os.environ)
+        libs = self.base_dir / 'libs'
+        if libs.is_dir():
+            variable = 'DYLD_LIBRARY_PATH' if sys.platform == 'darwin' else 'LD_LIBRARY_PATH'
+            env[variable] = os.pathsep.join(filter(None, [str(libs), env.get(variable)]))
+        return env
+
+
+def extract_binaries(jars_dir, native_dir=None):
+    """
+    Extract the server binaries for this platform from the mariaDB4j-db JAR once into a cache directory
+    named after the JAR, concurrent callers wait for the first extraction.
+
+    :param jars_dir: Directory of the MariaDB4j JARs.
+    :param native_dir: Cache directory, defaults to NATIVE_DIR.
+    :return: NativeBinaries
+    """
+    for jar in db_jars(jars_dir):
+        with zipfile.ZipFile(jar) as archive:
+            base = find_server_base(archive.namelist())
+        if base is None:
+            continue
+        stat = jar.stat()
+        key = f"{jar.stem}-{hashlib.sha1(f'{base}:{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest()[:8]}"
+        path = templates.ensure_template(key, lambda dest: _extract(jar, base, dest), native_dir or NATIVE_DIR)
+        return NativeBinaries(path)
+    raise FileNotFoundError(f"No mariaDB4j-db JAR with binaries for {sys.platform} in {jars_dir}")
+
+
+def _root_args():
+    # mariadbd refuses to run as root unless asked to
+    return ['--user=root'] if hasattr(os, 'geteuid') and os.geteuid() == 0 else []
+
+
+class NativeServer:
+    """
+    A mariadbd process, with the start/stop/isRunning/createDB interface of MariaDB4j's DB.
+    """
+
+    def __init__(self, binaries, data_dir, port=None, socket_path=None, args=(), start_timeout=DEFAULT_START_TIMEOUT,
+                 detached=False):
+        """
+        :param detached: Run the server in its own session and leave it running at interpreter exit, so it can
+            outlive this process, see MariaDB4p.broker.
+        """
+        self.binaries = binaries
+        self.data_dir = Path(data_dir)
+        self.port = port
+        self.socket_path = socket_path
+        self.args = list(args)
+        self.start_timeout = start_timeout
+        self.detached = detached
+        self.process = None
+        self._stopping = False
+
+    def _run(self, command):
+        result = subprocess.run(command, env=self.binaries.environment(), cwd=str(self.binaries.base_dir),
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        return result.returncode, result.stdout
+
+    def install(self):
+        """
+        Initialize the system tables of an empty data directory.
+        """
+        if (self.data_dir / 'mysql').is_dir():
+            return
+        if self.binaries.install_db is None:
+            raise ServerStartError(f"No mariadb-install-db in {self.binaries.base_dir}")
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        command = [str(self.binaries.install_db), f'--datadir={self.data_dir}']
+        if sys.platform != 'win32':
+            command[1:1] = ['--no-defaults', f'--basedir={self.binaries.base_dir}']
+            command += ['--force', '--skip-name-resolve', '--skip-test-db'] + _root_args()
+            # MariaDB 10.4+ uses unix_socket authentication for root unless told otherwise
+            code, output = self._run(command + ['--auth-root-authentication-method=normal'])
+            if code != 0 and 'auth-root-authentication-method' in output:
+                code, output = self._run(command)
+        else:
+            code, output = self._run(command)
+        if code != 0:
+            raise ServerStartError(f"mariadb-install-db failed with exit code {code}:\n{output[-4000:]}")
+
+    def command(self):
+        command = [str(self.binaries.server), '--no-defaults', f'--basedir={self.binaries.base_dir}',
+                   f'--datadir={self.data_dir}']
+        if self.port:
+            command.append(f'--port={self.port}')
+        if self.socket_path:
+            command.append(f'--socket={self.socket_path}')
+        if sys.platform == 'win32':
+            command.append('--console')
+        return command + _root_args() + self.args
+
+    @property
+    def log_path(self):
+        return self.data_dir / LOG_FILE
+
+    def _log_tail(self, size=4000):
+        try:
+            return self.log_path.read_text(errors='replace')[-size:]
+        except OSError:
+            return ''
+
+    def start(self):
+        """
+        Install the data directory if needed, launch mariadbd and wait until it reports that it accepts
+        connections.
+        """
+        if self.isRunning():
+            return
+        self.install()
+        log = open(self.log_path, 'ab')
+        offset = log.tell()
+        try:
+            self.process = subprocess.Popen(self.command(), env=self.binaries.environment(), stdout=log,
+                                            stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                            start_new_session=self.detached)
+        finally:
+            log.close()
+        self._stopping = False
+        if not self.detached:
+            with _running_lock:
+                _running.add(self)
+        threading.Thread(target=self._supervise, name=f'mariadbd-{self.process.pid}', daemon=True).start()
+        deadline = time.monotonic() + self.start_timeout
+        while True:
+            with open(self.log_path, 'rb') as f:
+                f.seek(offset)
+                if READY_MARKER in f.read().decode(errors='replace'):
+                    return
+            if self.process.poll() is not None:
+                raise ServerStartError(f"mariadbd exited with code {self.process.returncode}:\n{self._log_tail()}")
+            if time.monotonic() >= deadline:
+                self.stop()
+                raise ServerStartError(f"mariadbd did not start within {self.start_timeout}s:\n{self._log_tail()}")
+            time.sleep(0.02)
+
+    def _supervise(self):
+        process = self.process
+        code = process.wait()
+        with _running_lock:
+            _running.discard(self)
+        if self.detached:
+            # shared servers are stopped by other processes, see MariaDB4p.broker
+            logger.info(f"Detached mariadbd (pid {process.pid}) exited with code {code}")
+        elif not self._stopping:
+            logger.error(f"mariadbd (pid {process.pid}) exited unexpectedly with code {code}:\n{self._log_tail(2000)}")
+
+    def stop(self, timeout=DEFAULT_STOP_TIMEOUT):
+        """
+        Shut the server down cleanly with SIGTERM, killing it after the timeout.
+        """
+        process = self.process
+        if process is None or process.poll() is not None:
+            return
+        self._stopping = True
+        process.terminate()
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"mariadbd (pid {process.pid}) did not stop within {timeout}s, killing it")
+            process.kill()
+            process.wait()
+        with _running_lock:
+            _running.discard(self)
+
+    def isRunning(self):
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process is not None else None
+
+    def createDB(self, db_name):
+        params = {'unix_socket': self.socket_path} if self.socket_path and os.path.exists(self.socket_path) \
+            else {'host': 'localhost', 'port': self.port}
+        connection = pymysql.connect(user='root', password='', **params)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name.replace('`', '``')}`")
+        finally:
+            connection.close()
+
+
+@atexit.register
+def _stop_running_servers():
+    with _running_lock:
+        servers = list(_running)
+    for server in servers:
+        server.stop()
+
+
+class NativeMariaDBWrapper(MariaDBWrapper):
+    """
+    MariaDBWrapper running mariadbd directly as a child process, without a JDK or JVM.
+
+    The binaries are extracted once from the mariaDB4j-db JAR in jars_dir into NATIVE_DIR. Everything else,
+    data directory templates, profiles, pools and readiness checks, works as with MariaDBWrapper.
+    """
+
+    def __init__(self, *args, detached=False, **kwargs):
+        """
+        Takes the MariaDBWrapper arguments.
+
+        :param detached: Start mariadbd in its own session, see NativeServer.
+        """
+        self.detached = detached
+        super().__init__(*args, **kwargs)
+
+    def _prepare_runtime(self, jdk_version, jdk_install_dir):
+        self.jvm_dir = None
+        self.binaries = None
+
+    def start_jvm(self, jars_dir=None):
+        """
+        No JVM is needed.
+        """
+
+    def _native_binaries(self):
+        if self.binaries is None:
+            with self.startup_profile.phase('native_extract'):
+                self.binaries = extract_binaries(self.jars_dir)
+        return self.binaries
+
+    def _new_embedded_db(self, data_dir, port, socket_path):
+        return NativeServer(self._native_binaries(), data_dir, port, socket_path, self._server_arguments(),
+                            detached=self.detached)
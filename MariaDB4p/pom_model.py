@@ -0,0 +1,281 @@
+import re
+import threading
+from pathlib import Path
+import xml.etree.ElementTree as ET
+from loguru import logger
+
+POM_NAMESPACE = '{http://maven.apache.org/POM/4.0.0}'
+PROPERTY_PATTERN = re.compile(r'\$\{([^}]+)\}')
+# Guard against parent or BOM import cycles
+MAX_INHERITANCE_DEPTH = 32
+
+
+def _local_name(tag):
+    return tag[len(POM_NAMESPACE):] if tag.startswith(POM_NAMESPACE) else tag
+
+
+def _child(element, name):
+    """
+    Find a direct child by local name, for POMs with or without the Maven namespace.
+    """
+    if element is None:
+        return None
+    found = element.find(POM_NAMESPACE + name)
+    if found is None:
+        found = element.find(name)
+    return found
+
+
+def _children(element, name):
+    if element is None:
+        return []
+    return element.findall(POM_NAMESPACE + name) + element.findall(name)
+
+
+def _text(element, name, default=None):
+    found = _child(element, name)
+    if found is None or found.text is None:
+        return default
+    return found.text.strip()
+
+
+def _parse_dependency(element):
+    return {
+        'group_id': _text(element, 'groupId'),
+        'artifact_id': _text(element, 'artifactId'),
+        'version': _text(element, 'version'),
+        'scope': _text(element, 'scope'),
+        'type': _text(element, 'type'),
+        'classifier': _text(element, 'classifier'),
+        'optional': _text(element, 'optional') == 'true',
+    }
+
+
+def parse_raw_pom(pom_path):
+    """
+    Read the parts of a POM the resolver needs, without any inheritance or interpolation.
+
+    :param pom_path: Path of the POM file.
+    :return: dict with the raw coordinates, parent, properties, dependencyManagement and dependencies.
+    """
+    root = ET.parse(pom_path).getroot()
+    parent = _child(root, 'parent')
+    properties = _child(root, 'properties')
+    management = _child(_child(root, 'dependencyManagement'), 'dependencies')
+    return {
+        'group_id': _text(root, 'groupId'),
+        'artifact_id': _text(root, 'artifactId'),
+        'version': _text(root, 'version'),
+        'packaging': _text(root, 'packaging', 'jar'),
+        'parent': None if parent is None else (_text(parent, 'groupId'), _text(parent, 'artifactId'), _text(parent, 'version')),
+        'properties': {} if properties is None else {_local_name(prop.tag): (prop.text or '').strip()
+                                                     for prop in properties if isinstance(prop.tag, str)},
+        'managed': [_parse_dependency(dep) for dep in _children(management, 'dependency')],
+        'dependencies': [_parse_dependency(dep) for dep in _children(_child(root, 'dependencies'), 'dependency')],
+    }
+
+
+def interpolate(text, properties):
+    """
+    Replace ${...} references with values from properties, leaving unknown references untouched.
+    """
+    if text is None or '${' not in text:
+        return text
+    return PROPERTY_PATTERN.sub(lambda match: properties.get(match.group(1), match.group(0)), text)
+
+
+def resolve_property_map(raw_properties):
+    """
+    Resolve every property against the others, each one exactly once.
+
+    :param raw_properties: dict of property name to uninterpolated value.
+    :return: dict of property name to resolved value.
+    """
+    resolved = {}
+    resolving = set()
+
+    def lookup(name):
+        if name in resolved:
+            return resolved[name]
+        value = raw_properties.get(name)
+        if value is None or name in resolving:
+            return None
+        resolving.add(name)
+        value = PROPERTY_PATTERN.sub(lambda match: lookup(match.group(1)) or match.group(0), value)
+        resolving.discard(name)
+        resolved[name] = value
+        return value
+
+    for name in raw_properties:
+        lookup(name)
+    return resolved
+
+
+class PomModel:
+    """
+    Effective model of a POM: parent chain merged, properties resolved and managed versions indexed.
+    """
+
+    def __init__(self, group_id, artifact_id, version, packaging, properties, managed, declared, dependencies):
+        self.group_id = group_id
+        self.artifact_id = artifact_id
+        self.version = version
+        self.packaging = packaging
+        # Resolved properties, including the project.* built-ins
+        self.properties = properties
+        # (groupId, artifactId) -> managed dependency dict
+        self.managed = managed
+        # (groupId, artifactId) -> dependency dict as declared by this POM or inherited, before management
+        self.declared = declared
+        # Dependency dicts with versions and scopes filled in from dependencyManagement
+        self.dependencies = dependencies
+
+    @property
+    def coordinates(self):
+        return self.group_id, self.artifact_id, self.version
+
+
+class PomCache:
+    """
+    Parse each POM once and memoize the effective models built from it.
+
+    Parent POMs and import-scoped BOMs are requested through fetch_pom, so a resolver can fetch them from
+    its repository. The cache is thread-safe, concurrent requests for the same POM build it only once.
+    """
+
+    def __init__(self, fetch_pom=None):
+        """
+        :param fetch_pom: Callable (group_id, artifact_id, version) returning the local path of that POM, or
+            None if it cannot be found. Without it, parents and BOMs are not followed.
+        """
+        self.fetch_pom = fetch_pom
+        self._raw = {}
+        self._models = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _memoized(self, cache, key, build):
+        with self._lock:
+            if key in cache:
+                return cache[key]
+            key_lock = self._key_locks.setdefault((id(cache), key), threading.RLock())
+        with key_lock:
+            with self._lock:
+                if key in cache:
+                    return cache[key]
+            value = build()
+            with self._lock:
+                cache[key] = value
+            return value
+
+    def raw(self, pom_path):
+        """
+        Parsed but uninterpolated content of a POM file, or None if it cannot be parsed.
+        """
+        def build():
+            logger.debug(f"Parsing POM: {pom_path}")
+            try:
+                return parse_raw_pom(pom_path)
+            except (ET.ParseError, OSError) as e:
+                logger.error(f"Failed to parse {pom_path}: {e}")
+                return None
+        return self._memoized(self._raw, str(Path(pom_path).resolve()), build)
+
+    def load(self, pom_path, _depth=0):
+        """
+        Effective model of a local POM file.
+
+        :return: PomModel, or None if the POM cannot be parsed.
+        """
+        return self._memoized(self._models, str(Path(pom_path).resolve()), lambda: self._build(pom_path, _depth))
+
+    def get(self, group_id, artifact_id, version, _depth=0):
+        """
+        Effective model of a POM identified by its coordinates, fetched through fetch_pom.
+
+        :return: PomModel, or None if the POM is unavailable.
+        """
+        if self.fetch_pom is None or None in (group_id, artifact_id, version) or _depth > MAX_INHERITANCE_DEPTH:
+            return None
+
+        def build():
+            pom_path = self.fetch_pom(group_id, artifact_id, version)
+            if pom_path is None:
+                logger.warning(f"POM not available for {group_id}:{artifact_id}:{version}")
+                return None
+            return self.load(pom_path, _depth)
+        return self._memoized(self._models, (group_id, artifact_id, version), build)
+
+    def _build(self, pom_path, depth):
+        raw = self.raw(pom_path)
+        if raw is None:
+            return None
+        parent = None
+        if raw['parent'] is not None:
+            parent = self.get(*raw['parent'], _depth=depth + 1)
+            if parent is None:
+                logger.warning(f"Parent {':'.join(map(str, raw['parent']))} of {pom_path} could not be loaded.")
+
+        # Properties: inherited, then own, then the project built-ins
+        raw_properties = dict(parent.properties) if parent is not None else {}
+        raw_properties.update(raw['properties'])
+        parent_group_id, parent_artifact_id, parent_version = raw['parent'] or (None, None, None)
+        builtins = {
+            'project.groupId': raw['group_id'] or parent_group_id,
+            'project.artifactId': raw['artifact_id'],
+            'project.version': raw['version'] or parent_version,
+            'project.packaging': raw['packaging'],
+            'project.parent.groupId': parent_group_id,
+            'project.parent.artifactId': parent_artifact_id,
+            'project.parent.version': parent_version,
+        }
+        for name, value in builtins.items():
+            if value is not None:
+                raw_properties[name] = value
+                # pom.* and bare names are deprecated aliases that are still common in older POMs
+                raw_properties['pom.' + name[len('project.'):]] = value
+        raw_properties.setdefault('version', raw_properties.get('project.version'))
+        properties = resolve_property_map({name: value for name, value in raw_properties.items() if value is not None})
+
+        # dependencyManagement: own entries override the parent's, imported BOMs fill the gaps in order
+        managed = dict(parent.managed) if parent is not None else {}
+        own = {}
+        imports = []
+        for dep in raw['managed']:
+            dep = {key: interpolate(value, properties) if isinstance(value, str) else value for key, value in dep.items()}
+            if dep['scope'] == 'import' and dep['type'] == 'pom':
+                imports.append(dep)
+            else:
+                own[(dep['group_id'], dep['artifact_id'])] = dep
+        managed.update(own)
+        for dep in imports:
+            bom = self.get(dep['group_id'], dep['artifact_id'], dep['version'], _depth=depth + 1)
+            if bom is None:
+                logger.warning(f"BOM {dep['group_id']}:{dep['artifact_id']}:{dep['version']} could not be loaded.")
+                continue
+            for key, value in bom.managed.items():
+                if key not in own:
+                    managed.setdefault(key, value)
+
+        # Dependencies: own ones override inherited ones with the same key, then managed versions and scopes are
+        # applied to all of them, so the child's dependencyManagement also governs what it inherits
+        declared = {}
+        for dep in raw['dependencies']:
+            dep = {key: interpolate(value, properties) if isinstance(value, str) else value for key, value in dep.items()}
+            declared[(dep['group_id'], dep['artifact_id'])] = dep
+        if parent is not None:
+            for key, dep in parent.declared.items():
+                declared.setdefault(key, dep)
+        dependencies = []
+        for key, dep in declared.items():
+            dep = dict(dep)
+            managed_dep = managed.get(key)
+            if managed_dep is not None:
+                if dep['version'] is None:
+                    dep['version'] = managed_dep['version']
+                if dep['scope'] is None:
+                    dep['scope'] = managed_dep['scope']
+            dependencies.append(dep)
+
+        return PomModel(properties.get('project.groupId'), raw['artifact_id'], properties.get('project.version'),
+                        raw['packaging'], properties, managed, declared, dependencies)
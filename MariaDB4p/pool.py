@@ -0,0 +1,261 @@
+import time
+import threading
+from contextlib import contextmanager
+from pymysql.constants import SERVER_STATUS
+from loguru import logger
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no connection becomes available within the acquire timeout.
+    """
+
+
+class PoolStats:
+    """
+    Counters of a ConnectionPool, for sizing it.
+    """
+
+    def __init__(self):
+        # checkouts served by an idle connection
+        self.hits = 0
+        # checkouts that had to open a new connection
+        self.misses = 0
+        # checkouts that had to wait for a connection to be returned
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self.created = 0
+        self.closed = 0
+        self.evicted = 0
+        self.failed_health_checks = 0
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def in_transaction(connection):
+    """
+    Whether a connection may have an open transaction, by the status flags of the server's last OK packet.
+
+    pymysql does not read the status of the packet ending a result set, so after a statement returning rows
+    (a result without server_status) the status is stale and a transaction is assumed. commit() and rollback()
+    clear the result. Connections without server_status are assumed to be in a transaction.
+    """
+    status = getattr(connection, 'server_status', None)
+    if status is None:
+        return True
+    result = getattr(connection, '_result', None)
+    if result is not None and result.server_status is None:
+        return True
+    return bool(status & SERVER_STATUS.SERVER_STATUS_IN_TRANS)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections.
+
+    Idle connections are reused last-in first-out, connections idle for longer than idle_timeout are
+    closed down to min_size, and a connection that was idle for longer than health_check_after is pinged
+    before it is handed out.
+    """
+
+    def __init__(self, connect, min_size=0, max_size=10, idle_timeout=300, health_check_after=1.0, acquire_timeout=30):
+        """
+        :param connect: Callable returning a new connection.
+        :param min_size: Number of connections kept open even when idle.
+        :param max_size: Maximum number of open connections, checkouts wait once it is reached.
+        :param idle_timeout: Seconds after which an idle connection above min_size is closed.
+        :param health_check_after: Idle seconds after which a connection is pinged on checkout, 0 always pings.
+        :param acquire_timeout: Default seconds to wait for a connection before raising PoolTimeout.
+        """
+        if max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+        self.stats = PoolStats()
+        # (connection, last_used) pairs, most recently used last
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def size(self):
+        """
+        Number of open connections, idle or checked out.
+        """
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def prefill(self):
+        """
+        Open connections up to min_size.
+        """
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = self._open()
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                raise
+            with self._condition:
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
+
+    def _open(self):
+        connection = self._connect()
+        with self._condition:
+            self.stats.created += 1
+        return connection
+
+    def _close(self, connection):
+        with self._condition:
+            self.stats.closed += 1
+        try:
+            connection.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection: {e}")
+
+    def _evict_idle(self, now):
+        # called with the condition held, the oldest idle connections are first
+        expired = []
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+            expired.append(self._idle.pop(0)[0])
+            self._size -= 1
+            self.stats.evicted += 1
+        return expired
+
+    def _healthy(self, connection):
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._condition:
+                self.stats.failed_health_checks += 1
+            return False
+
+    def acquire(self, timeout=None):
+        """
+        Check out a connection, waiting for one to be returned if the pool is at max_size.
+
+        :param timeout: Seconds to wait, defaults to acquire_timeout.
+        :return: A connection, which must be given back with release().
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed.")
+                now = time.monotonic()
+                expired = self._evict_idle(now)
+                connection = None
+                last_used = now
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    self.stats.hits += 1
+                elif self._size < self.max_size:
+                    self._size += 1
+                    self.stats.misses += 1
+                else:
+                    if not waited:
+                        self.stats.waits += 1
+                        waited = True
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.stats.timeouts += 1
+                        raise PoolTimeout(f"No connection available within {timeout}s (max_size={self.max_size}).")
+                    wait_start = time.monotonic()
+                    self._condition.wait(remaining)
+                    self.stats.wait_seconds += time.monotonic() - wait_start
+                    continue
+            for stale in expired:
+                self._close(stale)
+            if connection is None:
+                try:
+                    return self._open()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+            if now - last_used < self.health_check_after or self._healthy(connection):
+                return connection
+            self.discard(connection)
+
+    def release(self, connection):
+        """
+        Return a checked out connection to the pool. An open transaction is rolled back first, so the next
+        borrower neither inherits uncommitted work nor a stale REPEATABLE READ read view. Connections that
+        committed skip the round trip, see in_transaction. A connection whose rollback fails is discarded.
+        """
+        try:
+            if in_transaction(connection):
+                connection.rollback()
+        except Exception as e:
+            logger.debug(f"Discarding pooled connection after failed rollback: {e}")
+            self.discard(connection)
+            return
+        with self._condition:
+            if not self._closed:
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
+                return
+            self._size -= 1
+        self._close(connection)
+
+    def discard(self, connection):
+        """
+        Close a checked out connection instead of returning it, e.g. after a connection error.
+        """
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+        self._close(connection)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager checking out a connection. Uncommitted work is rolled back when it is returned.
+        """
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    @contextmanager
+    def transaction(self, timeout=None):
+        """
+        Context manager running the block in a transaction, committed on success and rolled back otherwise.
+        """
+        with self.connection(timeout) as connection:
+            connection.begin()
+            yield connection
+            connection.commit()
+
+    def close(self):
+        """
+        Close the idle connections, connections still checked out are closed when they are returned.
+        """
+        with self._condition:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._idle = []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            self._close(connection)
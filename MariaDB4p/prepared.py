@@ -0,0 +1,171 @@
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from loguru import logger
+
+# Prepared statements kept per connection, the server allows max_prepared_stmt_count (16382) in total
+DEFAULT_CACHE_SIZE = 128
+# Prepared statement needs to be re-prepared, unknown prepared statement handler
+REPREPARE_ERRORS = (1615, 1243)
+# This command is not supported in the prepared statement protocol yet
+UNSUPPORTED_ERROR = 1295
+_PLACEHOLDERS = re.compile(r'%s|%%')
+_DDL = re.compile(r'\s*(?:CREATE|ALTER|DROP|RENAME|TRUNCATE)\b', re.I)
+
+
+def to_qmark(query):
+    """
+    Turn the pymysql style %s placeholders of a query into the ? placeholders of PREPARE. As with pymysql,
+    a literal % is written %%.
+    """
+    def replace(match):
+        return '?' if match.group() == '%s' else '%'
+    return _PLACEHOLDERS.sub(replace, query)
+
+
+class StatementCacheStats:
+    """
+    Counters shared by the statement caches of a wrapper's connections.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # statements prepared again after DDL or a lost handle
+        self.reprepares = 0
+        # caches cleared because the connection was reconnected
+        self.invalidations = 0
+        self.unpreparable = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, count=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + count)
+
+    def to_dict(self):
+        return {name: value for name, value in vars(self).items() if not name.startswith('_')}
+
+
+class StatementCache:
+    """
+    Least recently used cache of the server-side prepared statements of one connection.
+
+    pymysql does not implement the binary protocol's COM_STMT_PREPARE, so statements are prepared with SQL
+    PREPARE and run with EXECUTE ... USING <literals>: the server parses only the short EXECUTE, the
+    statement itself is parsed and planned once. Results come back in the text protocol.
+    """
+
+    def __init__(self, connection, max_size=DEFAULT_CACHE_SIZE, stats=None):
+        self.connection = weakref.ref(connection)
+        self.max_size = max_size
+        self.stats = stats or StatementCacheStats()
+        # query -> statement name, least recently used first
+        self._statements = OrderedDict()
+        self._unpreparable = set()
+        self._counter = 0
+        self._thread_id = getattr(connection, 'server_thread_id', None)
+
+    def __len__(self):
+        return len(self._statements)
+
+    def _check_connection(self, connection):
+        # a reconnect (ping(reconnect=True)) starts a new server session without our statements
+        thread_id = getattr(connection, 'server_thread_id', None)
+        if thread_id != self._thread_id:
+            if self._statements:
+                self.stats.add('invalidations')
+            self._statements.clear()
+            self._thread_id = thread_id
+
+    def _prepare(self, cursor, connection, query):
+        self._counter += 1
+        name = f'mariadb4p_s{self._counter}'
+        cursor.execute(f"PREPARE {name} FROM {connection.escape(to_qmark(query))}")
+        self._statements[query] = name
+        while len(self._statements) > self.max_size:
+            _, evicted = self._statements.popitem(last=False)
+            cursor.execute(f"DEALLOCATE PREPARE {evicted}")
+            self.stats.add('evictions')
+        return name
+
+    def clear(self, cursor=None):
+        """
+        Deallocate all statements, e.g. after DDL on the connection.
+        """
+        statements, self._statements = list(self._statements.values()), OrderedDict()
+        if cursor is not None:
+            for name in statements:
+                try:
+                    cursor.execute(f"DEALLOCATE PREPARE {name}")
+                except Exception as e:
+                    logger.debug(f"Failed to deallocate {name}: {e}")
+
+    def execute(self, cursor, query, params=None):
+        """
+        Run a query through its prepared statement, preparing it on first use.
+
+        DDL runs as plain text and clears the cache. Statements the server cannot prepare are remembered
+        and run as plain text.
+
+        :param cursor: Cursor of the cache's connection.
+        :param query: SQL with %s placeholders.
+        :param params: Sequence of parameter values.
+        """
+        import pymysql
+        connection = self.connection()
+        self._check_connection(connection)
+        params = tuple(params or ())
+        if _DDL.match(query):
+            cursor.execute(query, params or None)
+            self.clear(cursor)
+            return
+        if query in self._unpreparable:
+            cursor.execute(query, params or None)
+            return
+        name = self._statements.get(query)
+        if name is None:
+            self.stats.add('misses')
+            try:
+                name = self._prepare(cursor, connection, query)
+            except pymysql.err.MySQLError as e:
+                if e.args and e.args[0] == UNSUPPORTED_ERROR:
+                    self._unpreparable.add(query)
+                    self.stats.add('unpreparable')
+                    cursor.execute(query, params or None)
+                    return
+                raise
+        else:
+            self.stats.add('hits')
+            self._statements.move_to_end(query)
+        using = ''
+        if params:
+            using = " USING " + ', '.join(connection.escape(value) for value in params)
+        try:
+            cursor.execute(f"EXECUTE {name}{using}")
+        except pymysql.err.MySQLError as e:
+            if not e.args or e.args[0] not in REPREPARE_ERRORS:
+                raise
+            self.stats.add('reprepares')
+            self._statements.pop(query, None)
+            if e.args[0] == 1615:
+                cursor.execute(f"DEALLOCATE PREPARE {name}")
+            name = self._prepare(cursor, connection, query)
+            cursor.execute(f"EXECUTE {name}{using}")
+
+
+# Statement caches by connection, dropped together with the connection
+_caches = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def statement_cache(connection, max_size=DEFAULT_CACHE_SIZE, stats=None):
+    """
+    The statement cache of a connection, created on first use.
+    """
+    with _caches_lock:
+        cache = _caches.get(connection)
+        if cache is None:
+            cache = _caches[connection] = StatementCache(connection, max_size, stats)
+        return cache
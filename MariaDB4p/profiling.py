@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import time
+import platform
+from pathlib import Path
+from contextlib import contextmanager
+from loguru import logger
+
+from MariaDB4p import __version__
+
+
+class StartupProfile:
+    """
+    Monotonic timings of the startup phases of a MariaDBWrapper.
+
+    Each phase is recorded with its offset from the creation of the profile and its duration. Hooks
+    receive a 'phase_start' and a 'phase_end' event dict for every phase as it happens.
+    """
+
+    def __init__(self, hooks=None):
+        """
+        :param hooks: Callables receiving event dicts with keys 'event', 'phase', 'offset', 'duration'
+            (phase_end only), 'error' (phase_end only) and any details passed to phase().
+        """
+        self.hooks = list(hooks or [])
+        self.created_at = time.time()
+        self._origin = time.perf_counter()
+        self.phases = []
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def _emit(self, event):
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                logger.warning(f"Startup profile hook {hook} failed: {e}")
+
+    @contextmanager
+    def phase(self, name, **details):
+        """
+        Time the enclosed block as a startup phase. Exceptions are recorded and re-raised.
+        """
+        start = time.perf_counter()
+        self._emit(dict(details, event='phase_start', phase=name, offset=start - self._origin))
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record = dict(details, phase=name, offset=start - self._origin,
+                          duration=time.perf_counter() - start, error=error)
+            self.phases.append(record)
+            logger.debug(f"Startup phase {name} took {record['duration']:.3f}s")
+            self._emit(dict(record, event='phase_end'))
+
+    def durations(self):
+        """
+        Total seconds spent in each phase, by phase name.
+        """
+        totals = {}
+        for record in self.phases:
+            totals[record['phase']] = totals.get(record['phase'], 0.0) + record['duration']
+        return totals
+
+    @property
+    def total(self):
+        return sum(record['duration'] for record in self.phases)
+
+    def to_dict(self):
+        return {
+            'created_at': self.created_at,
+            'total': self.total,
+            'phases': list(self.phases),
+            'environment': {
+                'mariadb4p': __version__,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'machine': platform.machine(),
+                'cpu_count': os.cpu_count(),
+                'executable': sys.executable,
+            },
+        }
+
+    def to_json(self, path=None):
+        """
+        Export the profile as JSON.
+
+        :param path: If given, the JSON is also written to this file.
+        :return: The JSON string.
+        """
+        text = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            Path(path).write_text(text)
+        return text
+
+    def report(self):
+        """
+        Human readable table of the phases.
+        """
+        lines = [f"{'phase':<24}{'offset':>10}{'duration':>10}"]
+        for record in self.phases:
+            status = '' if record['error'] is None else f"  ({record['error']})"
+            lines.append(f"{record['phase']:<24}{record['offset']:>9.3f}s{record['duration']:>9.3f}s{status}")
+        lines.append(f"{'total':<24}{'':>10}{self.total:>9.3f}s")
+        return '\n'.join(lines)
@@ -0,0 +1,171 @@
+import re
+import time
+from pymysql.converters import escape_string
+from loguru import logger
+
+# Multi-statement batches are split so that each stays well below the default max_allowed_packet (16M)
+MAX_BATCH_BYTES = 1024 * 1024
+_CHARSET = re.compile(r'[A-Za-z0-9_]+')
+_PRIVILEGE = re.compile(r'[A-Za-z][A-Za-z ]*(\([A-Za-z0-9_, `]+\))?')
+
+
+def quote_name(name):
+    return '`' + str(name).replace('`', '``') + '`'
+
+
+def quote_string(value, connection=None):
+    """
+    Quote a string literal, through the connection if given so that the server's NO_BACKSLASH_ESCAPES mode is
+    respected.
+    """
+    if connection is not None:
+        return connection.escape(str(value))
+    return "'" + escape_string(str(value)) + "'"
+
+
+def account(user, host='%', connection=None):
+    return f"{quote_string(user, connection)}@{quote_string(host, connection)}"
+
+
+def _as_dict(spec, fields):
+    if isinstance(spec, dict):
+        return dict(spec)
+    if isinstance(spec, str):
+        spec = (spec,)
+    return dict(zip(fields, spec))
+
+
+def database_statement(spec):
+    """
+    CREATE DATABASE statement for a name or a dict with 'name' and optional 'charset' and 'collation'.
+    """
+    spec = _as_dict(spec, ('name', 'charset', 'collation'))
+    sql = f"CREATE DATABASE IF NOT EXISTS {quote_name(spec['name'])}"
+    for option, clause in (('charset', 'CHARACTER SET'), ('collation', 'COLLATE')):
+        if spec.get(option):
+            if not _CHARSET.fullmatch(spec[option]):
+                raise ValueError(f"Invalid {option}: {spec[option]!r}")
+            sql += f" {clause} {spec[option]}"
+    return sql
+
+
+def user_statements(spec, replace=False, connection=None):
+    """
+    CREATE USER statements for a (user, password[, host]) tuple or a dict with 'user', 'password' and 'host'.
+
+    :param replace: Use CREATE OR REPLACE USER, which drops existing grants. Otherwise existing users keep their
+        grants, an ALTER USER sets the password given, which CREATE USER IF NOT EXISTS would leave unchanged.
+    :param connection: Connection whose escaping rules are used, see quote_string.
+    """
+    spec = _as_dict(spec, ('user', 'password', 'host'))
+    name = account(spec['user'], spec.get('host') or '%', connection)
+    password = None
+    if spec.get('password') is not None:
+        password = f" IDENTIFIED BY {quote_string(spec['password'], connection)}"
+    if replace:
+        return [f"CREATE OR REPLACE USER {name}{password or ''}"]
+    statements = [f"CREATE USER IF NOT EXISTS {name}{password or ''}"]
+    if password is not None:
+        statements.append(f"ALTER USER {name}{password}")
+    return statements
+
+
+def grant_target(on):
+    """
+    Quote a grant target: '*.*', a database name (all its tables), 'db.*' or 'db.table'.
+    """
+    if on == '*.*':
+        return on
+    db_name, _, table = str(on).partition('.')
+    return f"{quote_name(db_name)}.{'*' if table in ('', '*') else quote_name(table)}"
+
+
+def grant_statement(spec, connection=None):
+    """
+    GRANT statement for a (privileges, on, user[, host]) tuple or a dict with 'privileges', 'on', 'user', 'host'
+    and 'grant_option'. privileges is 'ALL' or a list such as ['SELECT', 'INSERT'].
+
+    :param connection: Connection whose escaping rules are used, see quote_string.
+    """
+    spec = _as_dict(spec, ('privileges', 'on', 'user', 'host'))
+    privileges = spec.get('privileges') or 'ALL'
+    if isinstance(privileges, str):
+        privileges = [privileges]
+    for privilege in privileges:
+        if not _PRIVILEGE.fullmatch(privilege):
+            raise ValueError(f"Invalid privilege: {privilege!r}")
+    privileges = ['ALL PRIVILEGES' if privilege.upper() == 'ALL' else privilege for privilege in privileges]
+    grantee = account(spec['user'], spec.get('host') or '%', connection)
+    sql = f"GRANT {', '.join(privileges)} ON {grant_target(spec['on'])} TO {grantee}"
+    if spec.get('grant_option'):
+        sql += " WITH GRANT OPTION"
+    return sql
+
+
+def provision_statements(databases=(), users=(), grants=(), replace_users=False, connection=None):
+    """
+    Statements creating the databases, then the users, then the grants.
+    """
+    return ([database_statement(spec) for spec in databases]
+            + [statement for spec in users for statement in user_statements(spec, replace_users, connection)]
+            + [grant_statement(spec, connection) for spec in grants])
+
+
+def batches(statements, max_bytes=MAX_BATCH_BYTES):
+    """
+    Join statements into multi-statement strings of at most max_bytes, a longer single statement is its own batch.
+    """
+    batch, size = [], 0
+    for statement in statements:
+        length = len(statement.encode()) + 2
+        if batch and size + length > max_bytes:
+            yield ';\n'.join(batch)
+            batch, size = [], 0
+        batch.append(statement)
+        size += length
+    if batch:
+        yield ';\n'.join(batch)
+
+
+def run_batch(connection, statements, max_bytes=MAX_BATCH_BYTES):
+    """
+    Execute statements as multi-statement batches, one round trip per batch. The connection needs the
+    CLIENT.MULTI_STATEMENTS flag. The first failing statement raises and stops the rest of its batch.
+
+    :return: Number of round trips.
+    """
+    round_trips = 0
+    with connection.cursor() as cursor:
+        for batch in batches(statements, max_bytes):
+            cursor.execute(batch)
+            while cursor.nextset():
+                pass
+            round_trips += 1
+    connection.commit()
+    return round_trips
+
+
+def provision(connection, databases=(), users=(), grants=(), replace_users=False):
+    """
+    Create databases, users and grants over one connection in as few round trips as possible.
+
+    Account changes through CREATE USER and GRANT take effect immediately, no FLUSH PRIVILEGES is needed.
+
+    :param connection: pymysql connection with the CLIENT.MULTI_STATEMENTS flag and the privileges to grant.
+    :param databases: Database names, or dicts with 'name', 'charset' and 'collation'.
+    :param users: (user, password[, host]) tuples, or dicts with 'user', 'password' and 'host'. host defaults to '%'.
+    :param grants: (privileges, on, user[, host]) tuples, or dicts with 'privileges', 'on', 'user', 'host' and
+        'grant_option'. on is '*.*', a database name, 'db.*' or 'db.table'.
+    :param replace_users: Recreate existing users, dropping their grants. Otherwise existing users keep their
+        grants and get the password given.
+    :return: dict with the number of 'databases', 'users', 'grants', 'statements', 'round_trips' and 'seconds'.
+    """
+    start = time.perf_counter()
+    databases, users, grants = list(databases), list(users), list(grants)
+    statements = provision_statements(databases, users, grants, replace_users, connection)
+    round_trips = run_batch(connection, statements)
+    report = {'databases': len(databases), 'users': len(users), 'grants': len(grants), 'statements': len(statements),
+              'round_trips': round_trips, 'seconds': time.perf_counter() - start}
+    logger.info(f"Provisioned {report['databases']} databases, {report['users']} users and {report['grants']} grants "
+                f"in {round_trips} round trips and {report['seconds']:.3f}s")
+    return report
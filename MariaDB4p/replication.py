@@ -0,0 +1,389 @@
+import re
+import time
+import secrets
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import pymysql
+from loguru import logger
+
+from MariaDB4p.mariadb_wrapper import MariaDBWrapper, find_free_port
+from MariaDB4p.exceptions import ServerStartError, ServerNotRunningError
+from MariaDB4p.provisioning import quote_string
+
+# Arguments of every instance; being identical, they let the primary and the replicas clone one template
+REPLICATION_ARGS = ['--log-bin=mariadb-bin', '--binlog-format=ROW', '--log-slave-updates=1']
+REPLICATION_USER = 'mariadb4p_repl'
+# Seconds a replica waits for a primary GTID before the read falls back to the primary
+DEFAULT_GTID_WAIT_TIMEOUT = 1.0
+DEFAULT_REPLICA_START_TIMEOUT = 30
+_READ = re.compile(r'\s*(?:\(\s*)*(?:SELECT|SHOW|DESCRIBE|DESC|EXPLAIN|WITH)\b', re.I)
+_LOCKING_READ = re.compile(r'\bFOR\s+UPDATE\b|\bLOCK\s+IN\s+SHARE\s+MODE\b|\bINTO\s+(?:OUT|DUMP)FILE\b', re.I)
+_BEGIN = re.compile(r'\s*(?:BEGIN|START\s+TRANSACTION)\b', re.I)
+_END = re.compile(r'\s*(?:COMMIT|ROLLBACK)\b(?!\s+TO\b)', re.I)
+_LEADING_COMMENTS = re.compile(r'^(?:\s*(?:/\*(?!M?!).*?\*/|(?:--\s|#)[^\n]*))*', re.S)
+
+
+def is_read(query):
+    """
+    Whether a statement only reads and may run on a replica. Locking reads and SELECT ... INTO OUTFILE
+    count as writes.
+    """
+    query = _LEADING_COMMENTS.sub('', query, count=1)
+    return bool(_READ.match(query)) and not _LOCKING_READ.search(query)
+
+
+def parse_gtid_pos(pos):
+    """
+    Parse a GTID position such as '0-1-42,1-2-7' into {domain_id: sequence number}.
+    """
+    result = {}
+    for gtid in filter(None, (part.strip() for part in (pos or '').split(','))):
+        domain, _, sequence = gtid.split('-')
+        result[int(domain)] = max(result.get(int(domain), 0), int(sequence))
+    return result
+
+
+def gtid_lag(primary_pos, replica_pos):
+    """
+    Number of transactions a replica is behind, summed over the replication domains.
+    """
+    primary, replica = parse_gtid_pos(primary_pos), parse_gtid_pos(replica_pos)
+    return sum(max(0, sequence - replica.get(domain, 0)) for domain, sequence in primary.items())
+
+
+class RoutingStats:
+    """
+    Counters of a RoutingConnection.
+    """
+
+    def __init__(self):
+        self.writes = 0
+        self.replica_reads = 0
+        self.primary_reads = 0
+        # reads sent to the primary because a replica did not catch up within the GTID wait timeout
+        self.gtid_wait_timeouts = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, count=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + count)
+
+    def to_dict(self):
+        return {name: value for name, value in vars(self).items() if not name.startswith('_')}
+
+
+class RoutingConnection:
+    """
+    Sends writes to the primary and spreads reads round-robin over the replicas.
+
+    Statements inside an explicit transaction (BEGIN/START TRANSACTION ... COMMIT/ROLLBACK) all go to the
+    primary. With read_your_writes, a read after a write waits with MASTER_GTID_WAIT until its replica has
+    applied the write, and runs on the primary if it does not within gtid_wait_timeout.
+
+    Not thread-safe, use one per thread.
+    """
+
+    def __init__(self, connect_primary, connect_replicas, read_your_writes=False,
+                 gtid_wait_timeout=DEFAULT_GTID_WAIT_TIMEOUT, stats=None):
+        """
+        :param connect_primary: Callable returning a new autocommit pymysql connection to the primary.
+        :param connect_replicas: Callables returning connections to each replica.
+        :param read_your_writes: Make reads observe this connection's earlier writes.
+        :param gtid_wait_timeout: Seconds a replica may take to catch up with the last write.
+        :param stats: RoutingStats to count into, shared between connections of a topology.
+        """
+        self._connect_primary = connect_primary
+        self._connect_replicas = list(connect_replicas)
+        self.read_your_writes = read_your_writes
+        self.gtid_wait_timeout = gtid_wait_timeout
+        self.stats = stats or RoutingStats()
+        self._primary = None
+        self._replicas = [None] * len(self._connect_replicas)
+        self._next_replica = itertools.cycle(range(len(self._connect_replicas)))
+        self._in_transaction = False
+        # GTID of this connection's last write on the primary
+        self.last_gtid = None
+
+    def _primary_connection(self):
+        if self._primary is None:
+            self._primary = self._connect_primary()
+        return self._primary
+
+    def _replica_connection(self, index):
+        if self._replicas[index] is None:
+            self._replicas[index] = self._connect_replicas[index]()
+        return self._replicas[index]
+
+    @staticmethod
+    def _run(connection, query, params):
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall() if cursor.description else cursor.rowcount
+
+    def _write(self, query, params):
+        connection = self._primary_connection()
+        result = self._run(connection, query, params)
+        if self.read_your_writes and not self._in_transaction:
+            gtid = self._run(connection, "SELECT @@last_gtid", None)[0][0]
+            self.last_gtid = gtid or self.last_gtid
+        self.stats.add('writes')
+        return result
+
+    def _caught_up(self, connection):
+        if not self.read_your_writes or not self.last_gtid:
+            return True
+        waited = self._run(connection, "SELECT MASTER_GTID_WAIT(%s, %s)", (self.last_gtid, self.gtid_wait_timeout))
+        return waited[0][0] == 0
+
+    def _read(self, query, params):
+        for _ in range(len(self._replicas)):
+            index = next(self._next_replica)
+            try:
+                connection = self._replica_connection(index)
+                if not self._caught_up(connection):
+                    self.stats.add('gtid_wait_timeouts')
+                    break
+                result = self._run(connection, query, params)
+            except pymysql.err.OperationalError as e:
+                # a stopped or restarting replica is skipped
+                logger.warning(f"Replica {index} is unavailable, trying the next one: {e}")
+                self._close(self._replicas[index])
+                self._replicas[index] = None
+                continue
+            self.stats.add('replica_reads')
+            return result
+        self.stats.add('primary_reads')
+        return self._run(self._primary_connection(), query, params)
+
+    def execute(self, query, params=None):
+        """
+        Run a statement on the primary or a replica.
+
+        :param query: SQL with %s placeholders.
+        :param params: Sequence or dict of parameter values.
+        :return: The fetched rows for statements returning a result set, the affected row count otherwise.
+        """
+        if _BEGIN.match(query):
+            self._in_transaction = True
+        if self._in_transaction or not is_read(query):
+            if _END.match(query):
+                # the GTID of a transaction is known once it commits
+                self._in_transaction = False
+            return self._write(query, params)
+        return self._read(query, params)
+
+    @staticmethod
+    def _close(connection):
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def close(self):
+        self._close(self._primary)
+        self._primary = None
+        for connection in self._replicas:
+            self._close(connection)
+        self._replicas = [None] * len(self._connect_replicas)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ReplicationTopology:
+    """
+    One primary and several replicas, each an embedded server on its own free port, socket and data directory.
+
+    Every instance is cloned from the same data directory template, so the replicas start with the primary's
+    data and replicate with GTIDs from the primary's position at startup.
+    """
+
+    def __init__(self, replicas=1, wrapper_class=MariaDBWrapper, max_parallel=None, **wrapper_options):
+        """
+        :param replicas: Number of replicas.
+        :param wrapper_class: MariaDBWrapper or NativeMariaDBWrapper.
+        :param max_parallel: Maximum number of instances started at the same time, defaults to all of them.
+        :param wrapper_options: Keyword arguments for every wrapper, e.g. fixtures or profile. port and base_dir
+            are allocated per instance. skip_networking is not supported, replicas connect over TCP, and neither
+            is use_template=False.
+        """
+        if replicas < 1:
+            raise ValueError("A replication topology needs at least one replica.")
+        for option in ('port', 'base_dir'):
+            if option in wrapper_options:
+                raise ValueError(f"{option} is allocated per instance and cannot be passed to ReplicationTopology.")
+        if wrapper_options.get('skip_networking'):
+            raise ValueError("Replicas connect to the primary over TCP, skip_networking is not supported.")
+        if not wrapper_options.get('use_template', True):
+            # without a template the instances would share one data directory, or start from different data
+            raise ValueError("The instances are cloned from one data directory template, use_template=False "
+                             "is not supported.")
+        wrapper_options['server_args'] = REPLICATION_ARGS + list(wrapper_options.get('server_args') or [])
+        self.replica_count = replicas
+        self.wrapper_class = wrapper_class
+        self.max_parallel = max_parallel or replicas + 1
+        self.wrapper_options = wrapper_options
+        self.primary = None
+        self.replicas = []
+        self.routing_stats = RoutingStats()
+        self._replication_password = secrets.token_hex(16)
+
+    @property
+    def instances(self):
+        return ([self.primary] if self.primary is not None else []) + self.replicas
+
+    def start(self, timeout=DEFAULT_REPLICA_START_TIMEOUT):
+        """
+        Start the primary and the replicas concurrently and set up replication.
+
+        :param timeout: Seconds the replicas may take to connect to the primary.
+        :return: self
+        """
+        if self.primary is not None:
+            return self
+        ports = set()
+        while len(ports) < self.replica_count + 1:
+            ports.add(find_free_port())
+        instances = [self.wrapper_class(port=port, base_dir=None, **self.wrapper_options) for port in sorted(ports)]
+        self.primary, self.replicas = instances[0], instances[1:]
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix='mariadb4p-replication') as executor:
+                list(executor.map(lambda instance: instance.start_server(), instances))
+            self._configure(timeout)
+        except Exception as e:
+            self.stop()
+            if isinstance(e, ServerStartError):
+                raise
+            raise ServerStartError(f"Failed to set up replication: {e}") from e
+        logger.info(f"Started a primary on port {self.primary.port} with replicas on ports "
+                    f"{[replica.port for replica in self.replicas]}.")
+        return self
+
+    def _configure(self, timeout):
+        with self.primary.admin_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SET GLOBAL server_id = 1")
+        self.primary.provision(users=[(REPLICATION_USER, self._replication_password, '127.0.0.1')],
+                               grants=[(['REPLICATION SLAVE'], '*.*', REPLICATION_USER, '127.0.0.1')],
+                               replace_users=True)
+        with self.primary.admin_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT @@gtid_binlog_pos")
+                position = cursor.fetchone()[0]
+        for server_id, replica in enumerate(self.replicas, start=2):
+            with replica.admin_connection() as connection:
+                with connection.cursor() as cursor:
+                    # the replica already holds the data up to the primary's current position
+                    cursor.execute(f"SET GLOBAL server_id = {server_id}")
+                    cursor.execute("SET GLOBAL read_only = 1")
+                    cursor.execute("RESET MASTER")
+                    cursor.execute("SET GLOBAL gtid_slave_pos = %s", (position,))
+                    cursor.execute(f"CHANGE MASTER TO MASTER_HOST='127.0.0.1', MASTER_PORT={int(self.primary.port)}, "
+                                   f"MASTER_USER={quote_string(REPLICATION_USER, connection)}, "
+                                   f"MASTER_PASSWORD={quote_string(self._replication_password, connection)}, "
+                                   f"MASTER_USE_GTID=slave_pos")
+                    cursor.execute("START SLAVE")
+        deadline = time.monotonic() + timeout
+        for replica in self.replicas:
+            while True:
+                status = self.replica_status(replica)
+                if status.get('Slave_IO_Running') == 'Yes' and status.get('Slave_SQL_Running') == 'Yes':
+                    break
+                if time.monotonic() >= deadline:
+                    error = status.get('Last_IO_Error') or status.get('Last_SQL_Error') or 'no error reported'
+                    raise ServerStartError(f"Replica on port {replica.port} did not start replicating: {error}")
+                time.sleep(0.05)
+
+    def stop(self):
+        """
+        Stop all instances concurrently, the JVM stays up for other users.
+        """
+        instances, self.primary, self.replicas = self.instances, None, []
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix='mariadb4p-replication') as executor:
+            list(executor.map(lambda instance: instance.stop_server(), instances))
+
+    @staticmethod
+    def replica_status(replica):
+        """
+        SHOW SLAVE STATUS of a replica as a dict, empty if replication is not configured.
+        """
+        with replica.admin_connection() as connection:
+            with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+                cursor.execute("SHOW SLAVE STATUS")
+                return cursor.fetchone() or {}
+
+    def replication_lag(self):
+        """
+        Lag of each replica keyed by port: 'seconds' (Seconds_Behind_Master, None while not replicating) and
+        'transactions' behind the primary's binlog GTID position.
+        """
+        if self.primary is None:
+            raise ServerNotRunningError("The replication topology is not running.")
+        with self.primary.admin_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT @@gtid_binlog_pos")
+                primary_pos = cursor.fetchone()[0]
+        lag = {}
+        for replica in self.replicas:
+            status = self.replica_status(replica)
+            with replica.admin_connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT @@gtid_slave_pos")
+                    replica_pos = cursor.fetchone()[0]
+            lag[replica.port] = {'seconds': status.get('Seconds_Behind_Master'),
+                                 'transactions': gtid_lag(primary_pos, replica_pos)}
+        return lag
+
+    def wait_for_replicas(self, timeout=10):
+        """
+        Block until every replica has applied all transactions of the primary.
+
+        :return: True if they caught up within the timeout.
+        """
+        with self.primary.admin_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT @@gtid_binlog_pos")
+                position = cursor.fetchone()[0]
+        deadline = time.monotonic() + timeout
+        for replica in self.replicas:
+            with replica.admin_connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT MASTER_GTID_WAIT(%s, %s)", (position, max(0.0, deadline - time.monotonic())))
+                    if cursor.fetchone()[0] != 0:
+                        return False
+        return True
+
+    def connection(self, db_name=None, user='root', password='', read_your_writes=False,
+                   gtid_wait_timeout=DEFAULT_GTID_WAIT_TIMEOUT):
+        """
+        A RoutingConnection over new autocommit connections to the primary and the replicas.
+
+        :param read_your_writes: Make reads observe the connection's earlier writes, see RoutingConnection.
+        """
+        if self.primary is None:
+            raise ServerNotRunningError("The replication topology is not running.")
+
+        def connector(instance):
+            return lambda: instance._connect(user=user, password=password, database=db_name, autocommit=True)
+
+        return RoutingConnection(connector(self.primary), [connector(replica) for replica in self.replicas],
+                                 read_your_writes, gtid_wait_timeout, self.routing_stats)
+
+    def render_metrics(self, openmetrics=False):
+        """
+        Replica lag and routing counters in the Prometheus text format, or OpenMetrics.
+        """
+        from MariaDB4p import metrics
+        return metrics.render_prometheus(replication=self.replication_lag(), routing=self.routing_stats.to_dict(),
+                                         openmetrics=openmetrics)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
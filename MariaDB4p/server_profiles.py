@@ -0,0 +1,93 @@
+import os
+import sys
+from pathlib import Path
+from loguru import logger
+
+PROFILES = ('default', 'ephemeral')
+# Directory for ephemeral data, overrides the tmpfs lookup
+TMPFS_ENV = 'MARIADB4P_TMPFS'
+# Memory backed filesystems tried in order
+TMPFS_CANDIDATES = ('/dev/shm', f'/run/user/{os.getuid()}' if hasattr(os, 'getuid') else None)
+# Buffer pool bounds of the ephemeral profile, the data already lives in RAM
+MIN_BUFFER_POOL = 16 * 1024 * 1024
+MAX_BUFFER_POOL = 512 * 1024 * 1024
+# Server settings trading crash safety for commit speed
+EPHEMERAL_SETTINGS = {
+    'innodb-flush-log-at-trx-commit': '0',
+    'innodb-doublewrite': '0',
+    'sync-binlog': '0',
+    # tmpfs supports neither O_DIRECT nor native AIO
+    'innodb-use-native-aio': '0',
+}
+
+
+def tmpfs_dir():
+    """
+    A writable memory backed directory, or None if there is none.
+    """
+    configured = os.environ.get(TMPFS_ENV)
+    if configured:
+        return configured
+    if sys.platform.startswith('linux'):
+        for candidate in TMPFS_CANDIDATES:
+            if candidate and os.path.isdir(candidate) and os.access(candidate, os.W_OK):
+                return candidate
+    # not the temp directory, see templates.INSTANCES_DIR
+    logger.warning("No tmpfs found, ephemeral data goes to the instances directory")
+    return None
+
+
+def available_memory():
+    """
+    Bytes of physical memory currently available, None if unknown.
+    """
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def free_space(path):
+    try:
+        stat = os.statvfs(path)
+    except (AttributeError, OSError):
+        return None
+    return stat.f_bavail * stat.f_frsize
+
+
+def buffer_pool_size(data_dir=None, memory=None):
+    """
+    InnoDB buffer pool size for an ephemeral server: an eighth of the available memory, and no more than
+    a quarter of the free tmpfs space, which competes for the same RAM. Rounded down to whole MiB.
+
+    :param data_dir: Directory of the data files.
+    :param memory: Available memory in bytes, detected if not given.
+    """
+    memory = available_memory() if memory is None else memory
+    size = memory // 8 if memory else MIN_BUFFER_POOL
+    space = free_space(data_dir) if data_dir else None
+    if space:
+        size = min(size, space // 4)
+    size = max(MIN_BUFFER_POOL, min(MAX_BUFFER_POOL, size))
+    return size // (1024 * 1024) * 1024 * 1024
+
+
+def profile_args(profile, data_dir=None, tmpdir=None):
+    """
+    Extra server arguments of a profile.
+
+    :param profile: 'default' or 'ephemeral'.
+    :param data_dir: Data directory of the server, used to size the buffer pool.
+    :param tmpdir: Directory for the server's temporary tables and files.
+    :return: List of '--name=value' arguments.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown server profile {profile!r}, expected one of {PROFILES}")
+    if profile == 'default':
+        return []
+    args = [f'--{name}={value}' for name, value in EPHEMERAL_SETTINGS.items()]
+    args.append('--skip-log-bin')
+    args.append(f'--innodb-buffer-pool-size={buffer_pool_size(data_dir)}')
+    if tmpdir:
+        args.append(f'--tmpdir={Path(tmpdir)}')
+    return args
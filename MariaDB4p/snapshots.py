@@ -0,0 +1,270 @@
+import re
+import time
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+from loguru import logger
+
+from MariaDB4p.templates import clone_file
+
+STRATEGIES = ('auto', 'clone', 'tablespace')
+# 'auto' copies tablespaces only for databases at least this large, below it INSERT ... SELECT is cheaper
+# than discarding and importing tablespaces
+TABLESPACE_MIN_BYTES = 64 * 1024 * 1024
+SNAPSHOT_SCHEMA_PREFIX = '_mariadb4p_snap_'
+# Names that map to file names unchanged, others are encoded on disk (e.g. @002d)
+_PLAIN_NAME = re.compile(r'[A-Za-z0-9_]+')
+
+
+def _quote(name):
+    return '`' + str(name).replace('`', '``') + '`'
+
+
+def _table(db_name, table):
+    return f'{_quote(db_name)}.{_quote(table)}'
+
+
+def snapshot_schema_name(db_name, tag):
+    """
+    Name of the schema holding the clone of a database, at most 64 characters.
+    """
+    return SNAPSHOT_SCHEMA_PREFIX + hashlib.sha1(f'{db_name}\0{tag}'.encode()).hexdigest()[:16]
+
+
+class Snapshot:
+    """
+    Saved state of a database and the table statistics used to find the tables changed since.
+    """
+
+    def __init__(self, db_name, tag, strategy, tables, location):
+        """
+        :param strategy: 'clone' or 'tablespace'.
+        :param tables: dict of table name to {'create': CREATE TABLE statement, 'columns': stored columns}.
+        :param location: Name of the clone schema, or directory of the copied tablespace files.
+        """
+        self.db_name = db_name
+        self.tag = tag
+        self.strategy = strategy
+        self.tables = tables
+        self.location = location
+        self.created_at = time.time()
+        # table states at the snapshot or the last restore, see table_states
+        self.baseline = {}
+        self.userstat = False
+        self.checkpoint = None
+
+
+def table_states(cursor, db_name):
+    """
+    Creation time, last update time and userstat ROWS_CHANGED counter of every base table of a database.
+    """
+    cursor.execute("SELECT t.TABLE_NAME, t.CREATE_TIME, t.UPDATE_TIME, COALESCE(s.ROWS_CHANGED, 0) "
+                   "FROM information_schema.TABLES t LEFT JOIN information_schema.TABLE_STATISTICS s "
+                   "ON s.TABLE_SCHEMA = t.TABLE_SCHEMA AND s.TABLE_NAME = t.TABLE_NAME "
+                   "WHERE t.TABLE_SCHEMA = %s AND t.TABLE_TYPE = 'BASE TABLE'", (db_name,))
+    return {name: {'create_time': create_time, 'update_time': update_time, 'rows_changed': int(rows_changed)}
+            for name, create_time, update_time, rows_changed in cursor.fetchall()}
+
+
+def changed_tables(baseline, current, userstat, checkpoint):
+    """
+    Compare table states with the ones recorded at the snapshot.
+
+    With userstat the ROWS_CHANGED counters tell which tables were written. Without it, a table counts as
+    changed when its UPDATE_TIME moved or falls into the second of the checkpoint, which is only precise to
+    the second.
+
+    :return: dict with lists of 'changed' (rows written), 'altered' (recreated or altered), 'missing' (dropped)
+        and 'extra' (created) table names.
+    """
+    result = {'changed': [], 'altered': [], 'missing': sorted(set(baseline) - set(current)),
+              'extra': sorted(set(current) - set(baseline))}
+    for name in sorted(set(baseline) & set(current)):
+        before, now = baseline[name], current[name]
+        if now['create_time'] != before['create_time']:
+            result['altered'].append(name)
+        elif userstat:
+            if now['rows_changed'] != before['rows_changed']:
+                result['changed'].append(name)
+        elif now['update_time'] is not None and (before['update_time'] is None or now['update_time'] > before['update_time']
+                                                 or (checkpoint is not None and now['update_time'] >= checkpoint)):
+            result['changed'].append(name)
+    return result
+
+
+def _table_definitions(cursor, db_name):
+    cursor.execute("SELECT TABLE_NAME, ENGINE, DATA_LENGTH + INDEX_LENGTH FROM information_schema.TABLES "
+                   "WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'", (db_name,))
+    tables = {name: {'engine': engine, 'bytes': int(size or 0), 'columns': []} for name, engine, size in cursor.fetchall()}
+    # generated columns cannot be inserted into
+    cursor.execute("SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s "
+                   "AND EXTRA NOT LIKE '%%GENERATED%%' ORDER BY TABLE_NAME, ORDINAL_POSITION", (db_name,))
+    for table, column in cursor.fetchall():
+        if table in tables:
+            tables[table]['columns'].append(column)
+    for name, table in tables.items():
+        cursor.execute(f"SHOW CREATE TABLE {_table(db_name, name)}")
+        table['create'] = cursor.fetchone()[1]
+    return tables
+
+
+def _tablespace_possible(cursor, db_name, tables):
+    if not _PLAIN_NAME.fullmatch(db_name) or not all(_PLAIN_NAME.fullmatch(name) for name in tables):
+        return False
+    if any((table['engine'] or '').lower() != 'innodb' for table in tables.values()):
+        return False
+    cursor.execute("SELECT @@innodb_file_per_table")
+    return bool(cursor.fetchone()[0])
+
+
+def _datadir(cursor):
+    cursor.execute("SELECT @@datadir")
+    return Path(cursor.fetchone()[0])
+
+
+def _copy_rows(cursor, source, dest, columns):
+    column_list = ', '.join(_quote(column) for column in columns)
+    cursor.execute(f"INSERT INTO {dest} ({column_list}) SELECT {column_list} FROM {source}")
+
+
+def _enable_userstat(cursor):
+    try:
+        cursor.execute("SET GLOBAL userstat = 1")
+        return True
+    except Exception as e:
+        logger.warning(f"Cannot enable userstat, changed tables are found through UPDATE_TIME: {e}")
+        return False
+
+
+def _checkpoint(cursor, snapshot):
+    snapshot.baseline = table_states(cursor, snapshot.db_name)
+    cursor.execute("SELECT NOW()")
+    snapshot.checkpoint = cursor.fetchone()[0]
+
+
+def _set_checks(cursor, enabled):
+    value = 1 if enabled else 0
+    cursor.execute(f"SET SESSION foreign_key_checks = {value}, unique_checks = {value}")
+
+
+def take_snapshot(connection, db_name, tag, strategy='auto'):
+    """
+    Save the current state of a database.
+
+    :param connection: pymysql connection with privileges on the database and to create schemas.
+    :param db_name: Database to save.
+    :param tag: Name of the snapshot.
+    :param strategy: 'clone' copies the tables into a hidden schema in the server, 'tablespace' copies the
+        InnoDB .ibd files (FLUSH TABLES ... FOR EXPORT), 'auto' uses tablespaces for large all-InnoDB databases.
+    :return: Snapshot
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown snapshot strategy {strategy!r}, expected one of {STRATEGIES}")
+    start = time.perf_counter()
+    with connection.cursor() as cursor:
+        tables = _table_definitions(cursor, db_name)
+        possible = _tablespace_possible(cursor, db_name, tables)
+        if strategy == 'auto':
+            size = sum(table['bytes'] for table in tables.values())
+            strategy = 'tablespace' if possible and size >= TABLESPACE_MIN_BYTES else 'clone'
+        elif strategy == 'tablespace' and not possible:
+            raise ValueError(f"Tablespace snapshots need InnoDB file-per-table tables with plain names in {db_name}.")
+
+        if strategy == 'clone':
+            location = snapshot_schema_name(db_name, tag)
+            cursor.execute(f"DROP DATABASE IF EXISTS {_quote(location)}")
+            cursor.execute(f"CREATE DATABASE {_quote(location)}")
+            for name, table in tables.items():
+                cursor.execute(f"CREATE TABLE {_table(location, name)} LIKE {_table(db_name, name)}")
+                _copy_rows(cursor, _table(db_name, name), _table(location, name), table['columns'])
+        else:
+            location = tempfile.mkdtemp(prefix=f'mariadb4p_snap_{db_name}_')
+            if tables:
+                source_dir = _datadir(cursor) / db_name
+                cursor.execute("FLUSH TABLES " + ', '.join(_table(db_name, name) for name in tables) + " FOR EXPORT")
+                try:
+                    for name in tables:
+                        for suffix in ('.ibd', '.cfg'):
+                            clone_file(source_dir / f'{name}{suffix}', Path(location, f'{name}{suffix}'))
+                finally:
+                    cursor.execute("UNLOCK TABLES")
+
+        snapshot = Snapshot(db_name, tag, strategy,
+                            {name: {'create': table['create'], 'columns': table['columns']} for name, table in tables.items()},
+                            location)
+        snapshot.userstat = _enable_userstat(cursor)
+        # the checkpoint reads run before the commit, which ends their transaction too
+        _checkpoint(cursor, snapshot)
+        connection.commit()
+    logger.info(f"Snapshot {tag} of {db_name} with {len(tables)} tables taken by {strategy} in {time.perf_counter() - start:.3f}s")
+    return snapshot
+
+
+def _recreate(cursor, snapshot, name):
+    cursor.execute(f"DROP TABLE IF EXISTS {_table(snapshot.db_name, name)}")
+    create = snapshot.tables[name]['create']
+    # SHOW CREATE TABLE names the table without its database
+    create = create.replace(f"CREATE TABLE {_quote(name)}", f"CREATE TABLE {_table(snapshot.db_name, name)}", 1)
+    cursor.execute(create)
+
+
+def _restore_tablespace(cursor, snapshot, name, datadir):
+    cursor.execute(f"ALTER TABLE {_table(snapshot.db_name, name)} DISCARD TABLESPACE")
+    for suffix in ('.ibd', '.cfg'):
+        dest = datadir / snapshot.db_name / f'{name}{suffix}'
+        if dest.exists():
+            dest.unlink()
+        clone_file(Path(snapshot.location, f'{name}{suffix}'), dest)
+    cursor.execute(f"ALTER TABLE {_table(snapshot.db_name, name)} IMPORT TABLESPACE")
+    (datadir / snapshot.db_name / f'{name}.cfg').unlink(missing_ok=True)
+
+
+def restore_snapshot(connection, snapshot):
+    """
+    Reset a database to a snapshot, copying back only the tables changed since the snapshot or the last restore.
+
+    Tables created after the snapshot are dropped, dropped or altered ones are recreated. Triggers on the
+    restored tables fire for the copied rows of clone snapshots.
+
+    :return: dict with 'strategy', 'restored', 'dropped' and 'seconds'.
+    """
+    start = time.perf_counter()
+    with connection.cursor() as cursor:
+        changes = changed_tables(snapshot.baseline, table_states(cursor, snapshot.db_name), snapshot.userstat,
+                                 snapshot.checkpoint)
+        restored = sorted(changes['changed'] + changes['altered'] + changes['missing'])
+        datadir = _datadir(cursor) if snapshot.strategy == 'tablespace' else None
+        _set_checks(cursor, False)
+        try:
+            for name in changes['extra']:
+                cursor.execute(f"DROP TABLE {_table(snapshot.db_name, name)}")
+            for name in changes['altered'] + changes['missing']:
+                _recreate(cursor, snapshot, name)
+            for name in restored:
+                if snapshot.strategy == 'tablespace':
+                    _restore_tablespace(cursor, snapshot, name, datadir)
+                    continue
+                cursor.execute(f"TRUNCATE TABLE {_table(snapshot.db_name, name)}")
+                _copy_rows(cursor, _table(snapshot.location, name), _table(snapshot.db_name, name),
+                           snapshot.tables[name]['columns'])
+            _checkpoint(cursor, snapshot)
+            connection.commit()
+        finally:
+            _set_checks(cursor, True)
+    report = {'strategy': snapshot.strategy, 'restored': restored, 'dropped': changes['extra'],
+              'seconds': time.perf_counter() - start}
+    logger.info(f"Restored {len(restored)} of {len(snapshot.tables)} tables of {snapshot.db_name} from snapshot "
+                f"{snapshot.tag} in {report['seconds']:.3f}s")
+    return report
+
+
+def drop_snapshot(connection, snapshot):
+    """
+    Delete the clone schema or the tablespace files of a snapshot.
+    """
+    if snapshot.strategy == 'clone':
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {_quote(snapshot.location)}")
+    else:
+        shutil.rmtree(snapshot.location, ignore_errors=True)
@@ -0,0 +1,636 @@
+import io
+import os
+import re
+import gzip
+import time
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from loguru import logger
+
+# Statements sent to the server per multi-statement round trip
+DEFAULT_BATCH_BYTES = 4 * 1024 * 1024
+# Size of one extended INSERT statement written by export
+DEFAULT_STATEMENT_BYTES = 1024 * 1024
+# Rows fetched per round trip while exporting
+EXPORT_FETCH_SIZE = 10000
+COMPRESSIONS = (None, 'gzip', 'zstd')
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+# Files of an export directory that must be imported after the tables
+VIEWS_FILE = '_views.sql'
+
+_QUOTE_END = {"'": re.compile(r"[\\']"), '"': re.compile(r'[\\"]'), '`': re.compile(r'`')}
+# executable comments /*! ... */ and /*M! ... */ are statement text, other comments are dropped
+_LEADING_COMMENT = re.compile(r'^\s*/\*M?!\d*\s*')
+_NAME = r'(?:`(?P<q{0}>(?:[^`]|``)+)`(?!`)|(?P<p{0}>[\w$]+)(?![\w$]))'
+_TABLE = _NAME.format('') + r'(?:\s*\.\s*' + _NAME.format(2) + ')?'
+# INSERT ... SELECT depends on other tables and is not a row statement
+_ROWS = re.compile(r'(?:INSERT|REPLACE)\s+(?:(?:LOW_PRIORITY|DELAYED|HIGH_PRIORITY|IGNORE)\s+)*(?:INTO\s+)?' + _TABLE
+                   + r'\s*(?:\([^()]*\)\s*)?VALUES?\b', re.I)
+_TABLE_DDL = re.compile(r'(?:CREATE\s+(?:OR\s+REPLACE\s+)?(?:TEMPORARY\s+)?TABLE(?:\s+IF\s+NOT\s+EXISTS)?'
+                        r'|DROP\s+(?:TEMPORARY\s+)?TABLE(?:\s+IF\s+EXISTS)?|ALTER\s+(?:ONLINE\s+)?(?:IGNORE\s+)?TABLE'
+                        r'|TRUNCATE(?:\s+TABLE)?)\s+' + _TABLE + r'\s*(?:$|[^,\s.]|\s+[^,\s])', re.I)
+_LOCKS = re.compile(r'(?:LOCK\s+TABLES?|UNLOCK\s+TABLES?)\b', re.I)
+_USE = re.compile(r'USE\s+' + _TABLE + r'\s*$', re.I)
+
+
+def _names(match):
+    first = (match.group('q') or '').replace('``', '`') or match.group('p')
+    second = (match.group('q2') or '').replace('``', '`') or match.group('p2')
+    return (first, second) if second else (None, first)
+
+
+class StatementSplitter:
+    """
+    Incremental SQL statement splitter, fed one line at a time.
+
+    Delimiters inside quoted strings, identifiers and comments are ignored, mysql client DELIMITER commands
+    are honoured, and -- , # and /* */ comments are dropped while /*! */ executable comments are kept.
+    """
+
+    def __init__(self, delimiter=';'):
+        self.delimiter = delimiter
+        self.parts = []
+        # quote character of the string or identifier being read
+        self.quote = None
+        # inside a /* */ comment
+        self.comment = False
+        self._compile()
+
+    def _compile(self):
+        self._normal = re.compile(re.escape(self.delimiter) + r"""|['"`]|--(?=\s|$)|#|/\*(?!M?!)""")
+
+    def _pending(self):
+        return any(part.strip() for part in self.parts)
+
+    def feed(self, line):
+        """
+        Consume a line, including its line break.
+
+        :return: List of the statements completed by the line, without delimiters.
+        """
+        statements = []
+        if not self.quote and not self.comment and line.lstrip()[:10].upper().startswith('DELIMITER') and not self._pending():
+            tokens = line.split()
+            if len(tokens) >= 2 and tokens[0].upper() == 'DELIMITER':
+                self.delimiter = tokens[1]
+                self._compile()
+                self.parts = []
+                return statements
+        pos, end = 0, len(line)
+        while pos < end:
+            if self.comment:
+                close = line.find('*/', pos)
+                if close < 0:
+                    break
+                pos = close + 2
+                self.comment = False
+            elif self.quote:
+                match = _QUOTE_END[self.quote].search(line, pos)
+                if match is None:
+                    self.parts.append(line[pos:])
+                    break
+                if match.group() == '\\':
+                    # the escaped character, possibly the line break, belongs to the string
+                    self.parts.append(line[pos:match.end() + 1])
+                    pos = match.end() + 1
+                elif line.startswith(self.quote, match.end()):
+                    # doubled quote
+                    self.parts.append(line[pos:match.end() + 1])
+                    pos = match.end() + 1
+                else:
+                    self.parts.append(line[pos:match.end()])
+                    pos = match.end()
+                    self.quote = None
+            else:
+                match = self._normal.search(line, pos)
+                if match is None:
+                    self.parts.append(line[pos:])
+                    break
+                self.parts.append(line[pos:match.start()])
+                token = match.group()
+                pos = match.end()
+                if token == self.delimiter:
+                    statement = ''.join(self.parts).strip()
+                    self.parts = []
+                    if statement:
+                        statements.append(statement)
+                elif token in _QUOTE_END:
+                    self.quote = token
+                    self.parts.append(token)
+                elif token == '/*':
+                    self.comment = True
+                else:
+                    # -- and # comments run to the end of the line
+                    if line.endswith('\n'):
+                        self.parts.append('\n')
+                    break
+        return statements
+
+    def close(self):
+        """
+        The last statement if the input did not end with a delimiter.
+        """
+        statement = ''.join(self.parts).strip()
+        self.parts = []
+        return [statement] if statement else []
+
+
+def open_dump(source):
+    """
+    Open a dump for reading text, decompressing gzip and zstd input detected by its magic bytes.
+
+    :param source: Path, binary or text file object.
+    :return: (text stream, underlying binary file or None), the binary file tells the compressed position.
+    """
+    if isinstance(source, io.TextIOBase):
+        return source, None
+    raw = open(source, 'rb') if isinstance(source, (str, Path)) else source
+    if not hasattr(raw, 'peek'):
+        raw = io.BufferedReader(raw)
+    magic = raw.peek(4)[:4]
+    if magic.startswith(GZIP_MAGIC):
+        binary = gzip.GzipFile(fileobj=raw)
+    elif magic == ZSTD_MAGIC:
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstandard is required for .zst dumps, install it with: pip install zstandard")
+        binary = zstandard.ZstdDecompressor().stream_reader(raw)
+    else:
+        binary = raw
+    return io.TextIOWrapper(binary, encoding='utf-8', errors='surrogateescape', newline=''), raw
+
+
+def iter_statements(stream):
+    """
+    Yield the statements of a text stream one by one, holding at most one statement in memory.
+    """
+    splitter = StatementSplitter()
+    for line in stream:
+        yield from splitter.feed(line)
+    yield from splitter.close()
+
+
+def classify(statement):
+    """
+    How the importer schedules a statement.
+
+    :return: (kind, table): 'rows' for INSERT and REPLACE, 'table' for DDL on one table, 'use' with the
+        database as table, 'skip' for LOCK and UNLOCK TABLES, or 'global' with table None. table is a
+        (database or None, name) pair.
+    """
+    text = _LEADING_COMMENT.sub('', statement, count=1)
+    match = _ROWS.match(text)
+    if match:
+        return 'rows', _names(match)
+    if _LOCKS.match(text):
+        return 'skip', None
+    match = _TABLE_DDL.match(text + ' ')
+    if match:
+        return 'table', _names(match)
+    match = _USE.match(text)
+    if match:
+        return 'use', _names(match)[1]
+    return 'global', None
+
+
+class Progress:
+    """
+    Thread-safe progress counters, logged and passed to a callback at most every interval seconds.
+    """
+
+    def __init__(self, operation, total_bytes=None, callback=None, interval=2.0):
+        self.operation = operation
+        self.total_bytes = total_bytes
+        self.callback = callback
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.counters = {'bytes': 0, 'statements': 0, 'rows': 0, 'tables': 0}
+        # callable returning the position in the (compressed) input, for the percentage
+        self.tell = None
+        self._last_report = self.start
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                self.counters[name] = self.counters.get(name, 0) + count
+            now = time.perf_counter()
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+            snapshot = self.snapshot()
+        self._report(snapshot)
+
+    def snapshot(self):
+        seconds = time.perf_counter() - self.start
+        snapshot = dict(self.counters, operation=self.operation, seconds=seconds,
+                        bytes_per_second=self.counters['bytes'] / seconds if seconds > 0 else 0.0)
+        if self.total_bytes and self.tell is not None:
+            try:
+                snapshot['percent'] = min(100.0, 100.0 * self.tell() / self.total_bytes)
+            except (OSError, ValueError):
+                pass
+        return snapshot
+
+    def _report(self, snapshot):
+        percent = f" ({snapshot['percent']:.1f}%)" if 'percent' in snapshot else ''
+        logger.info(f"{self.operation}: {snapshot['bytes'] / 1e6:.1f} MB, {snapshot['statements']} statements, "
+                    f"{snapshot['tables']} tables in {snapshot['seconds']:.1f}s "
+                    f"({snapshot['bytes_per_second'] / 1e6:.1f} MB/s){percent}")
+        if self.callback is not None:
+            try:
+                self.callback(snapshot)
+            except Exception as e:
+                logger.warning(f"Progress callback failed: {e}")
+
+    def finish(self):
+        snapshot = self.snapshot()
+        self._report(snapshot)
+        return snapshot
+
+
+def _execute_batch(connection, statements):
+    with connection.cursor() as cursor:
+        cursor.execute(';\n'.join(statements))
+        while cursor.nextset():
+            pass
+
+
+def _disable_checks(connection):
+    _execute_batch(connection, ["SET SESSION unique_checks = 0, foreign_key_checks = 0"])
+
+
+class _Workers:
+    """
+    Single-threaded executors that each keep their own connection, replaying the session statements (SET ...)
+    and the current database of the dump before running a batch.
+
+    All batches of a table go to the same executor, so they run in dump order and never contend for the locks
+    of that table.
+    """
+
+    def __init__(self, connect, parallel):
+        self._connect = connect
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.executors = [ThreadPoolExecutor(max_workers=1, thread_name_prefix='mariadb4p-import')
+                          for _ in range(parallel)]
+        # table -> index of its executor, tables are spread round robin in order of appearance
+        self._routes = {}
+        # set after a failure, queued batches are skipped
+        self.cancelled = False
+        # bounds the queued batches and so the memory
+        self.slots = threading.BoundedSemaphore(parallel * 2)
+
+    def _connection(self):
+        state = getattr(self._local, 'state', None)
+        if state is None:
+            connection = self._connect()
+            _disable_checks(connection)
+            with self._lock:
+                self._connections.append(connection)
+            state = self._local.state = {'connection': connection, 'session': 0, 'database': None}
+        return state
+
+    def _run(self, statements, session, database):
+        try:
+            if self.cancelled:
+                return
+            state = self._connection()
+            connection = state['connection']
+            if state['session'] < len(session):
+                _execute_batch(connection, session[state['session']:])
+                state['session'] = len(session)
+            if database is not None and state['database'] != database:
+                connection.select_db(database)
+                state['database'] = database
+            connection.begin()
+            _execute_batch(connection, statements)
+            connection.commit()
+        finally:
+            self.slots.release()
+
+    def submit(self, table, statements, session, database):
+        executor = self.executors[self._routes.setdefault(table, len(self._routes) % len(self.executors))]
+        self.slots.acquire()
+        try:
+            return executor.submit(self._run, statements, session, database)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def close(self):
+        for executor in self.executors:
+            executor.shutdown(wait=True)
+        for connection in self._connections:
+            try:
+                connection.close()
+            except Exception as e:
+                logger.debug(f"Error closing import connection: {e}")
+
+
+def _wait(futures):
+    done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+    for future in done:
+        future.result()
+    for future in pending:
+        future.result()
+
+
+def import_stream(connect, stream, parallel=4, batch_bytes=DEFAULT_BATCH_BYTES, progress=None):
+    """
+    Import the statements of a dump, running the INSERTs of independent tables concurrently.
+
+    Row statements are batched per table and executed on worker connections, each table on a single worker so
+    its batches run in order. DDL on a table waits for the pending rows of that table only, other statements (SET,
+    USE, CREATE DATABASE, views, routines, ...) wait for everything and run on the main connection. SET
+    statements are replayed on every worker connection. LOCK TABLES and UNLOCK TABLES are skipped, they would
+    block the other connections. Unique and foreign key checks are off on all connections.
+
+    :param connect: Callable returning a new pymysql connection with the CLIENT.MULTI_STATEMENTS flag.
+    :param stream: Text stream of SQL, see open_dump.
+    :param parallel: Number of worker connections.
+    :param batch_bytes: Size of the statement batches sent per round trip.
+    :param progress: Progress receiving the counts.
+    """
+    progress = progress or Progress('import')
+    main = connect()
+    workers = _Workers(connect, max(1, parallel))
+    # SET statements in dump order, replayed by the workers
+    session = []
+    database = None
+    # table -> (statements, bytes) not yet submitted, and futures not yet waited for
+    batches = {}
+    futures = {}
+
+    def flush(table):
+        statements, _ = batches.pop(table, ([], 0))
+        if statements:
+            futures.setdefault(table, []).append(workers.submit(table, statements, tuple(session), database))
+
+    def drain(table=None):
+        for key in ([table] if table is not None else list(batches)):
+            flush(key)
+        for key in ([table] if table is not None else list(futures)):
+            _wait(futures.pop(key, []))
+
+    try:
+        _disable_checks(main)
+        main.autocommit(True)
+        for statement in iter_statements(stream):
+            size = len(statement)
+            kind, table = classify(statement)
+            if kind == 'rows':
+                key = (table[0] or database, table[1])
+                statements, pending = batches.setdefault(key, ([], 0))
+                statements.append(statement)
+                batches[key] = (statements, pending + size)
+                if pending + size >= batch_bytes:
+                    flush(key)
+            elif kind == 'table':
+                key = (table[0] or database, table[1])
+                drain(key)
+                _execute_batch(main, [statement])
+                if statement.lstrip()[:6].upper() == 'CREATE':
+                    progress.add(tables=1)
+            elif kind == 'use':
+                drain()
+                main.select_db(table)
+                database = table
+            elif kind == 'global':
+                drain()
+                _execute_batch(main, [statement])
+                if re.match(r'(/\*M?!\d*\s*)?SET\b', statement, re.I):
+                    session.append(statement)
+            progress.add(bytes=size, statements=1)
+            # raise failures early and keep the bookkeeping small
+            for key, pending in list(futures.items()):
+                for future in pending:
+                    if future.done():
+                        future.result()
+                futures[key] = [future for future in pending if not future.done()]
+        drain()
+    except BaseException:
+        workers.cancelled = True
+        raise
+    finally:
+        workers.close()
+        main.close()
+    return progress
+
+
+def import_sql(connect, source, parallel=4, batch_bytes=DEFAULT_BATCH_BYTES, progress_callback=None):
+    """
+    Import a plain, gzip or zstd compressed SQL dump, or an export directory written by export_database.
+
+    Files of an export directory hold one table each and are imported concurrently, parallel at a time, with
+    the views last. They do not select a database, connect must open the connections on the target database.
+
+    :param connect: Callable returning a new pymysql connection with the CLIENT.MULTI_STATEMENTS flag.
+    :param source: Path of a dump file or directory, or a binary or text file object.
+    :param parallel: Number of connections loading rows concurrently.
+    :param batch_bytes: Size of the statement batches sent per round trip.
+    :param progress_callback: Callable receiving progress dicts with 'bytes', 'statements', 'tables', 'seconds',
+        'bytes_per_second' and, for files, 'percent'.
+    :return: Final progress dict.
+    """
+    if isinstance(source, (str, Path)) and Path(source).is_dir():
+        return _import_directory(connect, Path(source), parallel, batch_bytes, progress_callback)
+    total = os.path.getsize(source) if isinstance(source, (str, Path)) else None
+    progress = Progress('import', total_bytes=total, callback=progress_callback)
+    stream, raw = open_dump(source)
+    if raw is not None:
+        progress.tell = raw.tell
+    try:
+        import_stream(connect, stream, parallel, batch_bytes, progress)
+    finally:
+        if isinstance(source, (str, Path)):
+            stream.close()
+    return progress.finish()
+
+
+def _import_directory(connect, directory, parallel, batch_bytes, progress_callback):
+    files = sorted(path for path in directory.iterdir() if path.is_file() and '.sql' in path.suffixes)
+    views = [path for path in files if path.name.startswith(VIEWS_FILE)]
+    tables = [path for path in files if path not in views]
+    progress = Progress('import', callback=progress_callback)
+
+    def import_file(path):
+        stream, _ = open_dump(path)
+        try:
+            import_stream(connect, stream, parallel=1, batch_bytes=batch_bytes, progress=progress)
+        finally:
+            stream.close()
+
+    with ThreadPoolExecutor(max_workers=max(1, parallel), thread_name_prefix='mariadb4p-import') as executor:
+        for future in [executor.submit(import_file, path) for path in tables]:
+            future.result()
+    for path in views:
+        import_file(path)
+    return progress.finish()
+
+
+def _open_output(path, compression, level):
+    if compression is None:
+        return open(path, 'w', encoding='utf-8', newline='\n')
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', compresslevel=level or 6, encoding='utf-8', newline='\n')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstandard is required for compression='zstd', install it with: pip install zstandard")
+        writer = zstandard.ZstdCompressor(level=level or 3).stream_writer(open(path, 'wb'), closefd=True)
+        return io.TextIOWrapper(writer, encoding='utf-8', newline='\n')
+    raise ValueError(f"Unknown compression {compression!r}, expected one of {COMPRESSIONS}")
+
+
+def _quote(name):
+    return '`' + str(name).replace('`', '``') + '`'
+
+
+DUMP_HEADER = ("SET NAMES utf8mb4;\n"
+               "SET SESSION time_zone = '+00:00';\n"
+               "SET SESSION sql_mode = 'NO_AUTO_VALUE_ON_ZERO';\n"
+               "SET SESSION foreign_key_checks = 0, unique_checks = 0;\n")
+
+
+def _export_connection(connect):
+    connection = connect()
+    # temporal values are written in the time zone DUMP_HEADER sets on import
+    with connection.cursor() as cursor:
+        cursor.execute("SET SESSION time_zone = '+00:00'")
+    return connection
+
+
+def _dump_table(connection, db_name, table, create, path, compression, level, statement_bytes, progress):
+    import pymysql.cursors
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s "
+                       "AND EXTRA NOT LIKE '%%GENERATED%%' ORDER BY ORDINAL_POSITION", (db_name, table))
+        columns = [row[0] for row in cursor.fetchall()]
+    column_list = ', '.join(map(_quote, columns))
+    qualified = f"{_quote(db_name)}.{_quote(table)}"
+    insert = f"INSERT INTO {_quote(table)} ({column_list}) VALUES\n"
+    rows = 0
+    with _open_output(path, compression, level) as out:
+        out.write(DUMP_HEADER)
+        out.write(f"DROP TABLE IF EXISTS {_quote(table)};\n{create};\n")
+        cursor = connection.cursor(pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(f"SELECT {column_list} FROM {qualified}")
+            values, size = [], 0
+            while True:
+                fetched = cursor.fetchmany(EXPORT_FETCH_SIZE)
+                if not fetched:
+                    break
+                for row in fetched:
+                    value = '(' + ','.join(connection.escape(item) for item in row) + ')'
+                    values.append(value)
+                    size += len(value) + 2
+                    if size >= statement_bytes:
+                        out.write(insert + ',\n'.join(values) + ';\n')
+                        progress.add(bytes=size, statements=1, rows=len(values))
+                        rows += len(values)
+                        values, size = [], 0
+            if values:
+                out.write(insert + ',\n'.join(values) + ';\n')
+                progress.add(bytes=size, statements=1, rows=len(values))
+                rows += len(values)
+        finally:
+            cursor.close()
+    progress.add(tables=1)
+    return rows
+
+
+def export_database(connect, db_name, dest, parallel=4, compression='gzip', level=None, tables=None, consistent=True,
+                    statement_bytes=DEFAULT_STATEMENT_BYTES, progress_callback=None):
+    """
+    Dump the tables of a database concurrently into one file per table, plus a file with the views.
+
+    With consistent=True all tables are read from the same point in time: the workers start their
+    consistent snapshot transactions while the main connection holds FLUSH TABLES WITH READ LOCK.
+
+    :param connect: Callable returning a new pymysql connection.
+    :param db_name: Database to export.
+    :param dest: Directory for the files, '<table>.sql' with '.gz' or '.zst' for compressed output.
+    :param parallel: Number of tables dumped concurrently.
+    :param compression: None, 'gzip' or 'zstd'.
+    :param level: Compression level, defaults to 6 for gzip and 3 for zstd.
+    :param tables: Tables to export, defaults to all base tables.
+    :param consistent: Read all tables from one snapshot.
+    :param statement_bytes: Size of the extended INSERT statements.
+    :param progress_callback: Callable receiving progress dicts, see import_sql.
+    :return: Final progress dict, with 'files' listing the written files.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression {compression!r}, expected one of {COMPRESSIONS}")
+    suffix = {None: '.sql', 'gzip': '.sql.gz', 'zstd': '.sql.zst'}[compression]
+    dest = Path(dest)
+    dest.mkdir(parents=True, exist_ok=True)
+    progress = Progress('export', callback=progress_callback)
+    main = _export_connection(connect)
+    connections = []
+    try:
+        with main.cursor() as cursor:
+            cursor.execute("SELECT TABLE_NAME, TABLE_TYPE FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s "
+                           "ORDER BY DATA_LENGTH DESC", (db_name,))
+            listed = cursor.fetchall()
+            base_tables = [name for name, kind in listed if kind == 'BASE TABLE' and (tables is None or name in tables)]
+            views = [name for name, kind in listed if kind == 'VIEW' and tables is None]
+            definitions = {}
+            for name in base_tables + views:
+                cursor.execute(f"SHOW CREATE TABLE {_quote(db_name)}.{_quote(name)}")
+                definitions[name] = cursor.fetchone()[1]
+
+        workers = max(1, min(parallel, len(base_tables)))
+        connections = [_export_connection(connect) for _ in range(workers)]
+        if consistent:
+            with main.cursor() as cursor:
+                cursor.execute("FLUSH TABLES WITH READ LOCK")
+                try:
+                    for connection in connections:
+                        with connection.cursor() as worker_cursor:
+                            worker_cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+                finally:
+                    cursor.execute("UNLOCK TABLES")
+
+        free = list(connections)
+        free_lock = threading.Lock()
+
+        def dump(name):
+            with free_lock:
+                connection = free.pop()
+            try:
+                return _dump_table(connection, db_name, name, definitions[name], dest / f'{name}{suffix}', compression,
+                                   level, statement_bytes, progress)
+            finally:
+                with free_lock:
+                    free.append(connection)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mariadb4p-export') as executor:
+            # the largest tables first, so they do not end up running alone at the end
+            for future in [executor.submit(dump, name) for name in base_tables]:
+                future.result()
+
+        files = [str(dest / f'{name}{suffix}') for name in base_tables]
+        if views:
+            path = dest / f'{VIEWS_FILE}{suffix[4:]}'
+            with _open_output(path, compression, level) as out:
+                out.write(DUMP_HEADER)
+                for name in views:
+                    out.write(f"DROP VIEW IF EXISTS {_quote(name)};\n{definitions[name]};\n")
+            files.append(str(path))
+    finally:
+        for connection in connections + [main]:
+            try:
+                connection.close()
+            except Exception as e:
+                logger.debug(f"Error closing export connection: {e}")
+    result = progress.finish()
+    result['files'] = files
+    return result
@@ -0,0 +1,71 @@
+from loguru import logger
+
+# Rows fetched from the server per round of an unbuffered cursor
+DEFAULT_FETCH_SIZE = 10000
+COLUMNAR_FORMATS = (None, 'numpy', 'arrow')
+
+
+def to_columnar(rows, names, columnar):
+    """
+    Convert a batch of row tuples into columns.
+
+    :param rows: List of row tuples.
+    :param names: Column names, in row order.
+    :param columnar: 'numpy' for a dict of NumPy arrays by column name, 'arrow' for a pyarrow.RecordBatch.
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    if columnar == 'numpy':
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("numpy is required for columnar='numpy', install it with: pip install numpy")
+        # columns with NULLs become object arrays
+        return {name: np.array(column) for name, column in zip(names, columns)}
+    if columnar == 'arrow':
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("pyarrow is required for columnar='arrow', install it with: pip install pyarrow")
+        return pa.RecordBatch.from_arrays([pa.array(column) for column in columns], names=list(names))
+    raise ValueError(f"Unknown columnar format: {columnar}, expected one of {COLUMNAR_FORMATS}")
+
+
+def stream_query(pool, query, params=None, fetch_size=DEFAULT_FETCH_SIZE, columnar=None):
+    """
+    Run a query with an unbuffered server-side cursor and yield its results incrementally.
+
+    Rows are pulled from the server fetch_size at a time, so memory stays flat whatever the result size.
+    If the generator is closed before the end, the connection is dropped instead of draining the rest.
+
+    :param pool: ConnectionPool to take the connection from.
+    :param query: SQL query.
+    :param params: Optional query parameters.
+    :param fetch_size: Rows fetched per round trip, and per yielded batch in columnar mode.
+    :param columnar: None to yield row tuples one by one, 'numpy' or 'arrow' to yield column batches, see to_columnar.
+    """
+    import pymysql.cursors
+    if columnar not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown columnar format: {columnar}, expected one of {COLUMNAR_FORMATS}")
+    connection = pool.acquire()
+    finished = False
+    try:
+        cursor = connection.cursor(pymysql.cursors.SSCursor)
+        cursor.execute(query, params)
+        names = [column[0] for column in cursor.description or []]
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            if columnar is None:
+                yield from rows
+            else:
+                yield to_columnar(rows, names, columnar)
+        cursor.close()
+        finished = True
+    finally:
+        if finished:
+            # release rolls back, ending the read view the streamed SELECT opened
+            pool.release(connection)
+        else:
+            logger.debug("Streaming query stopped early, dropping its connection.")
+            pool.discard(connection)
@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+from loguru import logger
+
+from MariaDB4p.artifact_store import FileLock
+from MariaDB4p.download_jars import read_lockfile
+
+# Cache of pristine, initialized data directories
+TEMPLATES_DIR = Path(os.environ.get('MARIADB4P_TEMPLATES_DIR', Path(Path.home(), '.cache', 'MariaDB4p', 'templates')))
+# Data directories of server instances. Not the temp directory: MariaDB4j deletes a data directory under
+# java.io.tmpdir before installing into it, which would wipe the cloned template.
+INSTANCES_DIR = Path(os.environ.get('MARIADB4P_INSTANCES_DIR', Path(Path.home(), '.cache', 'MariaDB4p', 'instances')))
+# Written last, a template without it is incomplete
+COMPLETE_MARKER = '.template_complete'
+# Runtime files that must not be carried over into a clone
+SKIPPED_SUFFIXES = ('.pid', '.sock', '.err')
+# ioctl request to reflink a file on Linux (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+def mariadb_version(jars_dir):
+    """
+    Identify the MariaDB binaries on the classpath by the locked mariaDB4j-db artifact.
+    """
+    lock = read_lockfile(jars_dir) or {}
+    for entry in lock.get('artifacts', []):
+        if entry['artifact_id'].startswith('mariaDB4j-db'):
+            return f"{entry['artifact_id']}:{entry['version']}"
+    # without a lockfile fall back to the JAR names
+    names = sorted(path.name for path in Path(jars_dir).glob('mariaDB4j-db*.jar'))
+    return ','.join(names) or 'unknown'
+
+
+def fixture_fingerprint(fixture):
+    if callable(fixture):
+        return f"{fixture.__module__}.{getattr(fixture, '__qualname__', repr(fixture))}"
+    if isinstance(fixture, Path) or (isinstance(fixture, str) and fixture.endswith('.sql') and Path(fixture).exists()):
+        return hashlib.sha256(Path(fixture).read_bytes()).hexdigest()
+    return hashlib.sha256(str(fixture).encode()).hexdigest()
+
+
+def template_key(version, config=None, fixtures=()):
+    """
+    Cache key of a template: MariaDB version, server configuration and fixtures.
+
+    :param version: MariaDB version, see mariadb_version.
+    :param config: JSON serializable server configuration that affects the data files.
+    :param fixtures: SQL strings, .sql paths or callables applied to the template.
+    """
+    payload = json.dumps({'version': version, 'config': config, 'fixtures': [fixture_fingerprint(f) for f in fixtures]},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _reflink(source, dest):
+    if not sys.platform.startswith('linux'):
+        return False
+    import fcntl
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            return False
+    shutil.copystat(source, dest)
+    return True
+
+
+def clone_file(source, dest):
+    """
+    Copy one file, as a reflink where the filesystem supports it.
+
+    :return: 'reflink' or 'copy'.
+    """
+    if _reflink(source, dest):
+        return 'reflink'
+    shutil.copy2(source, dest)
+    return 'copy'
+
+
+def clone_tree(source, dest):
+    """
+    Copy a data directory, sharing blocks through reflinks where the filesystem supports them.
+
+    Hardlinks are not used, the server writes to its data files in place and would modify the template.
+
+    :return: dict counting the files cloned with 'reflink' and 'copy'.
+    """
+    source = Path(source)
+    counts = {'reflink': 0, 'copy': 0}
+    use_reflink = True
+    for root, dirs, files in os.walk(source):
+        target_root = Path(dest, Path(root).relative_to(source))
+        target_root.mkdir(parents=True, exist_ok=True)
+        for name in files:
+            if name == COMPLETE_MARKER or name.endswith(SKIPPED_SUFFIXES):
+                continue
+            src, dst = Path(root, name), target_root / name
+            if use_reflink and _reflink(src, dst):
+                counts['reflink'] += 1
+                continue
+            # one failed reflink means the filesystem does not support them
+            use_reflink = False
+            shutil.copy2(src, dst)
+            counts['copy'] += 1
+    return counts
+
+
+def ensure_template(key, build, templates_dir=None):
+    """
+    Return the data directory of a template, building it first if it is not cached.
+
+    The build runs under a file lock, so concurrent processes build a template only once.
+
+    :param key: Template key, see template_key.
+    :param build: Callable taking an empty directory and initializing a data directory in it.
+    :param templates_dir: Cache directory, defaults to TEMPLATES_DIR.
+    :return: Path of the template data directory.
+    """
+    templates_dir = Path(templates_dir or TEMPLATES_DIR)
+    template = templates_dir / key
+    if (template / COMPLETE_MARKER).exists():
+        return template
+    with FileLock(templates_dir / f'{key}.lock'):
+        if (template / COMPLETE_MARKER).exists():
+            return template
+        logger.info(f"Building data directory template {template}")
+        if template.exists():
+            shutil.rmtree(template)
+        tmp_dir = Path(tempfile.mkdtemp(prefix=f'{key}.', dir=templates_dir))
+        try:
+            build(tmp_dir)
+            (tmp_dir / COMPLETE_MARKER).write_text(key)
+            os.replace(tmp_dir, template)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+    return template
+
+
+def new_instance_dir(prefix='mariadb4p_', dir=None):
+    """
+    Create a unique directory for the data of one server instance.
+
+    :param dir: Parent directory, defaults to INSTANCES_DIR.
+    """
+    dir = Path(dir or INSTANCES_DIR)
+    dir.mkdir(parents=True, exist_ok=True)
+    return tempfile.mkdtemp(prefix=prefix, dir=dir)
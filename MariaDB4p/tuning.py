@@ -0,0 +1,139 @@
+import os
+from loguru import logger
+
+from MariaDB4p.artifact_store import parse_size
+
+MIB = 1024 * 1024
+# The buffer pool grows in chunks of innodb_buffer_pool_chunk_size, 128M by default
+BUFFER_POOL_CHUNK = 128 * MIB
+THREAD_HANDLINGS = ('one-thread-per-connection', 'pool-of-threads', 'no-threads')
+# Server variables reported by default by MariaDBWrapper.effective_settings
+TUNED_VARIABLES = ('innodb_buffer_pool_size', 'innodb_buffer_pool_instances', 'innodb_log_file_size', 'thread_handling',
+                   'thread_pool_size', 'max_connections', 'tmp_table_size', 'max_heap_table_size', 'query_cache_type',
+                   'query_cache_size')
+
+
+def total_memory():
+    """
+    Bytes of physical memory of the host, None if unknown.
+    """
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _size(value):
+    if value is None or isinstance(value, int):
+        return value
+    return parse_size(str(value))
+
+
+class ServerTuning:
+    """
+    mariadbd settings for the buffer pool, redo log, thread handling, connections, temporary tables and
+    the query cache. Settings left at None keep the server default.
+    """
+
+    def __init__(self, innodb_buffer_pool_size=None, innodb_buffer_pool_instances=None, innodb_log_file_size=None,
+                 thread_handling=None, thread_pool_size=None, max_connections=None, tmp_table_size=None,
+                 max_heap_table_size=None, query_cache_type=None, query_cache_size=None, extra=None):
+        """
+        Sizes are bytes or strings such as '512M'.
+
+        :param innodb_buffer_pool_size: InnoDB buffer pool size.
+        :param innodb_buffer_pool_instances: Buffer pool instances. MariaDB 10.6 and later removed the option,
+            leave it at None for those servers.
+        :param innodb_log_file_size: Redo log size.
+        :param thread_handling: 'one-thread-per-connection', 'pool-of-threads' or 'no-threads'.
+        :param thread_pool_size: Thread groups of the thread pool, usually the CPU count.
+        :param max_connections: Maximum concurrent client connections.
+        :param tmp_table_size: Maximum size of in-memory temporary tables.
+        :param max_heap_table_size: Maximum size of MEMORY tables, the smaller of this and tmp_table_size limits
+            in-memory temporary tables.
+        :param query_cache_type: 0 (off), 1 (on) or 2 (on demand).
+        :param query_cache_size: Query cache size, 0 disables it.
+        :param extra: dict of further variable names to values.
+        """
+        if thread_handling is not None and thread_handling not in THREAD_HANDLINGS:
+            raise ValueError(f"Invalid thread_handling {thread_handling!r}, expected one of {THREAD_HANDLINGS}")
+        if query_cache_type not in (None, 0, 1, 2):
+            raise ValueError(f"Invalid query_cache_type {query_cache_type!r}, expected 0, 1 or 2")
+        self.innodb_buffer_pool_size = _size(innodb_buffer_pool_size)
+        self.innodb_buffer_pool_instances = innodb_buffer_pool_instances
+        self.innodb_log_file_size = _size(innodb_log_file_size)
+        self.thread_handling = thread_handling
+        self.thread_pool_size = thread_pool_size
+        self.max_connections = max_connections
+        self.tmp_table_size = _size(tmp_table_size)
+        self.max_heap_table_size = _size(max_heap_table_size)
+        self.query_cache_type = query_cache_type
+        self.query_cache_size = _size(query_cache_size)
+        self.extra = dict(extra or {})
+
+    @classmethod
+    def auto(cls, memory=None, cpus=None, memory_fraction=0.25, **overrides):
+        """
+        Derive settings from the RAM and CPU count of the host.
+
+        The buffer pool gets memory_fraction of the RAM in whole 128M chunks, the redo log a quarter of
+        the buffer pool, and connections are served by a thread pool with one group per CPU. The query
+        cache is turned off, it serializes concurrent queries.
+
+        :param memory: Bytes of RAM, detected if not given.
+        :param cpus: Number of CPUs, detected if not given.
+        :param memory_fraction: Share of the RAM for the buffer pool.
+        :param overrides: Settings replacing the derived ones.
+        """
+        memory = memory or total_memory() or 4 * 1024 * MIB
+        cpus = cpus or os.cpu_count() or 1
+        buffer_pool = max(BUFFER_POOL_CHUNK, int(memory * memory_fraction) // BUFFER_POOL_CHUNK * BUFFER_POOL_CHUNK)
+        tmp_tables = max(16 * MIB, min(256 * MIB, memory // 64 // MIB * MIB))
+        settings = dict(
+            innodb_buffer_pool_size=buffer_pool,
+            innodb_log_file_size=max(48 * MIB, buffer_pool // 4),
+            thread_handling='pool-of-threads',
+            thread_pool_size=cpus,
+            max_connections=max(151, 50 * cpus),
+            tmp_table_size=tmp_tables,
+            max_heap_table_size=tmp_tables,
+            query_cache_type=0,
+            query_cache_size=0,
+        )
+        settings.update(overrides)
+        tuning = cls(**settings)
+        logger.debug(f"Auto tuning for {memory // MIB}M RAM and {cpus} CPUs: {tuning.to_dict()}")
+        return tuning
+
+    @classmethod
+    def coerce(cls, value):
+        """
+        A ServerTuning from None, 'auto', a dict of settings or a ServerTuning.
+        """
+        if value is None or isinstance(value, cls):
+            return value
+        if value == 'auto':
+            return cls.auto()
+        if isinstance(value, dict):
+            return cls(**value)
+        raise TypeError(f"Invalid tuning {value!r}, expected a ServerTuning, a dict or 'auto'")
+
+    def to_dict(self):
+        """
+        The settings that are set, by server variable name.
+        """
+        settings = {name: value for name, value in vars(self).items() if name != 'extra' and value is not None}
+        settings.update(self.extra)
+        return settings
+
+    def to_args(self):
+        """
+        mariadbd command line arguments for the settings.
+        """
+        return [f"--{name.replace('_', '-')}={value}" for name, value in self.to_dict().items()]
+
+    def variable_names(self):
+        """
+        Server variables covered by these settings, for comparing with the effective values.
+        """
+        return list(self.to_dict())
@@ -0,0 +1,93 @@
+"""
+Compare the bulk loading strategies against the embedded server.
+
+    python benchmarks/bench_bulk_load.py --rows 200000
+"""
+import argparse
+import csv
+import tempfile
+import time
+from pathlib import Path
+
+from MariaDB4p.mariadb_wrapper import MariaDBWrapper
+
+TABLE_SQL = '''CREATE TABLE IF NOT EXISTS `{table}` (
+    `id` INT NOT NULL PRIMARY KEY,
+    `name` VARCHAR(64) NOT NULL,
+    `score` DOUBLE NULL,
+    KEY `name_idx` (`name`)
+) ENGINE=InnoDB'''
+
+
+def generate_rows(count):
+    for i in range(count):
+        yield (i, f'name-{i % 1000}', None if i % 10 == 0 else i * 0.5)
+
+
+def reset_table(wrapper, db_name, table):
+    wrapper.execute_query(f'DROP TABLE IF EXISTS `{table}`', db_name=db_name)
+    wrapper.execute_query(TABLE_SQL.format(table=table), db_name=db_name)
+
+
+def naive_insert(wrapper, db_name, table, rows):
+    start = time.perf_counter()
+    count = 0
+    with wrapper.transaction(db_name) as connection:
+        with connection.cursor() as cursor:
+            for row in rows:
+                cursor.execute(f'INSERT INTO `{table}` VALUES (%s, %s, %s)', row)
+                count += 1
+    seconds = time.perf_counter() - start
+    return {'table': table, 'method': 'single-row', 'rows': count, 'seconds': seconds, 'rows_per_second': count / seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--port', type=int, default=3307)
+    parser.add_argument('--naive-rows', type=int, default=10000, help='rows for the one-statement-per-row baseline')
+    args = parser.parse_args()
+
+    db_name = 'bench'
+    wrapper = MariaDBWrapper(port=args.port)
+    wrapper.start_server()
+    try:
+        wrapper.create_database(db_name)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = Path(tmp_dir, 'rows.csv')
+            with open(csv_path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['id', 'name', 'score'])
+                writer.writerows(generate_rows(args.rows))
+
+            results = []
+            reset_table(wrapper, db_name, 'naive')
+            results.append(naive_insert(wrapper, db_name, 'naive', generate_rows(args.naive_rows)))
+            for table, source, options in [
+                ('batch_rows', lambda: generate_rows(args.rows), {'method': 'batch'}),
+                ('infile_rows', lambda: generate_rows(args.rows), {'method': 'infile'}),
+                ('infile_rows_nokeys', lambda: generate_rows(args.rows), {'method': 'infile', 'disable_keys': True}),
+                ('infile_csv', lambda: csv_path, {'method': 'infile'}),
+            ]:
+                reset_table(wrapper, db_name, table)
+                results.append(wrapper.bulk_load(table, source(), db_name=db_name, **options))
+
+            tables = [f'parallel_{i}' for i in range(4)]
+            for table in tables:
+                reset_table(wrapper, db_name, table)
+            start = time.perf_counter()
+            reports = wrapper.bulk_load_many({table: generate_rows(args.rows // 4) for table in tables}, db_name=db_name)
+            seconds = time.perf_counter() - start
+            total = sum(report['rows'] for report in reports)
+            results.append({'table': 'parallel_*', 'method': 'infile x4', 'rows': total, 'seconds': seconds,
+                            'rows_per_second': total / seconds})
+
+        print(f"{'strategy':<24}{'rows':>10}{'seconds':>10}{'rows/s':>12}")
+        for result in results:
+            print(f"{result['table'] + ' ' + result['method']:<24}{result['rows']:>10}{result['seconds']:>10.2f}{result['rows_per_second']:>12.0f}")
+    finally:
+        wrapper.stop_server()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Compare autocommit INSERT throughput of the default and the ephemeral server profile.
+
+    python benchmarks/bench_commit_throughput.py --commits 5000
+"""
+import argparse
+import time
+
+import pymysql
+
+from MariaDB4p.mariadb_wrapper import MariaDBWrapper, find_free_port
+
+
+def measure(wrapper, commits):
+    connection = pymysql.connect(user='root', password='', autocommit=True, **wrapper.connection_params())
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE DATABASE IF NOT EXISTS bench')
+        cursor.execute('CREATE TABLE bench.commits (id INT AUTO_INCREMENT PRIMARY KEY, payload VARCHAR(64)) ENGINE=InnoDB')
+        start = time.perf_counter()
+        for i in range(commits):
+            cursor.execute('INSERT INTO bench.commits (payload) VALUES (%s)', (f'row {i}',))
+        seconds = time.perf_counter() - start
+    connection.close()
+    return {'seconds': seconds, 'commits_per_second': commits / seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--commits', type=int, default=2000)
+    args = parser.parse_args()
+
+    results = {}
+    for profile in ('default', 'ephemeral'):
+        wrapper = MariaDBWrapper(port=find_free_port(), profile=profile)
+        wrapper.start_server()
+        try:
+            results[profile] = measure(wrapper, args.commits)
+        finally:
+            wrapper.stop_server()
+    print(f"{'profile':<12}{'seconds':>10}{'commits/s':>12}")
+    for name, result in results.items():
+        print(f"{name:<12}{result['seconds']:>10.2f}{result['commits_per_second']:>12.0f}")
+    print(f"ephemeral speedup: {results['ephemeral']['commits_per_second'] / results['default']['commits_per_second']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Compare cold start time and resident memory of the JPype backend and the native backend.
+
+Each run starts a server in a fresh interpreter, so the JVM and imports count towards the start time:
+
+    python benchmarks/bench_native_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = """
+import sys, time, json
+start = time.perf_counter()
+if sys.argv[1] == 'native':
+    from MariaDB4p.native import NativeMariaDBWrapper as Wrapper
+else:
+    from MariaDB4p.mariadb_wrapper import MariaDBWrapper as Wrapper
+wrapper = Wrapper(port=int(sys.argv[2]))
+wrapper.start_server()
+print(json.dumps({'start_s': time.perf_counter() - start}), flush=True)
+sys.stdin.readline()
+wrapper.stop_server()
+"""
+
+
+def process_tree_rss(pid):
+    """
+    Resident memory in bytes of a process and its descendants, from /proc.
+    """
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+                children.setdefault(ppid, []).append(int(entry))
+            except (OSError, ValueError, IndexError):
+                pass
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+
+def run(backend, port):
+    process = subprocess.Popen([sys.executable, '-c', CHILD, backend, str(port)], stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, text=True)
+    try:
+        result = json.loads(process.stdout.readline())
+        result['rss_mib'] = process_tree_rss(process.pid) / 2 ** 20
+        process.stdin.write('\n')
+        process.stdin.flush()
+        process.wait(60)
+        return result
+    finally:
+        if process.poll() is None:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=3307)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--backends', nargs='+', default=['jpype', 'native'], choices=['jpype', 'native'])
+    args = parser.parse_args()
+
+    for backend in args.backends:
+        results = [run(backend, args.port) for _ in range(args.runs)]
+        starts = [result['start_s'] for result in results]
+        rss = [result['rss_mib'] for result in results]
+        print(f"{backend:>7}: start {statistics.median(starts):.2f}s (min {min(starts):.2f}s), "
+              f"rss {statistics.median(rss):.0f} MiB")
+
+
+if __name__ == '__main__':
+    main()
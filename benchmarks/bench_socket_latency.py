@@ -0,0 +1,67 @@
+"""
+Compare connect time and per-query latency over the Unix socket and over TCP.
+
+    python benchmarks/bench_socket_latency.py --queries 20000
+"""
+import argparse
+import statistics
+import time
+
+import pymysql
+
+from MariaDB4p.mariadb_wrapper import MariaDBWrapper
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def measure(params, connects, queries):
+    connect_times = []
+    for _ in range(connects):
+        start = time.perf_counter()
+        pymysql.connect(user='root', password='', **params).close()
+        connect_times.append(time.perf_counter() - start)
+    connection = pymysql.connect(user='root', password='', **params)
+    latencies = []
+    with connection.cursor() as cursor:
+        for _ in range(queries):
+            start = time.perf_counter()
+            cursor.execute('SELECT 1')
+            cursor.fetchall()
+            latencies.append(time.perf_counter() - start)
+    connection.close()
+    return {
+        'connect_ms': statistics.mean(connect_times) * 1000,
+        'p50_us': percentile(latencies, 0.5) * 1e6,
+        'p99_us': percentile(latencies, 0.99) * 1e6,
+        'qps': queries / sum(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=3307)
+    parser.add_argument('--connects', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=10000)
+    args = parser.parse_args()
+
+    wrapper = MariaDBWrapper(port=args.port)
+    if wrapper.socket_path is None:
+        raise SystemExit('Unix sockets are not available on this platform.')
+    wrapper.start_server()
+    try:
+        results = {
+            'tcp': measure({'host': '127.0.0.1', 'port': args.port}, args.connects, args.queries),
+            'socket': measure({'unix_socket': wrapper.socket_path}, args.connects, args.queries),
+        }
+    finally:
+        wrapper.stop_server()
+    print(f"{'transport':<10}{'connect ms':>12}{'p50 us':>10}{'p99 us':>10}{'qps':>10}")
+    for name, result in results.items():
+        print(f"{name:<10}{result['connect_ms']:>12.2f}{result['p50_us']:>10.1f}{result['p99_us']:>10.1f}{result['qps']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
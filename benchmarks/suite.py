@@ -0,0 +1,441 @@
+"""
+Benchmark suite for the wrapper's hot paths, with per-machine JSON baselines.
+
+    python benchmarks/suite.py run --save-baseline        # record this machine's baseline
+    python benchmarks/suite.py run --output current.json  # measure again after a change
+    python benchmarks/suite.py compare current.json --threshold 0.15
+
+compare exits with status 1 if a metric regressed by more than the threshold. Each benchmark runs --repeat
+times and the median is kept. Benchmarks whose prerequisites are missing (downloaded JARs, a JDK) are skipped.
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+BASELINES_DIR = Path(__file__).parent / 'baselines'
+DEFAULT_JARS_DIR = Path(__file__).parent.parent / 'mariadb4j_jars'
+# Relative change beyond which a metric counts as a regression or an improvement
+DEFAULT_THRESHOLD = 0.10
+BENCH_DB = 'mariadb4p_bench'
+TABLE_SQL = '''CREATE TABLE IF NOT EXISTS `{table}` (
+    `id` INT NOT NULL PRIMARY KEY,
+    `name` VARCHAR(64) NOT NULL,
+    `score` DOUBLE NULL
+) ENGINE=InnoDB'''
+
+BENCHMARKS = {}
+
+
+class Skip(Exception):
+    """
+    Raised by a benchmark whose prerequisites are missing.
+    """
+
+
+def benchmark(name):
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+def lower(value, unit):
+    return {'value': value, 'unit': unit, 'better': 'lower'}
+
+
+def higher(value, unit):
+    return {'value': value, 'unit': unit, 'better': 'higher'}
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def machine_id():
+    """
+    Name of this machine's baseline: host, OS, architecture and Python version.
+    """
+    name = f"{platform.node()}-{platform.system()}-{platform.machine()}-py{sys.version_info[0]}{sys.version_info[1]}"
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name).lower()
+
+
+def machine_info():
+    return {'id': machine_id(), 'node': platform.node(), 'system': platform.platform(), 'machine': platform.machine(),
+            'python': platform.python_version(), 'cpus': os.cpu_count()}
+
+
+def baseline_path(machine=None):
+    return BASELINES_DIR / f'{machine or machine_id()}.json'
+
+
+class Context:
+    """
+    State shared by the benchmarks of one run, the server is started once and reused.
+    """
+
+    def __init__(self, jars_dir, mirror=None, queries=5000, rows=100000):
+        self.jars_dir = Path(jars_dir)
+        self.mirror = mirror
+        self.queries = queries
+        self.rows = rows
+        self.wrapper = None
+        self.loaded = False
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix='mariadb4p_bench_'))
+
+    def require_jars(self):
+        from MariaDB4p.download_jars import read_lockfile
+        if read_lockfile(self.jars_dir) is None:
+            raise Skip(f"no downloaded JARs in {self.jars_dir}, run download_maria4j_jars first")
+
+    def new_wrapper(self):
+        from MariaDB4p.exceptions import JDKInstallError, JVMStartError
+        from MariaDB4p.mariadb_wrapper import MariaDBWrapper, find_free_port
+        self.require_jars()
+        try:
+            return MariaDBWrapper(port=find_free_port(), jars_dir=self.jars_dir)
+        except (JDKInstallError, JVMStartError) as e:
+            raise Skip(str(e))
+
+    def server(self):
+        if self.wrapper is None:
+            self.wrapper = self.new_wrapper()
+            self.wrapper.start_server()
+            self.wrapper.create_database(BENCH_DB)
+        return self.wrapper
+
+    def loaded_table(self):
+        """
+        The benchmark table, filled with self.rows rows.
+        """
+        wrapper = self.server()
+        if not self.loaded:
+            from MariaDB4p.bulk_load import bulk_load
+            reset_table(wrapper, 'bench_read')
+            bulk_load(wrapper, 'bench_read', generate_rows(self.rows), db_name=BENCH_DB)
+            self.loaded = True
+        return 'bench_read'
+
+    def close(self):
+        if self.wrapper is not None:
+            self.wrapper.stop_server()
+            self.wrapper = None
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def generate_rows(count):
+    for i in range(count):
+        yield (i, f'name-{i % 1000}', None if i % 10 == 0 else i * 0.5)
+
+
+def reset_table(wrapper, table):
+    wrapper.execute(f'DROP TABLE IF EXISTS `{table}`', db_name=BENCH_DB)
+    wrapper.execute(TABLE_SQL.format(table=table), db_name=BENCH_DB)
+
+
+def pom_coordinates(pom):
+    """
+    (group_id, artifact_id, version) of a POM file, the group and version falling back to the parent's.
+    """
+    import xml.etree.ElementTree as ElementTree
+    root = ElementTree.parse(pom).getroot()
+    namespace = root.tag[:root.tag.index('}') + 1] if root.tag.startswith('{') else ''
+
+    def text(element, name):
+        child = element.find(namespace + name) if element is not None else None
+        return child.text.strip() if child is not None and child.text else None
+
+    parent = root.find(namespace + 'parent')
+    return (text(root, 'groupId') or text(parent, 'groupId'), text(root, 'artifactId'),
+            text(root, 'version') or text(parent, 'version'))
+
+
+def make_local_mirror(jars_dir, dest):
+    """
+    Lay out the downloaded JARs and POMs as a Maven repository, so downloads can be measured without
+    the network.
+
+    :return: file:// URL of the mirror.
+    """
+    from MariaDB4p.download_jars import read_lockfile
+    files = [((entry['group_id'], entry['artifact_id'], entry['version']), Path(jars_dir, entry['file']))
+             for entry in read_lockfile(jars_dir)['artifacts']]
+    files += [(pom_coordinates(pom), pom) for pom in Path(jars_dir).glob('*.pom')]
+    for (group_id, artifact_id, version), source in files:
+        directory = Path(dest, *group_id.split('.'), artifact_id, version)
+        directory.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(source, directory / f'{artifact_id}-{version}{source.suffix}')
+    return Path(dest).resolve().as_uri()
+
+
+@benchmark('download_jars')
+def bench_download_jars(ctx):
+    from MariaDB4p.download_jars import download_maria4j_jars
+    ctx.require_jars()
+    mirror = ctx.mirror or make_local_mirror(ctx.jars_dir, ctx.tmp_dir / 'mirror')
+    dependencies_dir = Path(tempfile.mkdtemp(prefix='jars_', dir=ctx.tmp_dir))
+    # the artifact store would turn the cold download into links
+    store = os.environ.pop('MARIADB4P_STORE', None)
+    try:
+        options = dict(dependencies_dir=dependencies_dir, repository=mirror)
+        start = time.perf_counter()
+        if not download_maria4j_jars(**options):
+            raise Skip(f"download from {mirror} failed")
+        cold = time.perf_counter() - start
+        warm = timed(download_maria4j_jars, **options)
+    finally:
+        if store is not None:
+            os.environ['MARIADB4P_STORE'] = store
+        shutil.rmtree(dependencies_dir, ignore_errors=True)
+    return {'download_jars_cold_s': lower(cold, 's'), 'download_jars_warm_s': lower(warm, 's')}
+
+
+@benchmark('jdk_probe')
+def bench_jdk_probe(ctx):
+    from MariaDB4p import check_jdk
+    cache = check_jdk.JDK_PROBE_CACHE
+    check_jdk.JDK_PROBE_CACHE = ctx.tmp_dir / 'jdk_probe.json'
+    try:
+        check_jdk._probes.clear()
+        start = time.perf_counter()
+        if check_jdk.is_jdk_installed() is None:
+            raise Skip("no JDK installed")
+        cold = time.perf_counter() - start
+        check_jdk._probes.clear()
+        disk = timed(check_jdk.is_jdk_installed)
+        memory = timed(check_jdk.is_jdk_installed)
+    finally:
+        check_jdk.JDK_PROBE_CACHE = cache
+        check_jdk._probes.clear()
+    return {'jdk_probe_cold_s': lower(cold, 's'), 'jdk_probe_disk_cache_s': lower(disk, 's'),
+            'jdk_probe_memory_cache_s': lower(memory, 's')}
+
+
+JVM_START = """
+import sys, time
+from MariaDB4p.download_jars import load_classpath
+from MariaDB4p.jvm import acquire_jvm
+start = time.perf_counter()
+acquire_jvm(load_classpath(sys.argv[1]))
+print(time.perf_counter() - start)
+"""
+
+
+@benchmark('jvm_start')
+def bench_jvm_start(ctx):
+    # a JVM starts once per process
+    ctx.require_jars()
+    result = subprocess.run([sys.executable, '-c', JVM_START, str(ctx.jars_dir)], stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise Skip(f"JVM did not start: {result.stderr.strip().splitlines()[-1:]}")
+    return {'jvm_start_s': lower(float(result.stdout.strip().splitlines()[-1]), 's')}
+
+
+@benchmark('start_server')
+def bench_start_server(ctx):
+    from MariaDB4p import templates
+    templates_dir = templates.TEMPLATES_DIR
+    # an empty template cache makes the first start build the template, the second one clones it
+    templates.TEMPLATES_DIR = Path(tempfile.mkdtemp(prefix='templates_', dir=ctx.tmp_dir))
+    results = {}
+    try:
+        for phase in ('cold', 'warm'):
+            wrapper = ctx.new_wrapper()
+            try:
+                results[f'start_server_{phase}_s'] = lower(timed(wrapper.start_server), 's')
+            finally:
+                wrapper.stop_server()
+    finally:
+        shutil.rmtree(templates.TEMPLATES_DIR, ignore_errors=True)
+        templates.TEMPLATES_DIR = templates_dir
+    return results
+
+
+@benchmark('execute_query')
+def bench_execute_query(ctx):
+    wrapper = ctx.server()
+    table = ctx.loaded_table()
+    wrapper.execute_query('SELECT 1', db_name=BENCH_DB)
+    latencies = []
+    for i in range(ctx.queries):
+        latencies.append(timed(wrapper.execute_query, f'SELECT * FROM `{table}` WHERE id = {i % ctx.rows}',
+                               db_name=BENCH_DB))
+    return {'execute_query_qps': higher(len(latencies) / sum(latencies), 'queries/s'),
+            'execute_query_p50_ms': lower(percentile(latencies, 0.5) * 1000, 'ms'),
+            'execute_query_p95_ms': lower(percentile(latencies, 0.95) * 1000, 'ms'),
+            'execute_query_p99_ms': lower(percentile(latencies, 0.99) * 1000, 'ms')}
+
+
+@benchmark('prepared_execute')
+def bench_prepared_execute(ctx):
+    wrapper = ctx.server()
+    table = ctx.loaded_table()
+    query = f'SELECT * FROM `{table}` WHERE id = %s'
+    pool = wrapper.get_pool(BENCH_DB)
+
+    def plain(i):
+        with pool.connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, (i % ctx.rows,))
+                cursor.fetchall()
+            connection.commit()
+
+    # both paths go through the same pool, so the difference is the statement cache
+    wrapper.execute(query, (0,), db_name=BENCH_DB)
+    plain(0)
+    prepared = sum(timed(wrapper.execute, query, (i % ctx.rows,), db_name=BENCH_DB) for i in range(ctx.queries))
+    text = sum(timed(plain, i) for i in range(ctx.queries))
+    return {'prepared_execute_qps': higher(ctx.queries / prepared, 'queries/s'),
+            'plain_execute_qps': higher(ctx.queries / text, 'queries/s'),
+            'prepared_speedup': higher(text / prepared, 'x')}
+
+
+@benchmark('bulk_insert')
+def bench_bulk_insert(ctx):
+    from MariaDB4p.bulk_load import bulk_load
+    wrapper = ctx.server()
+    reset_table(wrapper, 'bench_insert')
+    result = bulk_load(wrapper, 'bench_insert', generate_rows(ctx.rows), db_name=BENCH_DB)
+    return {'bulk_insert_rows_per_s': higher(result['rows_per_second'], 'rows/s')}
+
+
+@benchmark('large_read')
+def bench_large_read(ctx):
+    from MariaDB4p.streaming import stream_query
+    wrapper = ctx.server()
+    table = ctx.loaded_table()
+    start = time.perf_counter()
+    count = sum(1 for _ in stream_query(wrapper.get_pool(BENCH_DB), f'SELECT * FROM `{table}`'))
+    seconds = time.perf_counter() - start
+    return {'large_read_rows_per_s': higher(count / seconds, 'rows/s')}
+
+
+def run(names=None, repeat=3, **context_options):
+    """
+    Run benchmarks and keep the median of each metric over the repetitions.
+
+    :return: Results document with 'machine', 'created', 'results' and 'skipped'.
+    """
+    ctx = Context(**context_options)
+    results, skipped = {}, {}
+    try:
+        for name in names or list(BENCHMARKS):
+            samples = {}
+            try:
+                for _ in range(repeat):
+                    for metric, measurement in BENCHMARKS[name](ctx).items():
+                        samples.setdefault(metric, dict(measurement, samples=[]))['samples'].append(measurement['value'])
+            except Skip as e:
+                skipped[name] = str(e)
+                print(f"{name}: skipped, {e}")
+                continue
+            for metric, measurement in samples.items():
+                measurement['value'] = statistics.median(measurement['samples'])
+                results[metric] = measurement
+                print(f"{metric}: {measurement['value']:.6g} {measurement['unit']}")
+    finally:
+        ctx.close()
+    return {'machine': machine_info(), 'created': time.time(), 'repeat': repeat, 'results': results, 'skipped': skipped}
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare two results documents metric by metric.
+
+    :param threshold: Relative change, in the metric's worse direction, counted as a regression.
+    :return: List of dicts with 'metric', 'baseline', 'current', 'change' (relative, positive is worse) and
+        'status': 'ok', 'regression', 'improvement', 'new' or 'missing'.
+    """
+    base_results, current_results = baseline['results'], current['results']
+    rows = []
+    for metric in sorted(set(base_results) | set(current_results)):
+        base, cur = base_results.get(metric), current_results.get(metric)
+        row = {'metric': metric, 'baseline': base and base['value'], 'current': cur and cur['value'], 'change': None}
+        if base is None or cur is None:
+            row['status'] = 'new' if base is None else 'missing'
+        elif base['value'] == 0:
+            row['status'] = 'ok'
+        else:
+            change = (cur['value'] - base['value']) / base['value']
+            row['change'] = change if base['better'] == 'lower' else -change
+            row['status'] = ('regression' if row['change'] > threshold else
+                             'improvement' if row['change'] < -threshold else 'ok')
+        rows.append(row)
+    return rows
+
+
+def format_comparison(rows):
+    lines = [f"{'metric':<32} {'baseline':>12} {'current':>12} {'change':>8}  status"]
+    for row in rows:
+        values = ['-' if row[key] is None else f'{row[key]:.4g}' for key in ('baseline', 'current')]
+        change = '-' if row['change'] is None else f"{row['change']:+.1%}"
+        lines.append(f"{row['metric']:<32} {values[0]:>12} {values[1]:>12} {change:>8}  {row['status']}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='Run the benchmarks.')
+    run_parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                            help=f"Benchmarks to run, all by default: {', '.join(BENCHMARKS)}")
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--jars-dir', default=str(DEFAULT_JARS_DIR))
+    run_parser.add_argument('--mirror', default=None,
+                            help='Maven repository URL for the download benchmark, by default a file:// mirror '
+                                 'built from the downloaded JARs.')
+    run_parser.add_argument('--queries', type=int, default=5000)
+    run_parser.add_argument('--rows', type=int, default=100000)
+    run_parser.add_argument('--output', default=None, help='Write the results to this JSON file.')
+    run_parser.add_argument('--save-baseline', action='store_true', help="Store the results as this machine's baseline.")
+    compare_parser = commands.add_parser('compare', help='Compare results with a baseline.')
+    compare_parser.add_argument('current', help='Results JSON written by run --output.')
+    compare_parser.add_argument('--baseline', default=None, help="Baseline JSON, this machine's baseline by default.")
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        unknown = set(args.benchmarks) - set(BENCHMARKS)
+        if unknown:
+            parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+        results = run(args.benchmarks or None, args.repeat, jars_dir=args.jars_dir, mirror=args.mirror,
+                      queries=args.queries, rows=args.rows)
+        paths = [Path(args.output)] if args.output else []
+        if args.save_baseline:
+            BASELINES_DIR.mkdir(parents=True, exist_ok=True)
+            paths.append(baseline_path())
+        for path in paths:
+            path.write_text(json.dumps(results, indent=2))
+            print(f"Wrote {path}")
+        return 0
+    baseline_file = Path(args.baseline) if args.baseline else baseline_path()
+    if not baseline_file.exists():
+        print(f"No baseline {baseline_file}, record one with: run --save-baseline")
+        return 2
+    rows = compare(json.loads(baseline_file.read_text()), json.loads(Path(args.current).read_text()), args.threshold)
+    print(format_comparison(rows))
+    regressions = [row['metric'] for row in rows if row['status'] == 'regression']
+    if regressions:
+        print(f"{len(regressions)} regressions beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from MariaDB4p.artifact_store import ArtifactStore, parse_size
+from MariaDB4p.download_jars import resolve_dependencies
+from test_download_jars import maven_mirror, publish
+
+
+def add_checksums(repo):
+    for path in list(Path(repo).rglob('*.jar')) + list(Path(repo).rglob('*.pom')):
+        Path(f'{path}.sha1').write_text(hashlib.sha1(path.read_bytes()).hexdigest() + f'  {path.name}\n')
+
+
+def test_store_shared_between_installs(maven_mirror, tmp_path):
+    add_checksums(maven_mirror)
+    store = ArtifactStore(tmp_path / 'store')
+    first, second = tmp_path / 'venv1', tmp_path / 'venv2'
+    first.mkdir()
+    second.mkdir()
+    levels = resolve_dependencies([('org.example', 'app', '1.0')], dependencies_dir=first,
+                                  repository=maven_mirror.as_uri(), store=store)
+    assert sum(level['bytes'] for level in levels) > 0
+    levels = resolve_dependencies([('org.example', 'app', '1.0')], dependencies_dir=second,
+                                  repository=maven_mirror.as_uri(), store=store)
+    assert sum(level['bytes'] for level in levels) == 0
+    assert (first / 'app-1.0.jar').stat().st_ino == (second / 'app-1.0.jar').stat().st_ino
+
+
+def test_store_rejects_checksum_mismatch(maven_mirror, tmp_path):
+    add_checksums(maven_mirror)
+    Path(maven_mirror, 'org', 'example', 'shared', '1.0', 'shared-1.0.jar').write_bytes(b'tampered')
+    store = ArtifactStore(tmp_path / 'store')
+    dest = tmp_path / 'shared-1.0.jar'
+    assert store.fetch('org.example', 'shared', '1.0', 'jar', dest, maven_mirror.as_uri()) is None
+    assert not dest.exists()
+    assert store.lookup('org.example', 'shared', '1.0', 'jar') is None
+
+
+def test_store_concurrent_fetch_downloads_once(maven_mirror, tmp_path):
+    store = ArtifactStore(tmp_path / 'store')
+    jobs = [tmp_path / f'worker{i}' / 'app-1.0.jar' for i in range(8)]
+    for dest in jobs:
+        dest.parent.mkdir()
+    with ThreadPoolExecutor(8) as executor:
+        sizes = list(executor.map(lambda dest: store.fetch('org.example', 'app', '1.0', 'jar', dest, maven_mirror.as_uri()), jobs))
+    assert sorted(sizes) == [0] * 7 + [3]
+
+
+def test_store_prune_lru(maven_mirror, tmp_path):
+    publish(maven_mirror, 'org.example', 'big', '1.0', jar_content=b'x' * 1000)
+    store = ArtifactStore(tmp_path / 'store')
+    store.fetch('org.example', 'big', '1.0', 'jar', tmp_path / 'big.jar', maven_mirror.as_uri())
+    store.fetch('org.example', 'app', '1.0', 'jar', tmp_path / 'app.jar', maven_mirror.as_uri())
+    assert store.prune(parse_size('100b')) == 1000
+    assert store.lookup('org.example', 'big', '1.0', 'jar') is None
+    assert store.lookup('org.example', 'app', '1.0', 'jar') is not None
+    assert parse_size('2G') == 2 * 1024 ** 3
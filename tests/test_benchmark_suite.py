@@ -0,0 +1,33 @@
+import importlib.util
+import json
+from pathlib import Path
+
+spec = importlib.util.spec_from_file_location('suite', Path(__file__).parent.parent / 'benchmarks' / 'suite.py')
+suite = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(suite)
+
+
+def results(**metrics):
+    return {'results': {name: (suite.lower if name.endswith('_s') else suite.higher)(value, 'unit')
+                        for name, value in metrics.items()}}
+
+
+def test_compare_flags_regressions_in_the_worse_direction():
+    baseline = results(start_server_warm_s=1.0, execute_query_qps=1000, jvm_start_s=2.0, gone_s=1.0)
+    current = results(start_server_warm_s=1.2, execute_query_qps=800, jvm_start_s=1.5, new_qps=5)
+    rows = {row['metric']: row for row in suite.compare(baseline, current, threshold=0.1)}
+    assert rows['start_server_warm_s']['status'] == 'regression'
+    assert rows['execute_query_qps']['status'] == 'regression'
+    assert abs(rows['execute_query_qps']['change'] - 0.2) < 1e-9
+    assert rows['jvm_start_s']['status'] == 'improvement'
+    assert rows['gone_s']['status'] == 'missing' and rows['new_qps']['status'] == 'new'
+    assert 'regression' in suite.format_comparison(list(rows.values()))
+
+
+def test_compare_command_exit_status(tmp_path, capsys):
+    baseline, current = tmp_path / 'baseline.json', tmp_path / 'current.json'
+    baseline.write_text(json.dumps(results(execute_query_p99_ms_s=1.0)))
+    current.write_text(json.dumps(results(execute_query_p99_ms_s=1.05)))
+    assert suite.main(['compare', str(current), '--baseline', str(baseline)]) == 0
+    assert suite.main(['compare', str(current), '--baseline', str(baseline), '--threshold', '0.01']) == 1
+    assert suite.main(['compare', str(current), '--baseline', str(tmp_path / 'missing.json')]) == 2
@@ -0,0 +1,122 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from MariaDB4p import broker
+
+
+@pytest.fixture
+def fake_server(tmp_path):
+    # a process whose command line names the data directory, like mariadbd
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(120)', f'--datadir={data_dir}'])
+    yield process, str(data_dir)
+    process.kill()
+    process.wait()
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def register(tmp_path, process, data_dir, leases=None):
+    registry = broker.Registry('shared', tmp_path / 'registry')
+    registry.registry_dir.mkdir(parents=True, exist_ok=True)
+    registry.write({'name': 'shared', 'port': 3399, 'socket_path': None, 'base_dir': data_dir,
+                    'server_pid': process.pid, 'owner_pid': os.getpid(), 'started': time.time(),
+                    'watchdog_pid': None, 'leases': leases or {}})
+    return registry
+
+
+def test_reap_leases_drops_dead_and_silent_clients():
+    now = time.time()
+    record = {'name': 'shared', 'leases': {'live': {'pid': os.getpid(), 'heartbeat': now},
+                                           'dead': {'pid': dead_pid(), 'heartbeat': now},
+                                           'silent': {'pid': os.getpid(), 'heartbeat': now - 60}}}
+    assert sorted(broker.reap_leases(record, now, lease_timeout=30)) == ['dead', 'silent']
+    assert list(record['leases']) == ['live']
+
+
+def test_server_alive_checks_the_data_directory(tmp_path, fake_server):
+    process, data_dir = fake_server
+    assert broker.server_alive({'server_pid': process.pid, 'base_dir': data_dir})
+    if broker.process_cmdline(process.pid) is not None:
+        assert not broker.server_alive({'server_pid': process.pid, 'base_dir': str(tmp_path / 'other')})
+    assert not broker.server_alive({'server_pid': dead_pid(), 'base_dir': data_dir})
+
+
+def test_last_detach_stops_the_server(tmp_path, fake_server, monkeypatch):
+    process, data_dir = fake_server
+    registry = register(tmp_path, process, data_dir)
+    monkeypatch.setattr(broker.SharedServer, '_spawn_watchdog', lambda self: None)
+    first = broker.SharedServer('shared', tmp_path / 'registry', heartbeat_interval=0.05, lease_timeout=5).attach()
+    second = broker.SharedServer('shared', tmp_path / 'registry', heartbeat_interval=0.05, lease_timeout=5).attach()
+    assert not first.started and first.port == 3399 and first.server_pid == process.pid
+    assert len(registry.read()['leases']) == 2
+    time.sleep(0.2)
+    assert not first.detach()
+    assert process.poll() is None
+    assert second.detach()
+    assert process.wait(10) is not None
+    assert registry.read() is None
+
+
+def test_watchdog_stops_the_server_of_crashed_clients(tmp_path, fake_server):
+    process, data_dir = fake_server
+    registry = register(tmp_path, process, data_dir, {'crashed': {'pid': dead_pid(), 'heartbeat': time.time()}})
+    broker.watch('shared', registry.registry_dir, interval=0.05)
+    assert process.wait(10) is not None
+    assert registry.read() is None
+
+
+def test_stale_record_is_replaced(tmp_path, monkeypatch):
+    registry = broker.Registry('shared', tmp_path / 'registry')
+    registry.registry_dir.mkdir(parents=True)
+    registry.write({'name': 'shared', 'server_pid': dead_pid(), 'base_dir': str(tmp_path), 'leases': {}})
+    started = []
+
+    def start(self, timeout):
+        started.append(timeout)
+        return {'name': 'shared', 'port': 3400, 'socket_path': None, 'base_dir': str(tmp_path),
+                'server_pid': os.getpid(), 'owner_pid': os.getpid(), 'started': time.time(),
+                'watchdog_pid': None, 'leases': {}}
+
+    monkeypatch.setattr(broker.SharedServer, '_start', start)
+    monkeypatch.setattr(broker.SharedServer, '_spawn_watchdog', lambda self: None)
+    monkeypatch.setattr(broker, 'server_alive', lambda record: record['server_pid'] == os.getpid())
+    shared = broker.SharedServer('shared', tmp_path / 'registry').attach()
+    assert started and shared.started and shared.port == 3400
+    shared._stop_heartbeat.set()
+
+
+def test_record_matches_the_server_command_line(tmp_path, monkeypatch):
+    from MariaDB4p import mariadb_wrapper, native
+
+    class FakeWrapper:
+        def __init__(self, detached, port, base_dir, **options):
+            self.port, self.base_dir, self.socket_path = port, base_dir, None
+            self.db = None
+
+        def start_server(self, timeout):
+            self.db = native.NativeServer(None, self.base_dir, self.port)
+
+        def stop_server(self):
+            pass
+
+    monkeypatch.setattr(native, 'NativeMariaDBWrapper', FakeWrapper)
+    monkeypatch.setattr(mariadb_wrapper, 'find_free_port', lambda: 3401)
+    (tmp_path / 'real').mkdir()
+    (tmp_path / 'link').symlink_to(tmp_path / 'real')
+    record = broker.SharedServer('shared', tmp_path / 'registry', base_dir=str(tmp_path / 'link'))._start(1)
+    # the symlink is kept, as in the --datadir argument
+    assert record['base_dir'] == str(tmp_path / 'link') and record['port'] == 3401
+    record = broker.SharedServer('shared', tmp_path / 'registry')._start(1)
+    assert record['base_dir'] == str(tmp_path / 'registry' / 'shared' / 'data')
+    with pytest.raises(ValueError):
+        broker.SharedServer('shared', tmp_path / 'registry', base_dir=None)
@@ -0,0 +1,176 @@
+import io
+import os
+import re
+import math
+import time
+import threading
+import pymysql.converters
+import pytest
+
+from MariaDB4p.bulk_load import bulk_load, format_value, quote_identifier, write_rows
+
+
+def test_load_data_encoding():
+    buffer = io.StringIO()
+    assert write_rows([(1, 'a\tb\nc\\d', None), (True, b'x', math.nan)], buffer) == 2
+    assert buffer.getvalue() == '1\ta\\tb\\nc\\\\d\t\\N\n1\tx\t\\N\n'
+    assert format_value(2.5) == '2.5'
+    assert quote_identifier('db.we`ird') == '`db`.`we``ird`'
+
+
+def _unescape(literal):
+    return re.sub(r"\\(.)", lambda m: {'n': '\n', 'r': '\r', 't': '\t', '0': '\0'}.get(m[1], m[1]), literal)
+
+
+_LITERAL = r"'((?:[^'\\]|\\.)*)'"
+
+
+class FakeCursor:
+    """
+    Reads LOAD DATA files the way the server does for the unquoted fields used here.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.connection.executed.append(sql)
+        if sql.startswith('SELECT @@GLOBAL.local_infile'):
+            return
+        path = _unescape(re.search('INFILE ' + _LITERAL, sql)[1])
+        fields = _unescape(re.search('FIELDS TERMINATED BY ' + _LITERAL, sql)[1])
+        lines = _unescape(re.search('LINES TERMINATED BY ' + _LITERAL, sql)[1])
+        skip = re.search(r'IGNORE (\d+) LINES', sql)
+        escaped = "ESCAPED BY ''" not in sql
+        with open(path, encoding='utf-8', newline='') as f:
+            records = f.read().split(lines)[:-1][int(skip[1]) if skip else 0:]
+        for record in records:
+            values = record.split(fields)
+            if escaped:
+                values = [None if value == '\\N' else _unescape(value) for value in values]
+            self.connection.rows.append(tuple(values))
+        self.rowcount = len(records)
+
+    def executemany(self, sql, rows):
+        self.connection.rows.extend(tuple(row) for row in rows)
+
+    def fetchone(self):
+        return (1,)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.executed = []
+        self.rows = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def escape(self, value):
+        return pymysql.converters.escape_item(value, 'utf8mb4')
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeWrapper:
+    def __init__(self):
+        self.connections = []
+
+    def _connect(self, **kwargs):
+        self.connections.append(FakeConnection())
+        return self.connections[-1]
+
+
+def test_csv_methods_load_the_same_rows(tmp_path):
+    path = tmp_path / "o'brien.csv"
+    path.write_bytes(b'a,b,c\r\n1,,x\r\n2,y,\r\n')
+    loaded = {}
+    for method in ('infile', 'batch'):
+        wrapper = FakeWrapper()
+        report = bulk_load(wrapper, 't', path, method=method)
+        assert report['rows'] == 2
+        loaded[method] = wrapper.connections[0].rows
+    assert loaded['infile'] == loaded['batch'] == [('1', '', 'x'), ('2', 'y', '')]
+
+
+def test_infile_quotes_the_path(tmp_path):
+    path = tmp_path / "it's.csv"
+    path.write_text('a\n1\n')
+    wrapper = FakeWrapper()
+    bulk_load(wrapper, 't', path, method='infile')
+    assert "INFILE " + pymysql.converters.escape_item(str(path.resolve()), 'utf8mb4') in wrapper.connections[0].executed[0]
+
+
+def test_streamed_rows_match_batches():
+    rows = [(1, 'tab\there', None), (2, 'line\nbreak', 'back\\slash')]
+    loaded = {}
+    for method in ('infile', 'batch'):
+        wrapper = FakeWrapper()
+        bulk_load(wrapper, 't', iter(rows), columns=['a', 'b', 'c'], method=method)
+        loaded[method] = [tuple(None if value is None else str(value) for value in row)
+                          for row in wrapper.connections[0].rows]
+    assert loaded['infile'] == loaded['batch']
+
+
+class StreamCursor:
+    def __init__(self, fail):
+        self.fail = fail
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        if self.fail:
+            raise RuntimeError('LOAD DATA failed before reading the file')
+        path = _unescape(re.search('INFILE ' + _LITERAL, sql)[1])
+        with open(path, encoding='utf-8') as f:
+            self.rowcount = len(f.read().splitlines())
+
+
+def run_with_timeout(function, timeout=10):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(function()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), 'the load hung'
+    return result
+
+
+@pytest.mark.skipif(not hasattr(os, 'mkfifo'), reason='no FIFOs')
+def test_stream_load_does_not_hang(monkeypatch):
+    import builtins
+    from MariaDB4p import bulk_load as module
+    connection = FakeConnection()
+
+    class SlowClose:
+        # the writer closes its end of the FIFO but is still alive when LOAD DATA returns
+        def __init__(self, f):
+            self.f = f
+
+        def __enter__(self):
+            return self.f
+
+        def __exit__(self, *exc_info):
+            self.f.close()
+            time.sleep(0.3)
+
+    def slow_open(path, mode='r', **kwargs):
+        f = builtins.open(path, mode, **kwargs)
+        return SlowClose(f) if mode == 'w' else f
+
+    monkeypatch.setattr(module, 'open', slow_open, raising=False)
+    assert run_with_timeout(lambda: module._load_stream(connection, StreamCursor(False), 't', [(1,), (2,)], None)) == [2]
+
+    def failing():
+        with pytest.raises(RuntimeError):
+            module._load_stream(connection, StreamCursor(True), 't', [(1,), (2,)], None)
+    run_with_timeout(failing)
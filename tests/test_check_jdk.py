@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from MariaDB4p import check_jdk
+
+
+@pytest.fixture
+def fake_jdk(tmp_path, monkeypatch):
+    monkeypatch.setattr(check_jdk, 'JDK_PROBE_CACHE', tmp_path / 'jdk_probe.json')
+    monkeypatch.setattr(check_jdk, '_probes', {})
+    java_home = tmp_path / 'jdk-21'
+    java = java_home / 'bin' / 'java'
+    java.parent.mkdir(parents=True)
+    calls = tmp_path / 'calls'
+    java.write_text(f'#!/bin/sh\necho run >> {calls}\necho \'openjdk version "21.0.2" 2024-01-16\' >&2\n')
+    java.chmod(0o755)
+    return java_home, calls
+
+
+def test_parse_java_version():
+    assert check_jdk.parse_java_version('"17.0.8"') == 17
+    assert check_jdk.parse_java_version('1.8.0_392') == 8
+    assert check_jdk.parse_java_version('21') == 21
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='uses a shell script as java')
+def test_probe_reads_release_file(fake_jdk):
+    java_home, calls = fake_jdk
+    (java_home / 'release').write_text('IMPLEMENTOR="Eclipse Adoptium"\nJAVA_VERSION="21.0.2"\n')
+    probe = check_jdk.probe_jdk(java_home / 'bin' / 'java')
+    assert probe['version'] == 21
+    assert Path(probe['java_home']) == java_home.resolve()
+    assert not calls.exists()
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='uses a shell script as java')
+def test_probe_is_cached_across_processes(fake_jdk, monkeypatch):
+    java_home, calls = fake_jdk
+    assert check_jdk.probe_jdk(java_home / 'bin' / 'java')['version'] == 21
+    # a new process only has the cache file
+    monkeypatch.setattr(check_jdk, '_probes', {})
+    assert check_jdk.probe_jdk(java_home / 'bin' / 'java')['version'] == 21
+    assert calls.read_text().count('run') == 1
+
+    monkeypatch.setenv('PATH', '')
+    monkeypatch.setenv('JAVA_HOME', str(java_home))
+    # keep path.config out of the package directory
+    monkeypatch.setattr(check_jdk, '__file__', str(java_home.parent / 'check_jdk.py'))
+    assert check_jdk.is_jdk_installed(21) == str(java_home / 'bin' / 'java')
+    assert check_jdk.is_jdk_installed(17) is None
+    assert calls.read_text().count('run') == 1
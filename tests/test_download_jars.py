@@ -0,0 +1,207 @@
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from MariaDB4p.download_jars import resolve_dependencies, download_maria4j_jars, load_classpath, read_lockfile
+
+POM_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+    <modelVersion>4.0.0</modelVersion>
+    <groupId>{group_id}</groupId>
+    <artifactId>{artifact_id}</artifactId>
+    <version>{version}</version>
+    <dependencies>{dependencies}
+    </dependencies>
+</project>'''
+
+DEPENDENCY_TEMPLATE = '''
+        <dependency>
+            <groupId>{0}</groupId>
+            <artifactId>{1}</artifactId>
+            <version>{2}</version>
+        </dependency>'''
+
+
+def publish(repo, group_id, artifact_id, version, dependencies=(), jar_content=b'jar'):
+    artifact_dir = Path(repo, *group_id.split('.'), artifact_id, version)
+    artifact_dir.mkdir(parents=True, exist_ok=True)
+    Path(artifact_dir, f'{artifact_id}-{version}.jar').write_bytes(jar_content)
+    Path(artifact_dir, f'{artifact_id}-{version}.pom').write_text(POM_TEMPLATE.format(
+        group_id=group_id, artifact_id=artifact_id, version=version,
+        dependencies=''.join(DEPENDENCY_TEMPLATE.format(*dep) for dep in dependencies)))
+
+
+@pytest.fixture
+def maven_mirror(tmp_path):
+    repo = tmp_path / 'repo'
+    publish(repo, 'org.example', 'app', '1.0', [('org.example', 'left', '1.0'), ('org.example', 'right', '1.0')])
+    publish(repo, 'org.example', 'left', '1.0', [('org.example', 'shared', '1.0')])
+    publish(repo, 'org.example', 'right', '1.0', [('org.example', 'shared', '2.0')])
+    publish(repo, 'org.example', 'shared', '1.0')
+    publish(repo, 'org.example', 'shared', '2.0')
+    return repo
+
+
+def test_resolve_dependencies_file_mirror(maven_mirror, tmp_path):
+    jars_dir = tmp_path / 'jars'
+    jars_dir.mkdir()
+    levels = resolve_dependencies([('org.example', 'app', '1.0')], dependencies_dir=jars_dir,
+                                  repository=maven_mirror.as_uri(), max_workers=4)
+    jars = sorted(p.name for p in jars_dir.glob('*.jar'))
+    # the nearest declaration wins, shared is only resolved once
+    assert jars == ['app-1.0.jar', 'left-1.0.jar', 'right-1.0.jar', 'shared-1.0.jar']
+    assert [level['artifacts'] for level in levels] == [1, 2, 1]
+    assert all(level['bytes'] > 0 for level in levels)
+
+    # a warm run fetches nothing
+    levels = resolve_dependencies([('org.example', 'app', '1.0')], dependencies_dir=jars_dir,
+                                  repository=maven_mirror.as_uri())
+    assert sum(level['bytes'] for level in levels) == 0
+
+
+def test_resolve_dependencies_http_mirror(maven_mirror, tmp_path):
+    class KeepAliveHandler(SimpleHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+    handler = partial(KeepAliveHandler, directory=str(maven_mirror))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        jars_dir = tmp_path / 'jars'
+        jars_dir.mkdir()
+        resolve_dependencies([('org.example', 'app', '1.0'), ('org.example', 'missing', '1.0')],
+                             dependencies_dir=jars_dir, repository=f'http://127.0.0.1:{server.server_port}/',
+                             retries=1)
+        assert len(list(jars_dir.glob('*.jar'))) == 4
+        assert not list(jars_dir.glob('*.part'))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def write_root_pom(path, dependencies):
+    path.write_text(POM_TEMPLATE.format(group_id='com.example', artifact_id='root', version='1.0',
+                                        dependencies=''.join(DEPENDENCY_TEMPLATE.format(*dep) for dep in dependencies)))
+
+
+def test_lockfile_classpath(maven_mirror, tmp_path):
+    jars_dir = tmp_path / 'jars'
+    pom_file = tmp_path / 'pom.xml'
+    write_root_pom(pom_file, [('org.example', 'left', '1.0')])
+    assert download_maria4j_jars(pom_file=pom_file, dependencies_dir=jars_dir, repository=maven_mirror.as_uri())
+    lock = read_lockfile(jars_dir)
+    assert [entry['file'] for entry in lock['artifacts']] == ['left-1.0.jar', 'shared-1.0.jar']
+    assert all(len(entry['sha256']) == 64 and entry['size'] == 3 for entry in lock['artifacts'])
+
+    # stale versions lying around in the directory are not part of the classpath
+    (jars_dir / 'shared-0.9.jar').write_bytes(b'old')
+    assert load_classpath(jars_dir) == [str(jars_dir / 'left-1.0.jar'), str(jars_dir / 'shared-1.0.jar')]
+
+    # changing the pom re-resolves, reusing what is already downloaded
+    left_mtime = (jars_dir / 'left-1.0.jar').stat().st_mtime_ns
+    write_root_pom(pom_file, [('org.example', 'left', '1.0'), ('org.example', 'right', '1.0')])
+    assert download_maria4j_jars(pom_file=pom_file, dependencies_dir=jars_dir, repository=maven_mirror.as_uri())
+    assert (jars_dir / 'left-1.0.jar').stat().st_mtime_ns == left_mtime
+    assert [entry['file'] for entry in read_lockfile(jars_dir)['artifacts']] == ['left-1.0.jar', 'right-1.0.jar', 'shared-1.0.jar']
+
+
+def test_parent_and_bom_versions(maven_mirror, tmp_path, monkeypatch):
+    import MariaDB4p.download_jars as download_jars
+
+    def no_search(*args):
+        raise AssertionError('search.maven.org must not be queried')
+    monkeypatch.setattr(download_jars, 'get_latest_version_from_maven_central', no_search)
+
+    bom_dir = Path(maven_mirror, 'org', 'example', 'bom', '1.0')
+    bom_dir.mkdir(parents=True)
+    (bom_dir / 'bom-1.0.pom').write_text('''<project xmlns="http://maven.apache.org/POM/4.0.0">
+    <groupId>org.example</groupId><artifactId>bom</artifactId><version>1.0</version><packaging>pom</packaging>
+    <dependencyManagement><dependencies>
+        <dependency><groupId>org.example</groupId><artifactId>right</artifactId><version>1.0</version></dependency>
+        <dependency><groupId>org.example</groupId><artifactId>shared</artifactId><version>2.0</version></dependency>
+    </dependencies></dependencyManagement>
+</project>''')
+    parent_dir = Path(maven_mirror, 'org', 'example', 'parent', '3')
+    parent_dir.mkdir(parents=True)
+    (parent_dir / 'parent-3.pom').write_text('''<project xmlns="http://maven.apache.org/POM/4.0.0">
+    <groupId>org.example</groupId><artifactId>parent</artifactId><version>3</version><packaging>pom</packaging>
+    <properties><bom.version>1.0</bom.version><shared.version>1.0</shared.version></properties>
+    <dependencyManagement><dependencies>
+        <dependency><groupId>org.example</groupId><artifactId>shared</artifactId><version>${shared.version}</version></dependency>
+        <dependency><groupId>org.example</groupId><artifactId>bom</artifactId><version>${bom.version}</version>
+            <type>pom</type><scope>import</scope></dependency>
+    </dependencies></dependencyManagement>
+</project>''')
+    child_dir = Path(maven_mirror, 'org', 'example', 'child', '3')
+    child_dir.mkdir(parents=True)
+    (child_dir / 'child-3.jar').write_bytes(b'jar')
+    (child_dir / 'child-3.pom').write_text('''<project xmlns="http://maven.apache.org/POM/4.0.0">
+    <parent><groupId>org.example</groupId><artifactId>parent</artifactId><version>3</version></parent>
+    <artifactId>child</artifactId>
+    <dependencies>
+        <dependency><groupId>org.example</groupId><artifactId>right</artifactId></dependency>
+        <dependency><groupId>org.example</groupId><artifactId>shared</artifactId></dependency>
+        <dependency><groupId>org.example</groupId><artifactId>left</artifactId><version>1.0</version><scope>test</scope></dependency>
+    </dependencies>
+</project>''')
+
+    jars_dir = tmp_path / 'jars'
+    jars_dir.mkdir()
+    levels = resolve_dependencies([('org.example', 'child', '3')], dependencies_dir=jars_dir, repository=maven_mirror.as_uri())
+    resolved = [coordinates for level in levels for coordinates in level['resolved']]
+    # the parent's own entry wins over the one imported from the BOM
+    assert resolved == [('org.example', 'child', '3'), ('org.example', 'right', '1.0'), ('org.example', 'shared', '1.0')]
+
+
+def test_child_dependencies_override_inherited(maven_mirror, tmp_path):
+    parent_dir = Path(maven_mirror, 'org', 'example', 'base', '1')
+    parent_dir.mkdir(parents=True)
+    (parent_dir / 'base-1.pom').write_text('''<project xmlns="http://maven.apache.org/POM/4.0.0">
+    <groupId>org.example</groupId><artifactId>base</artifactId><version>1</version><packaging>pom</packaging>
+    <dependencyManagement><dependencies>
+        <dependency><groupId>org.example</groupId><artifactId>right</artifactId><version>1.0</version></dependency>
+    </dependencies></dependencyManagement>
+    <dependencies>
+        <dependency><groupId>org.example</groupId><artifactId>left</artifactId><version>1.0</version></dependency>
+        <dependency><groupId>org.example</groupId><artifactId>right</artifactId></dependency>
+    </dependencies>
+</project>''')
+    child_dir = Path(maven_mirror, 'org', 'example', 'derived', '1')
+    child_dir.mkdir(parents=True)
+    (child_dir / 'derived-1.jar').write_bytes(b'jar')
+    (child_dir / 'derived-1.pom').write_text('''<project xmlns="http://maven.apache.org/POM/4.0.0">
+    <parent><groupId>org.example</groupId><artifactId>base</artifactId><version>1</version></parent>
+    <artifactId>derived</artifactId>
+    <dependencyManagement><dependencies>
+        <dependency><groupId>org.example</groupId><artifactId>right</artifactId><version>2.0</version></dependency>
+    </dependencies></dependencyManagement>
+    <dependencies>
+        <dependency><groupId>org.example</groupId><artifactId>left</artifactId><version>2.0</version></dependency>
+    </dependencies>
+</project>''')
+    for artifact_id in ('left', 'right'):
+        publish(maven_mirror, 'org.example', artifact_id, '2.0')
+
+    jars_dir = tmp_path / 'jars'
+    jars_dir.mkdir()
+    levels = resolve_dependencies([('org.example', 'derived', '1')], dependencies_dir=jars_dir, repository=maven_mirror.as_uri())
+    resolved = [coordinates for level in levels for coordinates in level['resolved']]
+    # the child's own declaration wins and its dependencyManagement applies to the inherited dependency
+    assert resolved == [('org.example', 'derived', '1'), ('org.example', 'left', '2.0'), ('org.example', 'right', '2.0')]
+
+
+def test_incomplete_resolution(maven_mirror, tmp_path):
+    jars_dir = tmp_path / 'jars'
+    pom_file = tmp_path / 'pom.xml'
+    write_root_pom(pom_file, [('org.example', 'left', '1.0'), ('org.example', 'missing', '1.0')])
+    assert not download_maria4j_jars(pom_file=pom_file, dependencies_dir=jars_dir, repository=maven_mirror.as_uri())
+    assert read_lockfile(jars_dir)['complete'] is False
+    # the start falls back to the JARs directory instead of a partial classpath
+    assert load_classpath(jars_dir) is None
@@ -0,0 +1,33 @@
+from MariaDB4p import jvm
+
+
+class FakeJPype:
+    def __init__(self):
+        self.started = False
+        self.starts = 0
+        self.shutdowns = 0
+
+    def isJVMStarted(self):
+        return self.started
+
+    def startJVM(self, classpath):
+        self.started = True
+        self.starts += 1
+
+    def shutdownJVM(self):
+        self.started = False
+        self.shutdowns += 1
+
+
+def test_jvm_is_reference_counted(monkeypatch):
+    fake = FakeJPype()
+    monkeypatch.setattr(jvm, 'jpype', fake)
+    monkeypatch.setattr(jvm, '_refcount', 0)
+    assert jvm.acquire_jvm(['a.jar'])
+    assert not jvm.acquire_jvm(['a.jar'])
+    jvm.release_jvm()
+    assert fake.shutdowns == 0 and jvm.jvm_refcount() == 1
+    jvm.release_jvm()
+    assert fake.shutdowns == 1 and fake.starts == 1
+    jvm.release_jvm()
+    assert jvm.jvm_refcount() == 0
@@ -1,9 +1,12 @@
 from pathlib import Path
 import time
 from MariaDB4p.download_jars import download_maria4j_jars, DEPENDENCIES_DIR
-from MariaDB4p.mariadb_wrapper import MariaDBWrapper
+from MariaDB4p.mariadb_wrapper import MariaDBWrapper, default_socket_path
 from loguru import logger
 import shutil
+import tempfile
+import sys
+import pytest
 def test_download_maria4j_jars():
     # Test case 1: Downloading the Maria4j JAR files
     assert download_maria4j_jars()
@@ -14,11 +17,33 @@ def test_download_maria4j_jars():
 def test_start_server():
     # Test case 2: Starting the MariaDB server
     wrapper = MariaDBWrapper(jdk_install_dir='.jdk')
-    wrapper.start_server()
-    time.sleep(5)
+    # start_server returns once the server answers a ping
+    wrapper.start_server(timeout=120)
     assert (wrapper.db is not None)
     wrapper.db.createDB('test_db')
     logger.info("MariaDB server is running")    
     wrapper.stop_server()
-    time.sleep(5)    
-    shutil.rmtree(wrapper.base_dir)
\ No newline at end of file
+    shutil.rmtree(wrapper.base_dir)
+
+def test_start_server_from_template(tmp_path, monkeypatch):
+    # Test case 3: A clone keeps the fixtures applied to the template
+    from MariaDB4p import templates
+    monkeypatch.setattr(templates, 'TEMPLATES_DIR', tmp_path / 'templates')
+    fixture = "CREATE DATABASE seeded; CREATE TABLE seeded.items (id INT PRIMARY KEY); INSERT INTO seeded.items VALUES (1), (2)"
+    for _ in range(2):
+        # the first wrapper builds the template, the second one only clones it
+        wrapper = MariaDBWrapper(jdk_install_dir='.jdk', fixtures=[fixture])
+        assert not Path(wrapper.base_dir).resolve().is_relative_to(Path(tempfile.gettempdir()).resolve())
+        wrapper.start_server(timeout=120)
+        try:
+            assert wrapper.execute('SELECT COUNT(*) FROM items', db_name='seeded') == ((2,),)
+        finally:
+            wrapper.stop_server()
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='no Unix sockets')
+def test_default_socket_path(tmp_path):
+    path = default_socket_path(tmp_path / ('x' * 200), 3306)
+    assert path == default_socket_path(tmp_path / ('x' * 200), 3306)
+    assert path != default_socket_path(tmp_path / ('x' * 200), 3307)
+    # well below the 104/108 byte sun_path limit
+    assert len(path) < 100
@@ -0,0 +1,107 @@
+import urllib.request
+
+import pytest
+
+from MariaDB4p import metrics
+
+
+def test_fingerprint():
+    assert metrics.fingerprint("SELECT * FROM t1 WHERE id = 42 AND name = 'bob' /* x */") == \
+        "SELECT * FROM t1 WHERE id = ? AND name = ?"
+    assert metrics.fingerprint("INSERT INTO t VALUES (1, 2,\n 3)") == metrics.fingerprint("INSERT INTO t VALUES (%s, %s, %s)")
+    assert metrics.fingerprint("SELECT 1 FROM t WHERE a IN (1, 2, 3)") == "SELECT ? FROM t WHERE a IN (...)"
+
+
+def test_histogram_and_query_metrics():
+    query_metrics = metrics.QueryMetrics(max_fingerprints=2)
+    for i in range(100):
+        query_metrics.observe(f"SELECT * FROM t WHERE id = {i}", 0.001 * (i + 1))
+    query_metrics.observe("SELECT * FROM t WHERE id = 1", 0.5, error=True)
+    query_metrics.observe("SELECT 2 FROM u", 0.001)
+    query_metrics.observe("DELETE FROM v", 0.001)
+    snapshot = query_metrics.snapshot()
+    stats = snapshot["SELECT * FROM t WHERE id = ?"]
+    assert stats['count'] == 101 and stats['errors'] == 1
+    assert 0.025 <= stats['p50'] <= 0.1
+    assert snapshot[metrics.OTHER_FINGERPRINT]['count'] == 1
+
+
+def test_log_sampler():
+    assert not metrics.QueryLogSampler(0.0).should_log()
+    assert metrics.QueryLogSampler(1.0).should_log()
+    with pytest.raises(ValueError):
+        metrics.QueryLogSampler(2)
+
+
+class FakeCursor:
+    def __init__(self):
+        self.rows = []
+
+    def execute(self, sql):
+        if 'GLOBAL STATUS' in sql:
+            self.rows = [('Questions', '10'), ('Uptime', '5'), ('Innodb_buffer_pool_load_status', 'Loaded')]
+        else:
+            self.rows = [('buffer_pool_reads', 7)]
+
+    def fetchall(self):
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FakeConnection:
+    def cursor(self):
+        return FakeCursor()
+
+    def close(self):
+        pass
+
+
+def test_sampler_and_endpoint():
+    sampler = metrics.StatusSampler(FakeConnection, capacity=2)
+    for _ in range(3):
+        sampler.sample()
+    assert len(sampler.samples()) == 2
+    assert sampler.latest()[1] == {'Questions': 10.0, 'Uptime': 5.0, 'innodb_metric.buffer_pool_reads': 7.0}
+
+    query_metrics = metrics.QueryMetrics()
+    query_metrics.observe('SELECT "a"', 0.002)
+    render = lambda openmetrics=False: metrics.render_prometheus(query_metrics, sampler.latest(),
+                                                                 {'root@app': {'hits': 3}}, openmetrics=openmetrics)
+    server = metrics.MetricsServer(render)
+    try:
+        text = urllib.request.urlopen(server.url, timeout=5).read().decode()
+        request = urllib.request.Request(server.url, headers={'Accept': 'application/openmetrics-text'})
+        openmetrics_text = urllib.request.urlopen(request, timeout=5).read().decode()
+    finally:
+        server.stop()
+    assert 'mariadb4p_query_duration_seconds_bucket{fingerprint="SELECT ?",le="0.0025"} 1' in text
+    assert 'mariadb4p_query_duration_seconds_count{fingerprint="SELECT ?"} 1' in text
+    assert 'mariadb4p_pool_hits_total{pool="root@app"} 3' in text
+    assert 'mariadb_status_questions_total 10.0' in text
+    assert openmetrics_text.endswith('# EOF\n')
+
+
+def test_every_metric_has_help_and_type():
+    text = metrics.render_prometheus(status=(0, {'Questions': 10.0, 'Com_select': 4.0, 'Threads_connected': 2.0}),
+                                     pools={'root@app': {'hits': 3, 'size': 2}, 'root@other': {'hits': 1, 'size': 1}},
+                                     statement_cache={'hits': 5}, routing={'writes': 2})
+    types = dict(line.split()[2:4] for line in text.splitlines() if line.startswith('# TYPE'))
+    helps = {line.split()[2] for line in text.splitlines() if line.startswith('# HELP')}
+    assert set(types) == helps
+    assert types['mariadb_status_questions_total'] == types['mariadb_status_com_select_total'] == 'counter'
+    assert types['mariadb_status_threads_connected'] == 'gauge'
+    assert types['mariadb4p_pool_hits_total'] == 'counter' and types['mariadb4p_pool_size'] == 'gauge'
+    assert types['mariadb4p_statement_cache_hits_total'] == types['mariadb4p_routing_writes_total'] == 'counter'
+    # the samples of a family follow its TYPE line
+    lines = text.splitlines()
+    start = lines.index('# TYPE mariadb4p_pool_hits_total counter')
+    assert lines[start + 1:start + 3] == ['mariadb4p_pool_hits_total{pool="root@app"} 3',
+                                          'mariadb4p_pool_hits_total{pool="root@other"} 1']
+    openmetrics_text = metrics.render_prometheus(statement_cache={'hits': 5}, openmetrics=True)
+    assert '# TYPE mariadb4p_statement_cache_hits counter' in openmetrics_text
+    assert 'mariadb4p_statement_cache_hits_total 5' in openmetrics_text
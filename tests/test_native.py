@@ -0,0 +1,57 @@
+import os
+import stat
+import sys
+import zipfile
+
+import pytest
+
+from MariaDB4p import native
+
+
+def make_jar(path, platform_dir):
+    with zipfile.ZipFile(path, 'w') as jar:
+        jar.writestr('META-INF/MANIFEST.MF', 'Manifest-Version: 1.0\n')
+        base = f'ch/vorburger/mariadb4j/mariadb-11.4.3/{platform_dir}/'
+        server = zipfile.ZipInfo(base + 'bin/mariadbd')
+        server.external_attr = 0o755 << 16
+        jar.writestr(server, '#!/bin/sh\n')
+        jar.writestr(base + 'scripts/mariadb-install-db', '#!/bin/sh\n')
+        jar.writestr(base + 'share/english/errmsg.sys', 'errmsg')
+        jar.writestr('ch/vorburger/mariadb4j/mariadb-11.4.3/other/bin/mariadbd', '')
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='fake JAR holds linux binaries')
+def test_extract_binaries_once(tmp_path):
+    jars_dir = tmp_path / 'jars'
+    jars_dir.mkdir()
+    make_jar(jars_dir / 'mariaDB4j-db-mariadb-11.4-3.1.0.jar', 'linux')
+    binaries = native.extract_binaries(jars_dir, tmp_path / 'native')
+    assert binaries.server == binaries.base_dir / 'bin' / 'mariadbd'
+    assert binaries.install_db == binaries.base_dir / 'scripts' / 'mariadb-install-db'
+    assert (binaries.base_dir / 'share' / 'english' / 'errmsg.sys').read_text() == 'errmsg'
+    assert os.stat(binaries.server).st_mode & stat.S_IXUSR
+    assert os.stat(binaries.install_db).st_mode & stat.S_IXUSR
+    # a second call reuses the cache
+    (binaries.base_dir / 'marker').write_text('kept')
+    again = native.extract_binaries(jars_dir, tmp_path / 'native')
+    assert again.base_dir == binaries.base_dir and (again.base_dir / 'marker').exists()
+
+
+def test_find_server_base_needs_this_platform(tmp_path):
+    assert native.find_server_base(['x/unknown/bin/mariadbd', 'x/bin/mysqld.txt']) is None
+    jars_dir = tmp_path / 'jars'
+    jars_dir.mkdir()
+    with pytest.raises(FileNotFoundError):
+        native.extract_binaries(jars_dir, tmp_path / 'native')
+
+
+def test_server_command(tmp_path):
+    (tmp_path / 'bin').mkdir()
+    (tmp_path / 'bin' / 'mariadbd').write_text('')
+    server = native.NativeServer(native.NativeBinaries(tmp_path), tmp_path / 'data', 3307, '/tmp/s.sock',
+                                 ['--skip-networking'])
+    command = server.command()
+    assert command[:2] == [str(tmp_path / 'bin' / 'mariadbd'), '--no-defaults']
+    assert '--port=3307' in command and '--socket=/tmp/s.sock' in command
+    assert command[-1] == '--skip-networking'
+    assert not server.isRunning()
@@ -0,0 +1,182 @@
+import threading
+import time
+
+import pytest
+
+from pymysql.constants import SERVER_STATUS
+
+from MariaDB4p.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+        self.committed = 0
+        self.rolled_back = 0
+
+    def ping(self, reconnect=True):
+        if not self.healthy:
+            raise ConnectionError('gone')
+
+    def begin(self):
+        pass
+
+    def commit(self):
+        self.committed += 1
+
+    def rollback(self):
+        self.rolled_back += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_pool_reuses_and_counts():
+    pool = ConnectionPool(FakeConnection, max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert (pool.stats.misses, pool.stats.hits, pool.size) == (1, 1, 1)
+
+    rolled_back = first.rolled_back
+    with pytest.raises(ValueError):
+        with pool.transaction() as connection:
+            raise ValueError('fail')
+    assert connection.rolled_back == rolled_back + 1 and connection.committed == 0
+    with pool.transaction() as connection:
+        pass
+    assert connection.committed == 1
+
+
+def test_pool_waits_at_max_size():
+    pool = ConnectionPool(FakeConnection, max_size=1, acquire_timeout=0.05)
+    connection = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    threading.Timer(0.05, pool.release, [connection]).start()
+    assert pool.acquire(timeout=5) is connection
+    assert pool.stats.waits == 2 and pool.stats.timeouts == 1
+
+
+def test_pool_health_check_and_eviction():
+    pool = ConnectionPool(FakeConnection, min_size=1, max_size=3, idle_timeout=0.01, health_check_after=0)
+    pool.prefill()
+    connections = [pool.acquire() for _ in range(3)]
+    connections[2].healthy = False
+    for connection in connections:
+        pool.release(connection)
+    # the broken connection is the most recently used one, it is dropped on checkout
+    assert pool.acquire() is connections[1]
+    assert pool.stats.failed_health_checks == 1 and connections[2].closed
+    time.sleep(0.02)
+    pool.release(connections[1])
+    pool.acquire()
+    assert pool.size == 1 and pool.stats.evicted == 1
+    pool.close()
+
+
+class FakeServer:
+    """
+    One committed value, read through REPEATABLE READ snapshots taken at the first read of a transaction.
+    """
+
+    def __init__(self):
+        self.value = 0
+
+
+class SnapshotConnection(FakeConnection):
+    def __init__(self, server):
+        super().__init__()
+        self.server = server
+        self.snapshot = None
+
+    def read(self):
+        if self.snapshot is None:
+            self.snapshot = self.server.value
+        return self.snapshot
+
+    def write_and_commit(self, value):
+        self.server.value = value
+        self.commit()
+
+    def commit(self):
+        super().commit()
+        self.snapshot = None
+
+    def rollback(self):
+        super().rollback()
+        self.snapshot = None
+
+
+def test_released_connection_does_not_keep_its_read_view():
+    server = FakeServer()
+    pool = ConnectionPool(lambda: SnapshotConnection(server), max_size=1)
+    with pool.connection() as connection:
+        assert connection.read() == 0
+    SnapshotConnection(server).write_and_commit(1)
+    with pool.connection() as again:
+        assert again is connection
+        assert again.read() == 1
+
+
+def test_connection_with_failed_rollback_is_discarded():
+    pool = ConnectionPool(FakeConnection, max_size=1)
+    connection = pool.acquire()
+
+    def broken():
+        raise ConnectionError('gone')
+    connection.rollback = broken
+    pool.release(connection)
+    assert connection.closed and pool.size == 0 and pool.idle == 0
+
+
+class Result:
+    def __init__(self, server_status):
+        self.server_status = server_status
+
+
+class StatusConnection(FakeConnection):
+    """
+    Tracks the server status like pymysql: OK packets update it, result sets leave a result without status.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.server_status = SERVER_STATUS.SERVER_STATUS_AUTOCOMMIT
+        self._result = None
+
+    def query(self, sql):
+        if sql.startswith('SELECT'):
+            self._result = Result(None)
+        else:
+            self.server_status |= SERVER_STATUS.SERVER_STATUS_IN_TRANS
+            self._result = Result(self.server_status)
+
+    def commit(self):
+        super().commit()
+        self._result = None
+        self.server_status &= ~SERVER_STATUS.SERVER_STATUS_IN_TRANS
+
+    def rollback(self):
+        super().rollback()
+        self._result = None
+        self.server_status &= ~SERVER_STATUS.SERVER_STATUS_IN_TRANS
+
+
+def test_release_rolls_back_only_open_transactions():
+    pool = ConnectionPool(StatusConnection, max_size=1)
+    # committed work needs no ROLLBACK round trip
+    with pool.connection() as connection:
+        connection.query('SELECT 1')
+        connection.commit()
+    assert connection.rolled_back == 0
+    # uncommitted writes are rolled back
+    with pool.connection() as connection:
+        connection.query('INSERT INTO t VALUES (1)')
+    assert connection.rolled_back == 1
+    # after rows the status is stale, the SELECT may have opened a read view
+    with pool.connection() as connection:
+        connection.query('SELECT 1')
+    assert connection.rolled_back == 2
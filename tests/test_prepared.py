@@ -0,0 +1,61 @@
+import pymysql
+
+from MariaDB4p import prepared
+
+
+def test_to_qmark():
+    assert prepared.to_qmark("SELECT * FROM t WHERE a = %s AND c = %s AND d LIKE '5%%'") == \
+        "SELECT * FROM t WHERE a = ? AND c = ? AND d LIKE '5%'"
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql, params=None):
+        if sql in self.connection.fail:
+            raise pymysql.err.OperationalError(self.connection.fail.pop(sql), 'failed')
+        self.connection.executed.append(sql)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.server_thread_id = (1,)
+        self.executed = []
+        self.fail = {}
+
+    def escape(self, value):
+        return pymysql.converters.escape_item(value, 'utf8mb4')
+
+
+def test_lru_cache_prepares_once_and_evicts():
+    connection = FakeConnection()
+    cache = prepared.StatementCache(connection, max_size=2)
+    cursor = FakeCursor(connection)
+    for _ in range(3):
+        cache.execute(cursor, "SELECT * FROM t WHERE id = %s", (1,))
+    cache.execute(cursor, "SELECT 2")
+    cache.execute(cursor, "SELECT %s", ("it's",))
+    assert connection.executed[:4] == ["PREPARE mariadb4p_s1 FROM 'SELECT * FROM t WHERE id = ?'",
+                                       "EXECUTE mariadb4p_s1 USING 1", "EXECUTE mariadb4p_s1 USING 1",
+                                       "EXECUTE mariadb4p_s1 USING 1"]
+    assert "DEALLOCATE PREPARE mariadb4p_s1" in connection.executed
+    assert connection.executed[-1] == "EXECUTE mariadb4p_s3 USING 'it\\'s'"
+    assert cache.stats.to_dict()['hits'] == 2
+    assert cache.stats.misses == 3 and cache.stats.evictions == 1 and len(cache) == 2
+
+
+def test_cache_invalidated_by_reconnect_and_ddl():
+    connection = FakeConnection()
+    cache = prepared.StatementCache(connection)
+    cursor = FakeCursor(connection)
+    cache.execute(cursor, "SELECT 1")
+    connection.server_thread_id = (2,)
+    cache.execute(cursor, "SELECT 1")
+    assert cache.stats.invalidations == 1 and cache.stats.misses == 2
+    cache.execute(cursor, "ALTER TABLE t ADD COLUMN c INT")
+    assert len(cache) == 0
+    cache.execute(cursor, "SELECT 1")
+    connection.fail["EXECUTE mariadb4p_s3"] = 1243
+    cache.execute(cursor, "SELECT 1")
+    assert cache.stats.reprepares == 1 and connection.executed[-1] == "EXECUTE mariadb4p_s4"
@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+from MariaDB4p.profiling import StartupProfile
+
+
+def test_startup_profile_phases_and_hooks(tmp_path):
+    events = []
+    profile = StartupProfile(hooks=[events.append])
+    with profile.phase('jvm_start', jars=3):
+        pass
+    with pytest.raises(RuntimeError):
+        with profile.phase('db_start'):
+            raise RuntimeError('boom')
+
+    assert [record['phase'] for record in profile.phases] == ['jvm_start', 'db_start']
+    assert profile.phases[1]['error'] == 'RuntimeError: boom'
+    assert [(event['event'], event['phase']) for event in events] == [
+        ('phase_start', 'jvm_start'), ('phase_end', 'jvm_start'), ('phase_start', 'db_start'), ('phase_end', 'db_start')]
+    assert events[1]['jars'] == 3
+    assert set(profile.durations()) == {'jvm_start', 'db_start'}
+
+    exported = json.loads(profile.to_json(tmp_path / 'startup.json'))
+    assert exported == json.loads((tmp_path / 'startup.json').read_text())
+    assert exported['phases'][0]['phase'] == 'jvm_start'
+    assert 'python' in exported['environment']
+    assert 'total' in profile.report()
@@ -0,0 +1,75 @@
+import pytest
+
+from MariaDB4p import provisioning
+
+
+def test_statements_are_escaped():
+    statements = provisioning.provision_statements(
+        databases=['tenant`1', {'name': 'app', 'charset': 'utf8mb4'}],
+        users=[('bob', "pa'ss\\word")],
+        grants=[('ALL', 'tenant`1', 'bob'), {'privileges': ['SELECT', 'INSERT'], 'on': 'app.items', 'user': 'bob',
+                                             'host': 'localhost', 'grant_option': True}])
+    assert statements == [
+        "CREATE DATABASE IF NOT EXISTS `tenant``1`",
+        "CREATE DATABASE IF NOT EXISTS `app` CHARACTER SET utf8mb4",
+        "CREATE USER IF NOT EXISTS 'bob'@'%' IDENTIFIED BY 'pa\\'ss\\\\word'",
+        "ALTER USER 'bob'@'%' IDENTIFIED BY 'pa\\'ss\\\\word'",
+        "GRANT ALL PRIVILEGES ON `tenant``1`.* TO 'bob'@'%'",
+        "GRANT SELECT, INSERT ON `app`.`items` TO 'bob'@'localhost' WITH GRANT OPTION",
+    ]
+    with pytest.raises(ValueError):
+        provisioning.grant_statement(('SELECT; DROP DATABASE x', '*.*', 'bob'))
+
+
+class FakeCursor:
+    def __init__(self, executed):
+        self.executed = executed
+
+    def execute(self, sql):
+        self.executed.append(sql)
+
+    def nextset(self):
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.executed = []
+
+    def cursor(self):
+        return FakeCursor(self.executed)
+
+    def commit(self):
+        pass
+
+    def escape(self, value):
+        # as pymysql does with NO_BACKSLASH_ESCAPES in the sql_mode
+        return "'" + value.replace("'", "''") + "'"
+
+
+def test_provision_escapes_through_the_connection():
+    connection = FakeConnection()
+    provisioning.provision(connection, users=[('bob', "pa'ss\\word")], grants=[('SELECT', 'app', "o'neil")])
+    assert connection.executed == ["CREATE USER IF NOT EXISTS 'bob'@'%' IDENTIFIED BY 'pa''ss\\word';\n"
+                                   "ALTER USER 'bob'@'%' IDENTIFIED BY 'pa''ss\\word';\n"
+                                   "GRANT SELECT ON `app`.* TO 'o''neil'@'%'"]
+    # replacing users resets them in one statement, without an ALTER USER
+    assert provisioning.user_statements(('bob', 'x'), replace=True) == ["CREATE OR REPLACE USER 'bob'@'%' IDENTIFIED BY 'x'"]
+    assert provisioning.user_statements(('bob', None)) == ["CREATE USER IF NOT EXISTS 'bob'@'%'"]
+
+
+def test_provision_batches_round_trips():
+    connection = FakeConnection()
+    report = provisioning.provision(connection, databases=[f'tenant_{i}' for i in range(500)],
+                                    users=[(f'tenant_{i}', 'secret') for i in range(500)],
+                                    grants=[('ALL', f'tenant_{i}', f'tenant_{i}') for i in range(500)])
+    assert report['statements'] == 2000
+    assert report['round_trips'] == len(connection.executed) == 1
+    assert not any('FLUSH' in batch for batch in connection.executed)
+    assert len(list(provisioning.batches(['x' * 100] * 10, max_bytes=250))) == 5
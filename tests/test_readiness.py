@@ -0,0 +1,86 @@
+import asyncio
+import pymysql
+import pytest
+
+from MariaDB4p import async_wrapper, mariadb_wrapper
+from MariaDB4p.exceptions import ServerNotReadyError, ServerNotRunningError
+from MariaDB4p.mariadb_wrapper import MariaDBWrapper
+
+
+class FakeDB:
+    def __init__(self, running=True):
+        self.running = running
+
+    def isRunning(self):
+        return self.running
+
+    def stop(self):
+        self.running = False
+
+
+@pytest.fixture
+def unstarted_wrapper(monkeypatch, tmp_path):
+    # the normal constructor without a JDK, JARs or JVM, as NativeMariaDBWrapper skips them
+    monkeypatch.setattr(MariaDBWrapper, '_prepare_runtime', lambda self, jdk_version, jdk_install_dir: None)
+    monkeypatch.setattr(MariaDBWrapper, 'start_jvm', lambda self, jars_dir=None: None)
+    monkeypatch.setattr(mariadb_wrapper, 'download_maria4j_jars', lambda dependencies_dir=None: True)
+
+    def make(db, pings=None):
+        wrapper = MariaDBWrapper(port=3399, base_dir=str(tmp_path))
+        wrapper.db = db
+        if pings is not None:
+            wrapper.ping = lambda timeout=1: next(pings)
+        return wrapper
+    return make
+
+
+def test_wait_until_ready_polls_until_ping_succeeds(unstarted_wrapper):
+    wrapper = unstarted_wrapper(FakeDB(), iter([False, False, True]))
+    assert wrapper.wait_until_ready(timeout=5) < 1
+    assert 'readiness' in wrapper.startup_profile.durations()
+
+
+def test_wait_until_ready_raises(unstarted_wrapper):
+    with pytest.raises(ServerNotReadyError):
+        unstarted_wrapper(FakeDB(), iter(lambda: False, None)).wait_until_ready(timeout=0.1)
+    with pytest.raises(ServerNotReadyError, match='stopped'):
+        unstarted_wrapper(FakeDB(running=False), iter(lambda: False, None)).wait_until_ready(timeout=5)
+
+
+def test_ping_counts_access_denied_as_ready(unstarted_wrapper):
+    wrapper = unstarted_wrapper(FakeDB())
+
+    def refuse(code):
+        def open_connection(**kwargs):
+            raise pymysql.err.OperationalError(code, 'refused')
+        return open_connection
+    wrapper._open_connection = refuse(1045)
+    assert wrapper.ping()
+    wrapper._open_connection = refuse(2003)
+    assert not wrapper.ping()
+
+
+class FakeWrapper:
+    def __init__(self, **options):
+        self.options = options
+        self.db = None
+
+    def start_server(self, wait=True, timeout=60):
+        self.db = FakeDB()
+
+    def stop_server(self):
+        self.db = None
+
+
+def test_async_wrapper_starts_servers_concurrently(monkeypatch):
+    monkeypatch.setattr(async_wrapper, 'MariaDBWrapper', FakeWrapper)
+
+    async def scenario():
+        wrappers = [async_wrapper.AsyncMariaDBWrapper(port=3400 + i) for i in range(3)]
+        await asyncio.gather(*(wrapper.start() for wrapper in wrappers))
+        assert [w.wrapper.options['port'] for w in wrappers] == [3400, 3401, 3402]
+        await asyncio.gather(*(wrapper.stop() for wrapper in wrappers))
+        with pytest.raises(ServerNotRunningError):
+            await wrappers[0].execute('SELECT 1')
+
+    asyncio.run(scenario())
@@ -0,0 +1,109 @@
+import pytest
+
+from MariaDB4p import metrics, replication
+
+
+def test_is_read():
+    assert replication.is_read("SELECT * FROM t")
+    assert replication.is_read("/* report */ (SELECT 1) UNION (SELECT 2)")
+    assert replication.is_read("WITH c AS (SELECT 1) SELECT * FROM c")
+    assert replication.is_read("show tables")
+    assert not replication.is_read("SELECT * FROM t WHERE id = 1 FOR UPDATE")
+    assert not replication.is_read("SELECT * FROM t INTO OUTFILE '/tmp/t.csv'")
+    assert not replication.is_read("INSERT INTO t SELECT * FROM u")
+    assert not replication.is_read("-- select\nUPDATE t SET a = 1")
+
+
+def test_gtid_lag():
+    assert replication.parse_gtid_pos('0-1-42,1-2-7') == {0: 42, 1: 7}
+    assert replication.parse_gtid_pos('') == {}
+    assert replication.gtid_lag('0-1-42,1-2-7', '0-1-40') == 9
+    assert replication.gtid_lag('0-1-42', '0-1-42,1-2-3') == 0
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self.description = None
+
+    def execute(self, query, params=None):
+        self.server.log.append((query, params))
+        self.description = None
+        if query == "SELECT @@last_gtid":
+            self.rows, self.description = [(f'0-1-{self.server.sequence}',)], True
+        elif query.startswith("SELECT MASTER_GTID_WAIT"):
+            self.rows, self.description = [(0 if self.server.caught_up else -1,)], True
+        elif query.startswith("SELECT"):
+            self.rows, self.description = [(self.server.name,)], True
+        else:
+            self.server.sequence += 1
+            self.rowcount = 1
+
+    def fetchall(self):
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FakeServer:
+    def __init__(self, name, caught_up=True):
+        self.name = name
+        self.caught_up = caught_up
+        self.sequence = 0
+        self.log = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+
+def routing(read_your_writes=False, caught_up=True):
+    primary = FakeServer('primary')
+    replicas = [FakeServer('replica1', caught_up), FakeServer('replica2', caught_up)]
+    connection = replication.RoutingConnection(lambda: primary, [lambda r=r: r for r in replicas], read_your_writes)
+    return connection, primary, replicas
+
+
+def test_routing_spreads_reads_and_sends_writes_to_primary():
+    connection, primary, replicas = routing()
+    assert connection.execute("INSERT INTO t VALUES (%s)", (1,)) == 1
+    assert [connection.execute("SELECT a FROM t")[0][0] for _ in range(4)] == ['replica1', 'replica2'] * 2
+    connection.execute("BEGIN")
+    assert connection.execute("SELECT a FROM t")[0][0] == 'primary'
+    connection.execute("COMMIT")
+    assert connection.execute("SELECT a FROM t")[0][0] == 'replica1'
+    assert connection.stats.to_dict() == {'writes': 4, 'replica_reads': 5, 'primary_reads': 0, 'gtid_wait_timeouts': 0}
+
+
+def test_read_your_writes():
+    connection, primary, replicas = routing(read_your_writes=True)
+    connection.execute("UPDATE t SET a = 1")
+    assert connection.last_gtid == '0-1-1'
+    assert connection.execute("SELECT a FROM t")[0][0] == 'replica1'
+    assert ("SELECT MASTER_GTID_WAIT(%s, %s)", ('0-1-1', replication.DEFAULT_GTID_WAIT_TIMEOUT)) in replicas[0].log
+
+    lagging, primary, replicas = routing(read_your_writes=True, caught_up=False)
+    lagging.execute("DELETE FROM t")
+    assert lagging.execute("SELECT a FROM t")[0][0] == 'primary'
+    assert lagging.stats.gtid_wait_timeouts == 1 and lagging.stats.primary_reads == 1
+
+
+def test_topology_options_and_lag_metrics():
+    with pytest.raises(ValueError):
+        replication.ReplicationTopology(0)
+    with pytest.raises(ValueError):
+        replication.ReplicationTopology(2, skip_networking=True)
+    with pytest.raises(ValueError, match='use_template'):
+        replication.ReplicationTopology(2, use_template=False)
+    text = metrics.render_prometheus(replication={3307: {'seconds': 0, 'transactions': 3},
+                                                  3308: {'seconds': None, 'transactions': 0}},
+                                     routing={'writes': 2})
+    assert 'mariadb4p_replica_lag_seconds{replica="3308"} NaN' in text
+    assert 'mariadb4p_replica_lag_transactions{replica="3307"} 3' in text
+    assert 'mariadb4p_routing_writes_total 2' in text
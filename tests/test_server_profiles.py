@@ -0,0 +1,21 @@
+import pytest
+
+from MariaDB4p import server_profiles
+
+
+def test_ephemeral_profile_args(tmp_path):
+    assert server_profiles.profile_args('default') == []
+    args = server_profiles.profile_args('ephemeral', tmp_path, tmp_path / 'tmp')
+    assert '--innodb-flush-log-at-trx-commit=0' in args
+    assert '--innodb-doublewrite=0' in args
+    assert '--skip-log-bin' in args
+    assert f"--tmpdir={tmp_path / 'tmp'}" in args
+    with pytest.raises(ValueError):
+        server_profiles.profile_args('fast')
+
+
+def test_buffer_pool_size_is_bounded():
+    mib = 1024 * 1024
+    assert server_profiles.buffer_pool_size(memory=1024 * mib) == 128 * mib
+    assert server_profiles.buffer_pool_size(memory=64 * 1024 * mib) == server_profiles.MAX_BUFFER_POOL
+    assert server_profiles.buffer_pool_size(memory=10 * mib) == server_profiles.MIN_BUFFER_POOL
@@ -0,0 +1,81 @@
+from datetime import datetime
+
+from MariaDB4p import snapshots
+
+
+def state(create, update=None, rows_changed=0):
+    return {'create_time': datetime(2024, 1, 1, 0, 0, create), 'update_time': update, 'rows_changed': rows_changed}
+
+
+def test_changed_tables_from_userstat():
+    baseline = {'a': state(1, rows_changed=10), 'b': state(1, rows_changed=5), 'c': state(1), 'd': state(1)}
+    current = {'a': state(1, rows_changed=10), 'b': state(1, rows_changed=7), 'c': state(2), 'e': state(3)}
+    changes = snapshots.changed_tables(baseline, current, True, None)
+    assert changes == {'changed': ['b'], 'altered': ['c'], 'missing': ['d'], 'extra': ['e']}
+
+
+def test_changed_tables_from_update_time():
+    checkpoint = datetime(2024, 1, 1, 12, 0, 0)
+    before = datetime(2024, 1, 1, 11, 0, 0)
+    baseline = {'a': state(1, before), 'b': state(1, before), 'c': state(1)}
+    current = {'a': state(1, before), 'b': state(1, checkpoint), 'c': state(1)}
+    assert snapshots.changed_tables(baseline, current, False, checkpoint)['changed'] == ['b']
+
+
+def test_snapshot_schema_name():
+    name = snapshots.snapshot_schema_name('x' * 64, 'after fixtures')
+    assert len(name) <= 64 and name.startswith(snapshots.SNAPSHOT_SCHEMA_PREFIX)
+    assert name != snapshots.snapshot_schema_name('x' * 64, 'other')
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, params=None):
+        # like InnoDB with autocommit=0, any statement but SET opens a transaction
+        if not query.startswith('SET'):
+            self.connection.in_transaction = True
+        self.connection.queries.append(query)
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return (1,)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.in_transaction = False
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.in_transaction = False
+
+    def rollback(self):
+        self.in_transaction = False
+
+    def close(self):
+        pass
+
+
+def test_snapshot_and_restore_leave_the_pooled_connection_clean():
+    from MariaDB4p.pool import ConnectionPool
+    pool = ConnectionPool(FakeConnection)
+    with pool.connection() as connection:
+        snapshot = snapshots.take_snapshot(connection, 'app', 'fixtures', 'clone')
+        assert not connection.in_transaction
+        assert snapshot.checkpoint is not None
+        report = snapshots.restore_snapshot(connection, snapshot)
+        assert not connection.in_transaction
+    assert report['restored'] == [] and report['dropped'] == []
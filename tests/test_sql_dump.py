@@ -0,0 +1,171 @@
+import io
+import gzip
+
+from MariaDB4p import sql_dump
+
+DUMP = """-- MariaDB dump
+/*!40101 SET NAMES utf8mb4 */;
+DROP TABLE IF EXISTS `t`;
+CREATE TABLE `t` (a text); # trailing comment
+LOCK TABLES `t` WRITE;
+INSERT INTO `t` VALUES ('a;b', 'it''s', "x\\";y", 'multi
+line;');
+UNLOCK TABLES;
+/* block ; comment */
+DELIMITER ;;
+CREATE TRIGGER tr BEFORE INSERT ON t FOR EACH ROW BEGIN SET NEW.a = 'x'; END ;;
+DELIMITER ;
+SELECT 1"""
+
+
+def test_statements_are_split_incrementally(tmp_path):
+    path = tmp_path / 'dump.sql.gz'
+    with gzip.open(path, 'wt') as f:
+        f.write(DUMP)
+    stream, raw = sql_dump.open_dump(path)
+    with stream:
+        statements = list(sql_dump.iter_statements(stream))
+    assert statements == [
+        "/*!40101 SET NAMES utf8mb4 */",
+        "DROP TABLE IF EXISTS `t`",
+        "CREATE TABLE `t` (a text)",
+        "LOCK TABLES `t` WRITE",
+        "INSERT INTO `t` VALUES ('a;b', 'it''s', \"x\\\";y\", 'multi\nline;')",
+        "UNLOCK TABLES",
+        "CREATE TRIGGER tr BEFORE INSERT ON t FOR EACH ROW BEGIN SET NEW.a = 'x'; END",
+        "SELECT 1",
+    ]
+
+
+def test_classify():
+    assert sql_dump.classify("INSERT INTO `db`.`t``x` (a) VALUES (1)") == ('rows', ('db', 't`x'))
+    assert sql_dump.classify("INSERT INTO t SELECT * FROM u") == ('global', None)
+    assert sql_dump.classify("/*!40000 ALTER TABLE `t` DISABLE KEYS */") == ('table', (None, 't'))
+    assert sql_dump.classify("DROP TABLE a, b") == ('global', None)
+    assert sql_dump.classify("LOCK TABLES `t` WRITE") == ('skip', None)
+    assert sql_dump.classify("USE `app`") == ('use', 'app')
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql):
+        self.connection.executed.append(sql)
+
+    def nextset(self):
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, log):
+        self.executed = []
+        log.append(self)
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def autocommit(self, value):
+        pass
+
+    def select_db(self, name):
+        self.executed.append(f'USE {name}')
+
+    def begin(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_import_runs_rows_on_workers():
+    connections = []
+    dump = "SET time_zone = '+00:00';\nCREATE TABLE a (x int);\nCREATE TABLE b (x int);\n" + \
+           ''.join(f"INSERT INTO {table} VALUES ({i});\n" for i in range(50) for table in 'ab') + "CREATE VIEW v AS SELECT 1;\n"
+    progress = sql_dump.import_stream(lambda: FakeConnection(connections), io.StringIO(dump), parallel=2, batch_bytes=100)
+    main, workers = connections[0], connections[1:]
+    assert not any(sql.startswith('INSERT') for sql in main.executed)
+    inserts = [sql for worker in workers for batch in worker.executed for sql in batch.split(';\n') if sql.startswith('INSERT')]
+    assert len(inserts) == 100
+    # every worker disables the checks and replays the session settings before its first batch
+    assert all("SET time_zone = '+00:00'" in worker.executed for worker in workers)
+    assert main.executed[-1] == 'CREATE VIEW v AS SELECT 1'
+    assert progress.counters['statements'] == 104
+
+
+def test_import_keeps_each_table_on_one_worker():
+    connections = []
+    dump = ''.join(f"INSERT INTO {table} VALUES ({i});\n" for i in range(50) for table in 'abc')
+    sql_dump.import_stream(lambda: FakeConnection(connections), io.StringIO(dump), parallel=2, batch_bytes=60)
+    owners = {}
+    for worker in connections[1:]:
+        for batch in worker.executed:
+            for sql in batch.split(';\n'):
+                if sql.startswith('INSERT'):
+                    owners.setdefault(sql.split()[2], set()).add(worker)
+    assert sorted(owners) == ['a', 'b', 'c']
+    assert all(len(workers) == 1 for workers in owners.values())
+
+
+class ExportCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.result = []
+
+    def execute(self, sql, params=None):
+        self.connection.executed.append(sql)
+        if 'information_schema.TABLES' in sql:
+            self.result = [('t', 'BASE TABLE')]
+        elif 'information_schema.COLUMNS' in sql:
+            self.result = [('a',), ('b',)]
+        elif sql.startswith('SHOW CREATE TABLE'):
+            self.result = [('t', 'CREATE TABLE `t` (a int, b text)')]
+        elif sql.startswith('SELECT `a`'):
+            self.result = [(1, "it's"), (2, None)]
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchmany(self, size):
+        rows, self.result = self.result[:size], self.result[size:]
+        return rows
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class ExportConnection(FakeConnection):
+    def cursor(self, cursor_class=None):
+        return ExportCursor(self)
+
+    def escape(self, value):
+        return 'NULL' if value is None else repr(value)
+
+
+def test_export_writes_utc_values(tmp_path):
+    connections = []
+    result = sql_dump.export_database(lambda: ExportConnection(connections), 'app', tmp_path, compression=None)
+    # the exporting sessions use the time zone the dump header sets on import
+    assert all(connection.executed[0] == "SET SESSION time_zone = '+00:00'" for connection in connections)
+    content = (tmp_path / 't.sql').read_text()
+    assert content.startswith(sql_dump.DUMP_HEADER)
+    assert "INSERT INTO `t` (`a`, `b`) VALUES\n(1,\"it's\"),\n(2,NULL);\n" in content
+    assert result['files'] == [str(tmp_path / 't.sql')]
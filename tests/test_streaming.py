@@ -0,0 +1,61 @@
+import pytest
+
+from MariaDB4p.pool import ConnectionPool
+from MariaDB4p.streaming import stream_query, to_columnar
+
+
+class FakeCursor:
+    description = [('id',), ('name',)]
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.closed = False
+        self.rolled_back = 0
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(list(self.rows))
+
+    def rollback(self):
+        self.rolled_back += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_query_rows_and_early_exit():
+    rows = [(i, f'n{i}') for i in range(25)]
+    pool = ConnectionPool(lambda: FakeConnection(rows))
+    assert list(stream_query(pool, 'SELECT', fetch_size=10)) == rows
+    assert pool.idle == 1
+    # the connection goes back without the transaction of the SELECT
+    connection = pool.acquire()
+    assert connection.rolled_back == 1
+    pool.release(connection)
+
+    stream = stream_query(pool, 'SELECT', fetch_size=10)
+    next(stream)
+    stream.close()
+    # an abandoned stream drops its connection rather than draining the result
+    assert pool.size == 0 and pool.stats.closed == 1
+
+
+def test_to_columnar_numpy():
+    np = pytest.importorskip('numpy')
+    columns = to_columnar([(1, 'a'), (2, 'b')], ['id', 'name'], 'numpy')
+    assert columns['id'].dtype.kind == 'i'
+    assert list(columns['name']) == ['a', 'b']
@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from MariaDB4p import templates
+
+
+def test_template_built_once_and_cloned(tmp_path):
+    builds = []
+
+    def build(data_dir):
+        builds.append(data_dir)
+        Path(data_dir, 'mysql').mkdir()
+        Path(data_dir, 'mysql', 'user.frm').write_bytes(b'frm')
+        Path(data_dir, 'ibdata1').write_bytes(b'\0' * 4096)
+        Path(data_dir, 'server.pid').write_text('123')
+
+    key = templates.template_key('mariaDB4j-db-mariadb-11.4:11.4.3', {'page_size': '16k'}, ['CREATE DATABASE app'])
+    assert key != templates.template_key('mariaDB4j-db-mariadb-11.4:11.4.3', {'page_size': '16k'}, [])
+    with ThreadPoolExecutor(4) as executor:
+        paths = list(executor.map(lambda _: templates.ensure_template(key, build, tmp_path / 'templates'), range(4)))
+    assert len(builds) == 1 and len(set(paths)) == 1
+
+    clone = tmp_path / 'instance'
+    counts = templates.clone_tree(paths[0], clone)
+    assert counts['reflink'] + counts['copy'] == 2
+    assert (clone / 'mysql' / 'user.frm').read_bytes() == b'frm'
+    assert not (clone / 'server.pid').exists()
+    assert not (clone / templates.COMPLETE_MARKER).exists()
+    # writes to the clone never reach the template
+    (clone / 'ibdata1').write_bytes(b'changed')
+    assert (paths[0] / 'ibdata1').read_bytes() == b'\0' * 4096
+
+
+def test_template_key_covers_profile_and_tuning():
+    from types import SimpleNamespace
+    from MariaDB4p.mariadb_wrapper import MariaDBWrapper
+    from MariaDB4p.tuning import ServerTuning
+
+    def config(profile='default', tuning=None, server_args=()):
+        wrapper = SimpleNamespace(template_config={'page_size': '16k'}, profile=profile,
+                                  tuning=ServerTuning.coerce(tuning), extra_server_args=list(server_args))
+        return templates.template_key('11.4.3', MariaDBWrapper._template_key_config(wrapper))
+
+    assert config() == templates.template_key('11.4.3', {'page_size': '16k'})
+    keys = {config(), config(profile='ephemeral'), config(tuning={'innodb_log_file_size': '512M'}),
+            config(server_args=['--innodb-page-size=32k'])}
+    assert len(keys) == 4
+
+
+def test_instance_dirs_stay_out_of_the_temp_dir(tmp_path, monkeypatch):
+    import tempfile
+    monkeypatch.setattr(templates, 'INSTANCES_DIR', tmp_path / 'instances')
+    path = Path(templates.new_instance_dir())
+    # MariaDB4j deletes data directories under java.io.tmpdir before installing into them
+    assert path.parent == tmp_path / 'instances' and path.is_dir()
+    monkeypatch.undo()
+    assert not templates.INSTANCES_DIR.resolve().is_relative_to(Path(tempfile.gettempdir()).resolve())
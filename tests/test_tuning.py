@@ -0,0 +1,24 @@
+import pytest
+
+from MariaDB4p.tuning import ServerTuning, MIB
+
+
+def test_tuning_args():
+    tuning = ServerTuning(innodb_buffer_pool_size='1G', thread_handling='pool-of-threads', max_connections=300,
+                          extra={'innodb_io_capacity': 2000})
+    assert tuning.to_args() == ['--innodb-buffer-pool-size=1073741824', '--thread-handling=pool-of-threads',
+                                '--max-connections=300', '--innodb-io-capacity=2000']
+    with pytest.raises(ValueError):
+        ServerTuning(thread_handling='threads')
+
+
+def test_auto_tuning_scales_with_host():
+    small = ServerTuning.auto(memory=2048 * MIB, cpus=2)
+    large = ServerTuning.auto(memory=64 * 1024 * MIB, cpus=32, max_connections=1000)
+    assert small.innodb_buffer_pool_size == 512 * MIB
+    assert large.innodb_buffer_pool_size == 16 * 1024 * MIB
+    assert large.innodb_buffer_pool_size % (128 * MIB) == 0
+    assert (small.thread_pool_size, large.thread_pool_size) == (2, 32)
+    assert large.max_connections == 1000
+    assert small.query_cache_size == 0
+    assert ServerTuning.coerce({'max_connections': 10}).to_dict() == {'max_connections': 10}